@@ -0,0 +1,164 @@
+"""Keying activity: keyups, talk time and busy ratio per local node and linked node.
+
+Each talker (a local node's receiver or transmitter, or a linked node keying
+up as seen in RPT_ALINKS) keeps lifetime counters plus a ring of fixed-width
+buckets (busy seconds and keyups) covering a rolling window, held in
+preallocated arrays. Linked nodes live in an LRU map capped at ``max_nodes``,
+so memory stays the same however long the agent runs.
+"""
+import math
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+class Talker:
+    """Keying counters for one source, with a ring of per-bucket busy time."""
+
+    __slots__ = ('bucket', 'slots', 'created', 'index', 'busy', 'keys',
+                 'keyups', 'talk', 'longest', 'keyed_at', 'last_keyup')
+
+    def __init__(self, bucket: float, slots: int, now: float, since: Optional[float] = None):
+        self.bucket = bucket
+        self.slots = slots
+        # Start of the busy ratio's window until it has run for a full window
+        self.created = now if since is None else since
+        self.index = int(now // bucket)
+        self.busy = array('d', [0.0]) * slots
+        self.keys = array('I', [0]) * slots
+        self.keyups = 0
+        self.talk = 0.0
+        self.longest = 0.0
+        self.keyed_at: Optional[float] = None
+        self.last_keyup: Optional[float] = None
+
+    def key(self, now: float):
+        if self.keyed_at is not None:
+            return
+        self._advance(now)
+        self.keyed_at = now
+        self.keyups += 1
+        self.keys[self.index % self.slots] += 1
+        self.last_keyup = time.time()
+
+    def unkey(self, now: float):
+        if self.keyed_at is None:
+            return
+        started, self.keyed_at = self.keyed_at, None
+        self._advance(now)
+        seconds = now - started
+        self.talk += seconds
+        self.longest = max(self.longest, seconds)
+        # Spread the transmission over the buckets it covered (those still in the window)
+        first = max(int(started // self.bucket), self.index - self.slots + 1)
+        for index in range(first, self.index + 1):
+            overlap = min(now, (index + 1) * self.bucket) - max(started, index * self.bucket)
+            if overlap > 0:
+                self.busy[index % self.slots] += overlap
+
+    def snapshot(self, now: float) -> Dict:
+        self._advance(now)
+        window_start = max((self.index - self.slots + 1) * self.bucket, self.created)
+        busy = sum(self.busy)
+        current = 0.0
+        if self.keyed_at is not None:
+            current = now - self.keyed_at
+            busy += now - max(self.keyed_at, window_start)
+        window = now - window_start
+        return {
+            "keyed": self.keyed_at is not None,
+            "keyups": self.keyups,
+            "talk_seconds": round(self.talk + current, 1),
+            "longest_seconds": round(max(self.longest, current), 1),
+            "last_keyup": _iso(self.last_keyup),
+            "window_keyups": sum(self.keys),
+            "window_talk_seconds": round(busy, 1),
+            "busy_ratio": round(min(busy / window, 1.0), 4) if window > 0 else 0.0
+        }
+
+    def _advance(self, now: float):
+        """Move the ring to now's bucket, clearing the buckets skipped over."""
+        index = int(now // self.bucket)
+        if index <= self.index:
+            return
+        for i in range(self.index + 1, self.index + 1 + min(index - self.index, self.slots)):
+            self.busy[i % self.slots] = 0.0
+            self.keys[i % self.slots] = 0
+        self.index = index
+
+
+class NodeActivity:
+    """Keying activity for one local node: its RX and TX, and each linked node.
+
+    The rolling window is ``window`` seconds in ``bucket``-second buckets.
+    Changing either (or ``max_nodes``) starts the figures over.
+    """
+
+    def __init__(self, window: float, bucket: float, max_nodes: int):
+        self.configure(window, bucket, max_nodes)
+
+    def configure(self, window: float, bucket: float, max_nodes: int):
+        self.bucket = bucket or 60.0
+        self.slots = max(1, math.ceil(window / self.bucket))
+        self.max_nodes = max_nodes
+        now = time.monotonic()
+        self.started = now
+        self.rx = Talker(self.bucket, self.slots, now)
+        self.tx = Talker(self.bucket, self.slots, now)
+        self.remote: 'OrderedDict[str, Talker]' = OrderedDict()
+        self.evicted = 0
+
+    def set_rx(self, keyed: bool):
+        self._set(self.rx, keyed)
+
+    def set_tx(self, keyed: bool):
+        self._set(self.tx, keyed)
+
+    def set_remote(self, node: str, keyed: bool):
+        """A linked node keyed up (or dropped its carrier)."""
+        talker = self.remote.get(node)
+        if talker is None:
+            if not keyed or not self.max_nodes:
+                return
+            if len(self.remote) >= self.max_nodes:
+                # Forget the node heard from least recently
+                self.remote.popitem(last=False)
+                self.evicted += 1
+            talker = self.remote[node] = Talker(self.bucket, self.slots, time.monotonic(), self.started)
+        self.remote.move_to_end(node)
+        self._set(talker, keyed)
+
+    def unkey_all(self):
+        """End every transmission in progress (keying events may stop, e.g. AMI went down)."""
+        now = time.monotonic()
+        for talker in (self.rx, self.tx, *self.remote.values()):
+            talker.unkey(now)
+
+    def snapshot(self, top: int) -> Dict:
+        """Local RX/TX figures and the ``top`` linked nodes by talk time in the window."""
+        now = time.monotonic()
+        nodes = [{"node": node, **talker.snapshot(now)} for node, talker in self.remote.items()]
+        nodes.sort(key=lambda n: (n["window_talk_seconds"], n["talk_seconds"]), reverse=True)
+        return {
+            "window_seconds": self.slots * self.bucket,
+            "rx": self.rx.snapshot(now),
+            "tx": self.tx.snapshot(now),
+            "linked_nodes": nodes[:top],
+            "tracked_nodes": len(self.remote),
+            "evicted_nodes": self.evicted
+        }
+
+    @staticmethod
+    def _set(talker: Talker, keyed: bool):
+        if keyed:
+            talker.key(time.monotonic())
+        else:
+            talker.unkey(time.monotonic())
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds')
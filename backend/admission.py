@@ -0,0 +1,134 @@
+"""Admission control: per-key, per-route rate limits and a cap on in-flight link work."""
+import math
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+# Routes served under /nodes/{local}/... share their limits with the plain route
+NODE_PREFIX = '/nodes/{local}'
+
+
+class TokenBucket:
+    """Allows ``per_minute`` requests a minute, in bursts of up to ``per_minute``."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, per_minute: int, now: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 if allowed, else seconds until one is available."""
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if tokens >= 1.0:
+            self.tokens = tokens - 1.0
+            return 0.0
+        self.tokens = tokens
+        return (1.0 - tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per (API key, route).
+
+    A route's limit is its ``route_limits`` override when one names any of
+    its paths (written without the /nodes/{local} prefix), else
+    ``control`` requests a minute for POST routes and ``read`` for the
+    rest. A limit of 0 means unlimited. Buckets are created on first use
+    and reset when the limits change.
+    """
+
+    def __init__(self, control: int, read: int, overrides: Dict[str, int]):
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.limited = 0
+        self.configure(control, read, overrides)
+
+    def configure(self, control: int, read: int, overrides: Dict[str, int]):
+        self.control = control
+        self.read = read
+        self.overrides = dict(overrides)
+        self.buckets.clear()
+        self._limits: Dict[str, int] = {}
+
+    def check(self, key: str, route, routes: Iterable) -> float:
+        """Count a request; returns 0 if allowed, else seconds to wait (Retry-After).
+
+        route is the matched APIRoute; routes is the app's route table,
+        only read the first time a route is seen.
+        """
+        name = route.name
+        now = time.monotonic()
+        bucket = self.buckets.get((key, name))
+        if bucket is None:
+            limit = self._limits.get(name)
+            if limit is None:
+                limit = self._limits[name] = self._resolve(route, routes)
+            if not limit:
+                return 0.0
+            bucket = self.buckets[(key, name)] = TokenBucket(limit, now)
+        wait = bucket.take(now)
+        if wait:
+            self.limited += 1
+        return wait
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "control_per_minute": self.control,
+            "read_per_minute": self.read,
+            "buckets": len(self.buckets),
+            "limited": self.limited
+        }
+
+    def _resolve(self, route, routes: Iterable) -> int:
+        """Requests a minute for a route (and the routes stacked on the same endpoint)."""
+        for other in routes:
+            if getattr(other, 'name', None) != route.name:
+                continue
+            path = other.path
+            if path.startswith(NODE_PREFIX + '/'):
+                path = path[len(NODE_PREFIX):]
+            if path in self.overrides:
+                return self.overrides[path]
+        return self.control if 'POST' in (route.methods or ()) else self.read
+
+
+class AdmissionGate:
+    """Non-blocking cap on link operations in flight (0 = no cap).
+
+    Work over the cap is refused at once rather than queued behind the
+    AMI control lane, so callers can shed it with 429.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.inflight = 0
+        self.peak = 0
+        self.shed = 0
+
+    def try_enter(self) -> bool:
+        if self.limit and self.inflight >= self.limit:
+            self.shed += 1
+            return False
+        self.inflight += 1
+        if self.inflight > self.peak:
+            self.peak = self.inflight
+        return True
+
+    def leave(self, _task: Optional[object] = None):
+        """Release a slot (also usable as a task done callback)."""
+        self.inflight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "inflight": self.inflight,
+            "peak": self.peak,
+            "shed": self.shed
+        }
+
+
+def retry_after(wait: float) -> str:
+    """Retry-After header value (whole seconds, at least 1)."""
+    return str(max(1, math.ceil(wait)))
+
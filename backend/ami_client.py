@@ -1,147 +1,713 @@
 """Asterisk Manager Interface client wrapper."""
 import asyncio
 import logging
-from typing import Dict, List, Optional
-from panoramisk import Manager
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from ami_pool import AMIPool, AMIUnavailableError
 from config import config
+from metrics import AMI_COMMAND_SECONDS, LINK_VERIFY_SECONDS, command_type
+from node_directory import node_directory
+from tracing import phase, record_phase
+from rpt_stats import format_duration, parse_rpt_stats
 
 logger = logging.getLogger(__name__)
 
+# app_rpt publishes its link list through these variables/events
+LINK_VARIABLES = ('RPT_LINKS', 'RPT_ALINKS')
+
+# Backoff bounds for the rpt nodes fallback poll during verification
+VERIFY_POLL_INITIAL = 0.25
+VERIFY_POLL_MAX = 2.0
+
+# Supervisor reconnect backoff bounds (seconds, before jitter)
+RECONNECT_INITIAL = 0.5
+RECONNECT_MAX = 30.0
+
+# Connection states reported by the supervisor
+STATE_CONNECTING = 'connecting'
+STATE_UP = 'up'
+STATE_DEGRADED = 'degraded'
+STATE_DOWN = 'down'
+
+
+def parse_link_list(value: str) -> Dict[str, str]:
+    """Parse an RPT_LINKS/RPT_ALINKS value into {node: flags}.
+
+    RPT_LINKS looks like "2,T2000,R2001" (mode prefix) and RPT_ALINKS like
+    "2,2000TU,2001RK" (mode plus K/U keyed suffix). The leading count is
+    skipped. flags is the mode letter, followed by K or U when known;
+    links still being set up carry mode "C".
+    """
+    links: Dict[str, str] = {}
+    for entry in value.split(',')[1:]:
+        entry = entry.strip()
+        if not entry:
+            continue
+        if entry[0].isdigit():
+            digits = entry.rstrip('TRCLKU')
+            flags = entry[len(digits):]
+        else:
+            digits, flags = entry[1:], entry[0]
+        if digits:
+            links[digits] = flags
+    return links
+
+
+class UnknownNodeError(LookupError):
+    """Raised when a request names a node that is not configured locally."""
+
+
+class LinkOperation:
+    """One connect/monitor/disconnect request and its verification state."""
+
+    ILINK_MODES = {'connect': 3, 'monitor': 2, 'disconnect': 1}
+
+    def __init__(self, action: str, node: str, local: str):
+        if action not in self.ILINK_MODES:
+            raise ValueError(f"Unknown link action: {action}")
+        self.action = action
+        self.node = node
+        self.local = local
+        self.present = action != 'disconnect'
+        self.command = f"rpt cmd {local} ilink {self.ILINK_MODES[action]} {node}"
+        timeout = config.connect_timeout if self.present else config.disconnect_timeout
+        self.timeout = timeout
+        self.waiter: Optional[asyncio.Future] = None
+        self.started: float = 0.0
+        self.verified_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def deadline(self) -> float:
+        return self.started + self.timeout
+
+    def settle_from_event(self, now: float) -> bool:
+        """Mark verified if a link event resolved the waiter; True once settled."""
+        if self.verified_at is None and self.waiter.done() and not self.waiter.cancelled():
+            self.verified_at = now
+        return self.verified_at is not None
+
+    def result(self, now: float) -> Dict:
+        """Result dict in the shape connect_node/disconnect_node return.
+
+        time_to_link / time_to_unlink is the verified link time on success,
+        or the time spent before giving up on failure.
+        """
+        timing = "time_to_link" if self.present else "time_to_unlink"
+        if self.verified_at is not None:
+            return {
+                "success": True,
+                "action": self.action,
+                "command": self.command,
+                "node": self.node,
+                timing: round(self.verified_at - self.started, 3)
+            }
+
+        if self.error is not None:
+            error = f"Command failed: {self.error}"
+        elif self.present:
+            error = f"Node {self.node} did not connect (may be offline or unreachable)"
+        else:
+            error = f"Node {self.node} is still connected"
+        return {
+            "success": False,
+            "action": self.action,
+            "error": error,
+            "command": self.command,
+            "node": self.node,
+            timing: round(now - self.started, 3)
+        }
+
+
+class SnapshotCache:
+    """TTL cache for one AMI read with single-flight, stale-while-revalidate refresh.
+
+    Within ``ttl`` seconds the cached value is returned as-is. Up to
+    ``stale`` seconds beyond that it is still returned, but a background
+    refresh is started. Older (or invalidated) values are refetched inline.
+    Concurrent callers always share a single in-flight fetch.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[Any]], ttl: float, stale: float):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.stale = stale
+        self.value: Any = None
+        self.fetched_at: Optional[float] = None
+        self._inflight: Optional[asyncio.Task] = None
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the cached value was fetched, or None if empty."""
+        if self.fetched_at is None:
+            return None
+        return round(asyncio.get_running_loop().time() - self.fetched_at, 3)
+
+    def invalidate(self):
+        """Drop the cached value; the next get() fetches fresh data."""
+        self.fetched_at = None
+        self._inflight = None
+        self._generation += 1
+
+    def store(self, value: Any):
+        """Store a value fetched outside the cache (e.g. a forced poll)."""
+        self.value = value
+        self.fetched_at = asyncio.get_running_loop().time()
+
+    async def get(self) -> Any:
+        """Return the cached value, refreshing it as needed."""
+        age = self.age
+        if age is not None:
+            if age < self.ttl:
+                self.hits += 1
+                return self.value
+            if age < self.ttl + self.stale:
+                self.stale_hits += 1
+                self._refresh()
+                return self.value
+        self.misses += 1
+        return await asyncio.shield(self._refresh())
+
+    def _refresh(self) -> asyncio.Task:
+        """Start a fetch unless one is already in flight."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._run(self._generation))
+            self._inflight.add_done_callback(self._log_failure)
+        return self._inflight
+
+    async def _run(self, generation: int) -> Any:
+        value = await self._fetch()
+        # Results of a fetch that started before an invalidate() are not kept
+        if generation == self._generation:
+            self.store(value)
+        return value
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.debug(f"Cache refresh failed: {task.exception()}")
+
+
+class LocalNode:
+    """A local app_rpt node with its own snapshot caches and link state."""
+
+    def __init__(self, client: 'AMIClient', number: str, callsign: str):
+        self.number = number
+        self.callsign = callsign
+        self.last_links: Optional[frozenset] = None
+        self.stats_cache = SnapshotCache(
+            lambda: client._fetch_stats(number), config.cache_ttl, config.cache_stale
+        )
+        self.nodes_cache = SnapshotCache(
+            lambda: client._fetch_nodes(number), config.cache_ttl, config.cache_stale
+        )
+
+    def invalidate(self):
+        self.stats_cache.invalidate()
+        self.nodes_cache.invalidate()
+
 
 class AMIClient:
-    """Wrapper for AMI connections using panoramisk."""
+    """Wrapper for AMI connections using panoramisk.
+
+    One AMI connection (pool) serves every local node. Methods that act on
+    a node take ``local``, the local node number; None means the first
+    configured node.
+    """
 
     def __init__(self):
-        self.manager: Optional[Manager] = None
-        self.connected = False
+        self.pool = AMIPool(config.ami_pool_size, config.ami_lanes)
+        self.state = STATE_DOWN
+        self.state_since: Optional[float] = None
+        self.reconnects = 0
+        self._pool_stale = False
+        self._state_listeners: List[Callable[[str], None]] = []
+        self._link_waiters: List[Tuple[str, str, bool, asyncio.Future]] = []
+        self._event_callbacks: List[Tuple[str, Callable]] = [
+            (pattern, self._on_link_event) for pattern in LINK_VARIABLES + ('VarSet',)
+        ]
+        self.local_nodes: Dict[str, LocalNode] = {
+            n['number']: LocalNode(self, n['number'], n['callsign'])
+            for n in config.local_nodes
+        }
+        self.default_node = next(iter(self.local_nodes))
+
+    def node(self, local: Optional[str] = None) -> LocalNode:
+        """Look up a local node by number (None for the default node)."""
+        try:
+            return self.local_nodes[str(local) if local is not None else self.default_node]
+        except KeyError:
+            raise UnknownNodeError(f"Node {local} is not a local node") from None
+
+    @property
+    def connected(self) -> bool:
+        """True while at least the primary AMI session is usable."""
+        return self.state in (STATE_UP, STATE_DEGRADED)
 
     async def connect(self):
         """Establish connection to AMI."""
         try:
-            self.manager = Manager(
-                host=config.ami_host,
-                port=config.ami_port,
-                username=config.ami_username,
-                secret=config.ami_password,
-                ping_delay=60,
-                ping_attempts=3
+            await self.pool.connect(self._event_callbacks, config.ami_login_timeout)
+            logger.info(
+                f"Connected to AMI at {config.ami_host}:{config.ami_port} "
+                f"({len(self.pool.sessions)}/{self.pool.size} sessions)"
             )
-
-            await self.manager.connect()
-            self.connected = True
-            logger.info(f"Connected to AMI at {config.ami_host}:{config.ami_port}")
-
         except Exception as e:
-            self.connected = False
             logger.error(f"Failed to connect to AMI: {e}")
             raise
 
     async def disconnect(self):
         """Close AMI connection."""
-        if self.manager:
-            await self.manager.close()
-            self.connected = False
+        if self.pool.sessions:
+            self.pool.close()
             logger.info("Disconnected from AMI")
-
-    async def send_command(self, command: str) -> Dict:
-        """Send a command to Asterisk and return response."""
-        if not self.connected or not self.manager:
-            raise RuntimeError("AMI not connected")
+        self._set_state(STATE_DOWN)
+
+    async def supervise(self):
+        """Keep AMI connected for the life of the agent.
+
+        Dials with jittered exponential backoff until the primary session
+        logs in, then watches the pool: a lost secondary session leaves the
+        client degraded while it is replaced, a lost primary (the event
+        session) tears the pool down and starts over.
+        """
+        delay = RECONNECT_INITIAL
+        while True:
+            if self._pool_stale:
+                # Reloaded while down: the old pool is already closed
+                self.pool = AMIPool(config.ami_pool_size, config.ami_lanes)
+                self._pool_stale = False
+            self._set_state(STATE_CONNECTING)
+            try:
+                await self.connect()
+                delay = RECONNECT_INITIAL
+                await self._watch_pool()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"AMI supervisor cycle ended: {e}")
+
+            self.pool.close()
+            self._set_state(STATE_DOWN)
+            wait = random.uniform(delay / 2, delay)
+            logger.info(f"Reconnecting to AMI in {wait:.1f}s")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, RECONNECT_MAX)
+            self.reconnects += 1
+
+    async def _watch_pool(self):
+        """Return once the primary session is lost; refill secondaries meanwhile."""
+        delay = RECONNECT_INITIAL
+        while True:
+            if self._pool_stale:
+                await self._replace_pool()
+            if self.pool.primary not in self.pool.sessions:
+                return
+            if len(self.pool.sessions) < self.pool.size:
+                self._set_state(STATE_DEGRADED)
+                if not await self._while_primary_up(self.pool.refill(config.ami_login_timeout)):
+                    return
+                if len(self.pool.sessions) < self.pool.size:
+                    if not await self._while_primary_up(asyncio.sleep(random.uniform(delay / 2, delay))):
+                        return
+                    delay = min(delay * 2, RECONNECT_MAX)
+                    continue
+            delay = RECONNECT_INITIAL
+            self._set_state(STATE_UP)
+            self.pool.changed.clear()
+            if not self._pool_stale:
+                await self.pool.changed.wait()
+
+    async def _while_primary_up(self, coro) -> bool:
+        """Run coro unless the primary session is lost first; False if it was.
+
+        Refilling can take up to the login timeout, and a lost primary must
+        take the client down (and start the reconnect) without waiting it out.
+        """
+        task = asyncio.ensure_future(coro)
+        try:
+            while not task.done():
+                self.pool.changed.clear()
+                if self.pool.primary not in self.pool.sessions:
+                    return False
+                changed = asyncio.ensure_future(self.pool.changed.wait())
+                try:
+                    await asyncio.wait({task, changed}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    changed.cancel()
+            task.result()
+            return True
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def reload(self):
+        """Rebuild the pool from the current AMI settings (config reload).
+
+        The supervisor does the switch. While connected it logs in a new
+        pool before retiring the old one, which finishes the commands it
+        already accepted; while down it just dials with the new settings.
+        """
+        self._pool_stale = True
+        self.pool.changed.set()
+
+    def configure_caches(self):
+        """Apply the current cache settings to every node's caches."""
+        for node in self.local_nodes.values():
+            for cache in (node.stats_cache, node.nodes_cache):
+                cache.ttl = config.cache_ttl
+                cache.stale = config.cache_stale
+
+    async def _replace_pool(self):
+        """Make-before-break switch to a pool built from the current settings."""
+        self._pool_stale = False
+        pool = AMIPool(config.ami_pool_size, config.ami_lanes)
+        try:
+            await pool.connect(self._event_callbacks, config.ami_login_timeout)
+        except Exception as e:
+            pool.close()
+            logger.error(f"AMI reload failed, keeping the current connection: {e}")
+            return
+
+        old, self.pool = self.pool, pool
+        old.retire()
+        self.invalidate_cache()
+        logger.info(
+            f"AMI pool replaced: {config.ami_host}:{config.ami_port} "
+            f"({len(pool.sessions)}/{pool.size} sessions)"
+        )
+        try:
+            await old.drain(config.ami_command_timeout)
+        finally:
+            old.close()
+
+    def add_state_listener(self, callback: Callable[[str], None]):
+        """Call callback(state) whenever the connection state changes."""
+        self._state_listeners.append(callback)
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        logger.info(f"AMI state: {self.state} -> {state}")
+        self.state = state
+        self.state_since = asyncio.get_running_loop().time()
+        if state == STATE_UP:
+            # Anything cached may predate the outage
+            self.invalidate_cache()
+        for callback in self._state_listeners:
+            try:
+                callback(state)
+            except Exception as e:
+                logger.error(f"AMI state listener failed: {e}")
+
+    def register_event(self, pattern: str, callback: Callable):
+        """Register an AMI event callback that is kept across reconnects."""
+        self._event_callbacks.append((pattern, callback))
+        self.pool.register_event(pattern, callback)
+
+    async def send_command(self, command: str, lane: str = 'read') -> Dict:
+        """Send a command to Asterisk and return response.
+
+        lane picks the pool lane: 'control' for ilink commands and their
+        verification, 'read' for API reads, 'poll' for background polling.
+        """
+        if not self.connected or not self.pool.sessions:
+            raise AMIUnavailableError(f"AMI not connected ({self.state})")
 
         try:
-            response = await self.manager.send_action({
-                'Action': 'Command',
-                'Command': command
-            })
+            requested = time.perf_counter()
+            async with self.pool.session(lane) as manager:
+                started = time.perf_counter()
+                record_phase('ami_wait', requested, started - requested)
+                try:
+                    # A session that drops mid-command never resolves its future
+                    response = await asyncio.wait_for(
+                        manager.send_action({
+                            'Action': 'Command',
+                            'Command': command
+                        }),
+                        config.ami_command_timeout
+                    )
+                finally:
+                    elapsed = time.perf_counter() - started
+                    AMI_COMMAND_SECONDS.labels(command_type(command)).observe(elapsed)
+                    record_phase('ami_exec', started, elapsed)
             return response
         except Exception as e:
             logger.error(f"Command failed: {command} - {e}")
             raise
 
-    async def get_node_stats(self) -> Dict:
-        """Get statistics for the configured node."""
-        response = await self.send_command(f"rpt stats {config.node_number}")
-        return self._parse_stats_response(response)
-
-    async def get_connected_nodes(self) -> List[Dict]:
-        """Get list of connected nodes."""
-        response = await self.send_command(f"rpt nodes {config.node_number}")
-        return self._parse_nodes_response(response)
-
-    async def connect_node(self, node_number: str, monitor_only: bool = False) -> Dict:
-        """Connect to another node."""
-        ilink_mode = 2 if monitor_only else 3
-        command = f"rpt cmd {config.node_number} ilink {ilink_mode} {node_number}"
-        response = await self.send_command(command)
-
-        # Wait for connection to establish
-        await asyncio.sleep(8)
-
-        # Verify connection
-        nodes = await self.get_connected_nodes()
-        connected = any(n['node'] == node_number for n in nodes)
-
-        if not connected:
-            return {
-                "success": False,
-                "error": f"Node {node_number} did not connect (may be offline or unreachable)",
-                "command": command
-            }
-
-        return {"success": True, "command": command, "node": node_number}
-
-    async def disconnect_node(self, node_number: str) -> Dict:
-        """Disconnect from a specific node."""
-        command = f"rpt cmd {config.node_number} ilink 1 {node_number}"
-        response = await self.send_command(command)
-
-        # Wait for disconnection to complete
-        await asyncio.sleep(5)
+    async def get_node_stats(self, raw: bool = False, local: Optional[str] = None,
+                             fresh: bool = False, lane: str = 'read') -> Dict:
+        """Get statistics for a local node.
+
+        Served from the node's snapshot cache unless fresh is set, in which
+        case AMI is queried directly (in the given lane) and the cache
+        updated with the result. raw_output (the unparsed rpt stats lines)
+        is only included when raw is set; the typed fields are under "stats".
+        """
+        target = self.node(local)
+        cache = target.stats_cache
+        if fresh:
+            stats = await self._fetch_stats(target.number, lane)
+            cache.store(stats)
+        else:
+            stats = await cache.get()
+        result = {**stats, "cache_age": cache.age}
+        if not raw:
+            result.pop("raw_output", None)
+        return result
+
+    async def get_all_stats(self, raw: bool = False) -> Dict[str, Dict]:
+        """Get statistics for every local node concurrently.
+
+        Each node's entry is its get_node_stats() result, or {"error": ...}
+        if that node's query failed.
+        """
+        numbers = list(self.local_nodes)
+        results = await asyncio.gather(
+            *(self.get_node_stats(raw, number) for number in numbers),
+            return_exceptions=True
+        )
+        return {
+            number: {"error": str(result) or type(result).__name__}
+            if isinstance(result, Exception) else result
+            for number, result in zip(numbers, results)
+        }
 
-        # Verify disconnection
-        nodes = await self.get_connected_nodes()
-        still_connected = any(n['node'] == node_number for n in nodes)
+    async def get_connected_nodes(self, fresh: bool = False, lane: str = 'read',
+                                  local: Optional[str] = None) -> List[Dict]:
+        """Get list of nodes connected to a local node.
+
+        Served from the node's snapshot cache unless fresh is set, in which
+        case AMI is queried directly (in the given lane) and the cache
+        updated with the result.
+        """
+        target = self.node(local)
+        if not fresh:
+            return await target.nodes_cache.get()
+        nodes = await self._fetch_nodes(target.number, lane)
+        target.nodes_cache.store(nodes)
+        return nodes
 
-        if still_connected:
-            return {
-                "success": False,
-                "error": f"Node {node_number} is still connected",
-                "command": command
-            }
+    def invalidate_cache(self, local: Optional[str] = None):
+        """Drop cached node state after a link change (all nodes if local is None)."""
+        targets = [self.node(local)] if local is not None else self.local_nodes.values()
+        for target in targets:
+            target.invalidate()
+
+    async def _fetch_stats(self, local: str, lane: str = 'read') -> Dict:
+        response = await self.send_command(f"rpt stats {local}", lane)
+        with phase('parse'):
+            return self._parse_stats_response(response, self.node(local))
+
+    async def _fetch_nodes(self, local: str, lane: str = 'read') -> List[Dict]:
+        response = await self.send_command(f"rpt nodes {local}", lane)
+        with phase('parse'):
+            nodes = self._parse_nodes_response(response)
+            # Once per fetch: cached /nodes responses carry the directory fields
+            node_directory.annotate(nodes)
+            return nodes
+
+    async def connect_node(self, node_number: str, monitor_only: bool = False,
+                           local: Optional[str] = None) -> Dict:
+        """Connect a local node to another node."""
+        action = 'monitor' if monitor_only else 'connect'
+        return (await self.run_link_operations([(action, node_number)], local))[0]
+
+    async def disconnect_node(self, node_number: str, local: Optional[str] = None) -> Dict:
+        """Disconnect a local node from a specific node."""
+        return (await self.run_link_operations([('disconnect', node_number)], local))[0]
+
+    async def disconnect_all(self, local: Optional[str] = None) -> Dict:
+        """Disconnect a local node from all nodes."""
+        target = self.node(local)
+        command = f"rpt cmd {target.number} ilink 6"
+        response = await self.send_command(command, lane='control')
+        target.invalidate()
+        return {"success": True, "command": command, "response": response}
 
-        return {"success": True, "command": command, "node": node_number}
+    async def run_link_operations(self, operations: List[Tuple[str, str]],
+                                  local: Optional[str] = None) -> List[Dict]:
+        """Run connect/monitor/disconnect operations and verify them together.
+
+        operations is a list of (action, node). The ilink commands go out
+        back-to-back, then every operation is verified concurrently against
+        the same link events and a single shared rpt nodes poll per round.
+        Results come back in input order. An operation whose command fails
+        is reported as failed. If AMI is lost part way, the operations not
+        yet sent fail with that error and those already sent (the one that
+        hit the error included, as it may have reached app_rpt) are still
+        verified; losing AMI on the first command raises.
+        """
+        loop = asyncio.get_running_loop()
+        target = self.node(local)
+        ops = [LinkOperation(action, node, target.number) for action, node in operations]
+        lost: Optional[str] = None
+        sent: List[LinkOperation] = []
 
-    async def disconnect_all(self) -> Dict:
-        """Disconnect from all nodes."""
-        command = f"rpt cmd {config.node_number} ilink 6"
-        response = await self.send_command(command)
-        return {"success": True, "command": command, "response": response}
+        try:
+            for op in ops:
+                if lost is not None:
+                    op.started = loop.time()
+                    op.error = f"not sent after AMI error: {lost}"
+                    continue
+                op.waiter = self._watch_link(target.number, op.node, op.present)
+                op.started = loop.time()
+                try:
+                    await self.send_command(op.command, lane='control')
+                except (AMIUnavailableError, asyncio.TimeoutError) as e:
+                    if op is ops[0]:
+                        raise
+                    lost = str(e) or "AMI command timed out"
+                    op.error = lost
+                    sent.append(op)
+                    continue
+                except Exception as e:
+                    op.error = str(e)
+                    continue
+                sent.append(op)
+            target.invalidate()
+            try:
+                await self._wait_for_links(sent)
+            except (AMIUnavailableError, asyncio.TimeoutError) as e:
+                # Link events may still have settled some; the rest are unknown
+                now = loop.time()
+                for op in sent:
+                    if not op.settle_from_event(now) and op.error is None:
+                        op.error = f"not verified after AMI error: {str(e) or 'AMI command timed out'}"
+        finally:
+            for op in ops:
+                if op.waiter is not None:
+                    self._unwatch_link(op.waiter)
+
+        now = loop.time()
+        for op in ops:
+            if op.waiter is None:
+                continue  # never sent
+            if op.verified_at is not None:
+                LINK_VERIFY_SECONDS.labels(op.action, 'verified').observe(op.verified_at - op.started)
+            else:
+                outcome = 'failed' if op.error is not None else 'timeout'
+                LINK_VERIFY_SECONDS.labels(op.action, outcome).observe(now - op.started)
+        return [op.result(now) for op in ops]
+
+    def _watch_link(self, local: str, node_number: str, present: bool) -> asyncio.Future:
+        """Register a future resolved when a link event shows the wanted state.
+
+        Registered before the ilink command is sent so a fast link event
+        cannot slip past between the command and the wait.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self._link_waiters.append((local, node_number, present, waiter))
+        return waiter
+
+    def _unwatch_link(self, waiter: asyncio.Future):
+        """Drop a link waiter once verification is finished."""
+        self._link_waiters = [w for w in self._link_waiters if w[3] is not waiter]
+        if not waiter.done():
+            waiter.cancel()
+
+    async def _wait_for_links(self, ops: List['LinkOperation']):
+        """Wait until each operation's node is (or is no longer) linked.
+
+        An operation is settled by the first matching AMI link event. While
+        any are still pending and no event arrives, one rpt nodes poll per
+        round (exponential backoff) settles all operations it satisfies.
+        Each operation gives up at its own deadline.
+        """
+        loop = asyncio.get_running_loop()
+        delay = VERIFY_POLL_INITIAL
+        pending = list(ops)
+
+        while True:
+            now = loop.time()
+            pending = [op for op in pending if not op.settle_from_event(now) and now < op.deadline]
+            if not pending:
+                return
+
+            wait = min(delay, min(op.deadline for op in pending) - now)
+            done, _ = await asyncio.wait(
+                {op.waiter for op in pending}, timeout=wait,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if done:
+                continue
 
-    def _parse_stats_response(self, response: Dict) -> Dict:
+            nodes = await self.get_connected_nodes(fresh=True, lane='control', local=ops[0].local)
+            linked = {n['node'] for n in nodes}
+            now = loop.time()
+            for op in pending:
+                if (op.node in linked) == op.present:
+                    op.verified_at = now
+            pending = [op for op in pending if op.verified_at is None]
+            delay = min(delay * 2, VERIFY_POLL_MAX)
+
+    def _on_link_event(self, manager, message):
+        """Resolve pending link waiters from app_rpt link-list events."""
+        if message.get('Event') == 'VarSet':
+            if message.get('Variable') not in LINK_VARIABLES:
+                return
+            value = message.get('Value', '')
+        else:
+            value = message.get('EventValue', '')
+
+        node = message.get('Node')
+        if node:
+            target = self.local_nodes.get(node)
+        elif len(self.local_nodes) == 1:
+            target = self.node()
+        else:
+            # No way to tell which local node this belongs to
+            target = None
+        if target is None:
+            return
+
+        links = parse_link_list(value)
+        linked = frozenset(links)
+        if linked != target.last_links:
+            # Keying changes re-send the same list; only real link changes invalidate
+            target.last_links = linked
+            target.invalidate()
+
+        for local, node_number, present, waiter in self._link_waiters:
+            if local != target.number:
+                continue
+            if present:
+                # Mode "C" is a link that is still connecting
+                reached = links.get(node_number, 'C')[:1] != 'C'
+            else:
+                reached = node_number not in links
+            if reached and not waiter.done():
+                waiter.set_result(True)
+
+    def _parse_stats_response(self, response: Dict, local: LocalNode) -> Dict:
         """Parse rpt stats output into structured data."""
         output = response.get('Output', [])
         if isinstance(output, str):
-            output = [output]
+            output = output.splitlines()
 
-        stats = {
+        parsed = parse_rpt_stats(output)
+        uptime = parsed.get("uptime")
+        connected = parsed.get("connected_nodes") or []
+
+        return {
             "raw_output": output,
-            "node": config.node_number,
-            "callsign": config.node_callsign
+            "node": local.number,
+            "callsign": local.callsign,
+            "stats": parsed,
+            # Flat display fields kept for existing clients
+            "uptime": format_duration(uptime) if isinstance(uptime, int) else uptime,
+            "keyups_today": parsed.get("keyups_today"),
+            "connected_nodes": ", ".join(connected) if connected else "None"
         }
 
-        # Parse key fields from output
-        for line in output:
-            line = line.strip()
-            if "Uptime" in line and ":" in line:
-                stats["uptime"] = line.split(":")[-1].strip()
-            elif "Keyups today" in line and ":" in line:
-                stats["keyups_today"] = line.split(":")[-1].strip()
-            elif "Nodes currently connected to us" in line and ":" in line:
-                connected = line.split(":")[-1].strip()
-                stats["connected_nodes"] = connected if connected != "<NONE>" else "None"
-
-        return stats
-
     def _parse_nodes_response(self, response: Dict) -> List[Dict]:
         """Parse rpt nodes output into structured data."""
         output = response.get('Output', [])
@@ -155,27 +721,27 @@ class AMIClient:
             if not line or line.startswith('*') or '<NONE>' in line:
                 continue
 
-            # Check if this line contains comma-separated nodes
+            # Comma-separated nodes, or a single node on its own line
             # Format: T427060, T516596, T54199, T55553, T60802
-            if ',' in line:
-                # Split by comma and process each node
-                node_entries = line.split(',')
-                for entry in node_entries:
-                    entry = entry.strip()
-                    if entry:
-                        # Remove mode prefix (T/M/R) if present
-                        mode = ""
-                        node_num = entry
-                        if entry and entry[0] in ['T', 'M', 'R']:
-                            mode = entry[0]
-                            node_num = entry[1:]
-
-                        if node_num:  # Only add if we have a node number
-                            nodes.append({
-                                "node": node_num,
-                                "mode": mode,
-                                "info": ""
-                            })
+            for entry in line.split(','):
+                entry = entry.strip()
+                # C = link still connecting, not connected yet
+                if not entry or entry[0] == 'C':
+                    continue
+
+                # Remove mode prefix (T/M/R) if present
+                mode = ""
+                node_num = entry
+                if entry[0] in ['T', 'M', 'R']:
+                    mode = entry[0]
+                    node_num = entry[1:]
+
+                if node_num:  # Only add if we have a node number
+                    nodes.append({
+                        "node": node_num,
+                        "mode": mode,
+                        "info": ""
+                    })
 
         return nodes
 
@@ -0,0 +1,305 @@
+"""Pool of AMI sessions shared out by priority lane."""
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from panoramisk import Manager
+from config import config
+from metrics import AMI_LANE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Lower number is served first when sessions are scarce
+LANE_PRIORITY = {'control': 0, 'read': 1, 'poll': 2}
+
+
+class AMIUnavailableError(RuntimeError):
+    """Raised when no AMI session is available because AMI is down."""
+
+
+class PoolFullError(RuntimeError):
+    """Raised when a lane's wait queue is already at its configured depth."""
+
+
+class SupervisedManager(Manager):
+    """panoramisk Manager that never reconnects on its own.
+
+    panoramisk re-schedules connect() after every failed dial or dropped
+    connection. Reconnects belong to the AMIClient supervisor (with
+    backoff), so those timers are turned into no-ops and sessions are
+    dialed through open() instead.
+    """
+
+    def open(self) -> asyncio.Future:
+        return super().connect()
+
+    def connect(self, *args, **kwargs):
+        return None
+
+
+class Lane:
+    """Concurrency limit, queue bound and wait-time statistics for one lane."""
+
+    def __init__(self, name: str, concurrency: int, queue_depth: int):
+        self.name = name
+        self.priority = LANE_PRIORITY.get(name, len(LANE_PRIORITY))
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.in_flight = 0
+        self.queued = 0
+        self.acquired = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_histogram = AMI_LANE_WAIT_SECONDS.labels(name)
+
+    def record_wait(self, seconds: float):
+        self.acquired += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.wait_histogram.observe(seconds)
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "acquired": self.acquired,
+            "wait_avg": round(self.wait_total / self.acquired, 4) if self.acquired else 0.0,
+            "wait_max": round(self.wait_max, 4)
+        }
+
+
+class AMIPool:
+    """Fixed set of AMI sessions handed out by lane priority.
+
+    Control traffic (ilink commands) outranks read and poll traffic for the
+    next free session. A running AMI command cannot be interrupted, so the
+    real guarantee comes from the lane limits: with more sessions than the
+    read and poll lanes may use together, a control command never waits
+    behind a slow rpt stats.
+
+    Only the primary session subscribes to AMI events so callbacks fire
+    once. A session whose connection drops is taken out of service and
+    ``changed`` is set so the supervisor can react. A retired pool (one
+    being replaced) stops delivering events but finishes the commands it
+    has already accepted.
+    """
+
+    def __init__(self, size: int, lanes: Dict[str, Dict[str, int]]):
+        self.size = max(1, size)
+        self.lanes = {name: Lane(name, **settings) for name, settings in lanes.items()}
+        self.primary: Optional[Manager] = None
+        self.sessions: List[Manager] = []
+        self._idle: List[Manager] = []
+        self._opening: Set[Manager] = set()
+        self._waiters: List[Tuple[int, int, str, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.changed = asyncio.Event()
+        self.retired = False
+
+    async def connect(self, event_callbacks: List[Tuple[str, Callable]], timeout: float):
+        """Open and log in all sessions; event callbacks go on the primary only.
+
+        Fails if the primary cannot log in within timeout. Secondary
+        sessions that fail are left out; the pool runs degraded until
+        refill() succeeds.
+        """
+        primary = self._new_session(events=True)
+        for pattern, callback in event_callbacks:
+            primary.register_event(pattern, self._event_handler(callback))
+
+        try:
+            await self._open(primary, timeout)
+        except Exception:
+            primary.close()
+            raise
+
+        self.primary = primary
+        self.sessions = [primary]
+        self._idle = [primary]
+        await self.refill(timeout)
+
+    async def refill(self, timeout: float):
+        """Open replacements for missing secondary sessions."""
+        missing = self.size - len(self.sessions)
+        if missing <= 0:
+            return
+        sessions = [self._new_session(events=False) for _ in range(missing)]
+        try:
+            results = await asyncio.gather(
+                *(self._open(session, timeout) for session in sessions),
+                return_exceptions=True
+            )
+        except asyncio.CancelledError:
+            for session in sessions:
+                session.close()
+            raise
+        for session, result in zip(sessions, results):
+            if isinstance(result, Exception):
+                session.close()
+                logger.warning(f"AMI session failed to open: {result}")
+            else:
+                self.sessions.append(session)
+                self._idle.append(session)
+        self._dispatch()
+
+    def register_event(self, pattern: str, callback: Callable):
+        """Add an event callback to the live primary session."""
+        if self.primary:
+            self.primary.register_event(pattern, self._event_handler(callback))
+
+    def retire(self):
+        """Stop delivering events; commands already accepted still run."""
+        self.retired = True
+        self.changed.set()
+
+    async def drain(self, timeout: float):
+        """Wait up to timeout for running and queued commands to finish."""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self._waiters or any(lane.in_flight for lane in self.lanes.values()):
+            if asyncio.get_running_loop().time() >= deadline:
+                logger.warning("AMI pool drain timed out; closing with commands in flight")
+                return
+            await asyncio.sleep(0.05)
+
+    def close(self):
+        """Close every session and fail anyone still waiting for one."""
+        for session in self.sessions:
+            session.close()
+        self.primary = None
+        self.sessions = []
+        self._idle = []
+        for _, _, lane_name, _, waiter in self._waiters:
+            self.lanes[lane_name].queued -= 1
+            if not waiter.done():
+                waiter.set_exception(AMIUnavailableError("AMI not connected"))
+        self._waiters = []
+
+    @asynccontextmanager
+    async def session(self, lane_name: str) -> AsyncIterator[Manager]:
+        """Borrow a session for one action in the given lane."""
+        session = await self.acquire(lane_name)
+        try:
+            yield session
+        finally:
+            self.release(session, lane_name)
+
+    async def acquire(self, lane_name: str) -> Manager:
+        """Wait for a free session, honoring lane limits and priority."""
+        lane = self.lanes[lane_name]
+        if self._idle and lane.in_flight < lane.concurrency:
+            return self._grant(lane, 0.0)
+
+        if lane.queued >= lane.queue_depth:
+            raise PoolFullError(f"AMI {lane_name} queue full ({lane.queue_depth} waiting)")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        entry = (lane.priority, next(self._seq), lane_name, loop.time(), waiter)
+        self._waiters.append(entry)
+        lane.queued += 1
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                lane.queued -= 1
+            elif waiter.done() and not waiter.cancelled() and not waiter.exception():
+                # Granted just as the caller gave up: hand it straight back
+                self.release(waiter.result(), lane_name)
+            raise
+
+    def release(self, session: Manager, lane_name: str):
+        """Return a session and wake the best eligible waiter."""
+        self.lanes[lane_name].in_flight -= 1
+        if session in self.sessions:
+            self._idle.append(session)
+        self._dispatch()
+
+    def stats(self) -> Dict:
+        """Pool size, idle sessions and per-lane queue statistics."""
+        return {
+            "size": self.size,
+            "live": len(self.sessions),
+            "idle": len(self._idle),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()}
+        }
+
+    def _grant(self, lane: Lane, waited: float) -> Manager:
+        lane.in_flight += 1
+        lane.record_wait(waited)
+        return self._idle.pop()
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._idle and self._waiters:
+            eligible = [
+                w for w in self._waiters
+                if self.lanes[w[2]].in_flight < self.lanes[w[2]].concurrency
+            ]
+            if not eligible:
+                return
+            entry = min(eligible)
+            self._waiters.remove(entry)
+            _, _, lane_name, enqueued_at, waiter = entry
+            lane = self.lanes[lane_name]
+            lane.queued -= 1
+            if waiter.done():
+                continue
+            waiter.set_result(self._grant(lane, loop.time() - enqueued_at))
+
+    def _event_handler(self, callback: Callable) -> Callable:
+        def handler(manager, message):
+            if not self.retired:
+                return callback(manager, message)
+        return handler
+
+    async def _open(self, session: 'SupervisedManager', timeout: float):
+        """Dial a session and wait until AMI accepts its login.
+
+        A connection that drops before the login is answered fails the
+        login straight away (see _on_disconnect) rather than at timeout.
+        """
+        self._opening.add(session)
+        try:
+            await asyncio.wait_for(session.open(), timeout)
+            await asyncio.wait_for(session.logged_in, timeout)
+        finally:
+            self._opening.discard(session)
+
+    def _on_login(self, session: 'SupervisedManager'):
+        if not session.logged_in.done():
+            session.logged_in.set_result(True)
+
+    def _on_disconnect(self, session: 'SupervisedManager', exc: Optional[Exception]):
+        """Take a dropped session out of service, or fail its pending login."""
+        if session in self._opening:
+            if not session.logged_in.done():
+                session.logged_in.set_exception(
+                    ConnectionError(f"AMI connection lost during login: {exc or 'connection closed'}")
+                )
+            return
+        if session in self.sessions:
+            logger.warning(f"AMI session lost: {exc or 'connection closed'}")
+            self.sessions.remove(session)
+            if session in self._idle:
+                self._idle.remove(session)
+            session.close()
+            self.changed.set()
+
+    def _new_session(self, events: bool) -> 'SupervisedManager':
+        session = SupervisedManager(
+            host=config.ami_host,
+            port=config.ami_port,
+            username=config.ami_username,
+            secret=config.ami_password,
+            events='on' if events else 'off',
+            ping_delay=60,
+            ping_attempts=3,
+            on_login=self._on_login,
+            on_disconnect=self._on_disconnect
+        )
+        session.logged_in = asyncio.get_running_loop().create_future()
+        return session
@@ -1,17 +1,30 @@
 """ASL Agent - REST API for AllStar Link node control."""
 import asyncio
 import logging
-from datetime import datetime
-from typing import Dict, Optional
+import signal
+from typing import Dict, List, Literal, Optional, Set
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Header, Depends, status
-from fastapi.responses import JSONResponse
+import yaml
+
+from fastapi import FastAPI, HTTPException, Header, Depends, Query, Request, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
-from config import config
-from ami_client import ami_client
+from config import ConfigError, config
+from admission import AdmissionGate, RateLimiter, retry_after
+from audit import InvalidCursorError, audit_writer, query_audit
+from ami_client import LocalNode, UnknownNodeError, ami_client
+from ami_pool import AMIUnavailableError, PoolFullError
 from event_handler import EventHandler
+from event_stream import event_stream
+from jobs import JobStoreFullError, job_store
+from link_history import link_history
+from metrics import CONTENT_TYPE, HTTPMetricsMiddleware, metrics
+from node_directory import node_directory
+from stats_series import FIELDS as SERIES_FIELDS, stats_series
+from tracing import ServerTimingMiddleware, phase, span_exporter
+from webhooks import webhook_dispatcher
 
 # Configure logging
 logging.basicConfig(
@@ -20,28 +33,85 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize event handler
-event_handler = EventHandler(ami_client)
-monitoring_task: Optional[asyncio.Task] = None
+# One event handler (and reconciliation loop) per local node
+event_handlers: Dict[str, EventHandler] = {
+    number: EventHandler(ami_client, number) for number in ami_client.local_nodes
+}
+monitoring_tasks: List[asyncio.Task] = []
+supervisor_task: Optional[asyncio.Task] = None
+config_watch_task: Optional[asyncio.Task] = None
+reload_tasks: Set[asyncio.Task] = set()
+reload_lock = asyncio.Lock()
+
+# Admission control in front of AMI
+rate_limiter = RateLimiter(config.rate_limit, config.read_rate_limit, config.route_limits)
+link_gate = AdmissionGate(config.max_inflight)
+
+# Settings baked into a subsystem when it starts; changing one restarts it
+AMI_SETTINGS = frozenset({
+    'ami_host', 'ami_port', 'ami_username', 'ami_password', 'ami_pool_size', 'ami_lanes'
+})
+CACHE_SETTINGS = frozenset({'cache_ttl', 'cache_stale'})
+WEBHOOK_SETTINGS = frozenset({
+    'webhooks_enabled', 'n8n_url', 'webhook_sinks', 'webhook_timeout',
+    'webhook_queue_size', 'webhook_spool_dir'
+})
+AUDIT_SETTINGS = frozenset({
+    'audit_dir', 'audit_flush', 'audit_fsync', 'audit_flush_interval',
+    'audit_max_bytes', 'audit_retention_days'
+})
+EVENT_SETTINGS = frozenset({'events_buffer_size', 'events_queue_size'})
+JOB_SETTINGS = frozenset({'jobs_max', 'jobs_retention'})
+TRACING_SETTINGS = frozenset({
+    'tracing_export_file', 'tracing_export_min_ms', 'tracing_export_max_bytes'
+})
+RATE_SETTINGS = frozenset({'rate_limit', 'read_rate_limit', 'route_limits'})
+HISTORY_SETTINGS = frozenset({'history_file', 'history_retention_days'})
+ACTIVITY_SETTINGS = frozenset({'activity_window', 'activity_bucket', 'activity_max_nodes'})
+SERIES_SETTINGS = frozenset({'series_interval', 'series_resolutions'})
+DIRECTORY_SETTINGS = frozenset({
+    'directory_file', 'directory_index_file', 'directory_refresh_interval'
+})
+# Settings only read at startup
+RESTART_SETTINGS = frozenset({
+    'local_nodes', 'node_number', 'node_callsign', 'api_host', 'api_port', 'audit_file'
+})
 
 
 # Lifespan context manager for startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle application startup and shutdown."""
-    global monitoring_task
+    global supervisor_task, config_watch_task
     
     # Startup
     logger.info("Starting ASL Agent...")
+    await audit_writer.start()
+    await span_exporter.start()
+    await link_history.start()
     try:
-        await ami_client.connect()
-        await event_handler.start()
+        await node_directory.start()
+        # Serve immediately; the supervisor connects (and reconnects) AMI in the background
+        await webhook_dispatcher.start()
+        for handler in event_handlers.values():
+            await handler.start()
+        supervisor_task = asyncio.create_task(ami_client.supervise())
+        
+        # Link state is pushed from AMI events; this is the slow reconciliation poll
+        monitoring_tasks.extend(
+            asyncio.create_task(handler.monitoring_loop()) for handler in event_handlers.values()
+        )
+        await stats_series.start()
         
-        # Start monitoring loop (disabled if webhooks disabled)
-        if config.webhooks_enabled:
-            monitoring_task = asyncio.create_task(event_handler.monitoring_loop())
+        # Hot reload: SIGHUP (systemctl reload) or an edit to config.yaml
+        config_watch_task = asyncio.create_task(watch_config())
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, schedule_reload)
+        except (AttributeError, NotImplementedError):
+            pass  # No SIGHUP on this platform
         
-        logger.info(f"ASL Agent started for node {config.node_number} ({config.node_callsign})")
+        nodes = ", ".join(f"{n.number} ({n.callsign})" for n in ami_client.local_nodes.values())
+        logger.info(f"ASL Agent started for node(s) {nodes}")
         yield
     except Exception as e:
         logger.error(f"Startup failed: {e}")
@@ -49,18 +119,132 @@ async def lifespan(app: FastAPI):
     finally:
         # Shutdown
         logger.info("Shutting down ASL Agent...")
-        if monitoring_task:
-            monitoring_task.cancel()
-            try:
-                await monitoring_task
-            except asyncio.CancelledError:
-                pass
+        for task in monitoring_tasks + [supervisor_task, config_watch_task]:
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        await stats_series.stop()
+        await node_directory.stop()
+        await job_store.cancel_all()
         
-        await event_handler.stop()
+        for handler in event_handlers.values():
+            await handler.stop()
+        # Unsent webhook events are spooled to disk and resent on next start
+        await webhook_dispatcher.stop()
+        await span_exporter.stop()
+        await link_history.stop()
+        # Last, so shutdown-time records are written: drains the queue, flushes and fsyncs
+        await audit_writer.stop()
         await ami_client.disconnect()
         logger.info("ASL Agent stopped")
 
 
+async def reload_config() -> List[str]:
+    """Re-read config.yaml and reconfigure only the subsystems whose settings changed.
+    
+    In-flight requests keep the settings they started with; AMI switches
+    over to a freshly logged-in pool without dropping running commands.
+    """
+    async with reload_lock:
+        try:
+            changed = config.reload()
+        except (OSError, yaml.YAMLError, ConfigError) as e:
+            logger.error(f"Config reload failed, keeping current settings: {e}")
+            return []
+        if not changed:
+            logger.info("Config reloaded: no changes")
+            return []
+        
+        names = sorted(changed)
+        logger.info(f"Config reloaded, changed: {', '.join(names)}")
+        audit_log("config_reload", details=", ".join(names))
+        
+        if 'log_level' in changed:
+            logging.getLogger().setLevel(config.log_level)
+        if changed & AMI_SETTINGS:
+            ami_client.reload()
+        if changed & CACHE_SETTINGS:
+            ami_client.configure_caches()
+        if changed & EVENT_SETTINGS:
+            event_stream.resize(config.events_buffer_size, config.events_queue_size)
+        if changed & JOB_SETTINGS:
+            job_store.configure(config.jobs_max, config.jobs_retention)
+        if changed & RATE_SETTINGS:
+            rate_limiter.configure(config.rate_limit, config.read_rate_limit, config.route_limits)
+        if 'max_inflight' in changed:
+            link_gate.limit = config.max_inflight
+        if changed & TRACING_SETTINGS:
+            span_exporter.configure(
+                config.tracing_export_file, config.tracing_export_min_ms, config.tracing_export_max_bytes
+            )
+        if changed & WEBHOOK_SETTINGS:
+            try:
+                await webhook_dispatcher.restart()
+            except ValueError as e:
+                logger.error(f"Webhook reload failed, keeping current sinks: {e}")
+        if changed & ACTIVITY_SETTINGS:
+            for handler in event_handlers.values():
+                handler.activity.configure(
+                    config.activity_window, config.activity_bucket, config.activity_max_nodes
+                )
+        if changed & SERIES_SETTINGS:
+            await stats_series.reconfigure(config.series_interval, config.series_resolutions)
+        if changed & DIRECTORY_SETTINGS:
+            await node_directory.reconfigure(
+                config.directory_file, config.directory_index_file, config.directory_refresh_interval
+            )
+        if changed & HISTORY_SETTINGS:
+            await link_history.reconfigure(config.history_file, config.history_retention_days)
+            for handler in event_handlers.values():
+                link_history.reconcile(handler.node.number, {
+                    node: handler.node_modes.get(node, "") for node in handler.connected_nodes
+                })
+        if changed & AUDIT_SETTINGS:
+            await audit_writer.reconfigure(
+                config.audit_dir, config.audit_flush, config.audit_fsync,
+                config.audit_flush_interval, config.audit_max_bytes, config.audit_retention_days
+            )
+        
+        pending = changed & RESTART_SETTINGS
+        if pending:
+            logger.warning(f"Restart the agent to apply: {', '.join(sorted(pending))}")
+        return names
+
+
+def schedule_reload():
+    """SIGHUP handler."""
+    task = asyncio.create_task(reload_config())
+    reload_tasks.add(task)
+    task.add_done_callback(reload_tasks.discard)
+
+
+async def watch_config():
+    """Reload when config.yaml changes on disk (every reload.watch_interval seconds, 0 = off).
+    
+    A change is acted on once the file has looked the same on two polls
+    in a row, so a half-written file is not loaded.
+    """
+    seen = config.file_signature
+    pending = None
+    while True:
+        interval = config.reload_watch_interval
+        await asyncio.sleep(interval or 60)
+        if not interval:
+            continue
+        signature = config.stat()
+        if signature is None or signature in (seen, config.file_signature):
+            pending = None
+            continue
+        if signature != pending:
+            pending = signature
+            continue
+        seen, pending = signature, None
+        await reload_config()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="ASL Agent",
@@ -68,31 +252,178 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan
 )
+app.add_middleware(HTTPMetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+
+
+# Metrics read from the subsystems at scrape time
+def collect_metrics():
+    """Gauges and counters for GET /metrics, from the stats each subsystem keeps."""
+    yield ("asl_ami_up", "gauge", "1 while AMI is connected (up or degraded)",
+           [({}, 1 if ami_client.connected else 0)])
+    yield ("asl_ami_reconnects_total", "counter", "AMI reconnect attempts by the supervisor",
+           [({}, ami_client.reconnects)])
+    lanes = ami_client.pool.lanes.items()
+    yield ("asl_ami_lane_in_flight", "gauge", "AMI commands running, by pool lane",
+           [({"lane": name}, lane.in_flight) for name, lane in lanes])
+    yield ("asl_ami_lane_queued", "gauge", "AMI commands waiting for a session, by pool lane",
+           [({"lane": name}, lane.queued) for name, lane in lanes])
+    
+    caches = [
+        (number, name, cache)
+        for number, node in ami_client.local_nodes.items()
+        for name, cache in (("stats", node.stats_cache), ("nodes", node.nodes_cache))
+    ]
+    yield ("asl_cache_requests_total", "counter", "Snapshot cache lookups by result (hit, stale, miss)", [
+        ({"node": number, "cache": name, "result": result}, count)
+        for number, name, cache in caches
+        for result, count in (("hit", cache.hits), ("stale", cache.stale_hits), ("miss", cache.misses))
+    ])
+    ratios = []
+    for number, name, cache in caches:
+        total = cache.hits + cache.stale_hits + cache.misses
+        ratios.append(({"node": number, "cache": name},
+                       (cache.hits + cache.stale_hits) / total if total else 0))
+    yield ("asl_cache_hit_ratio", "gauge", "Share of cache lookups answered without waiting on AMI", ratios)
+    
+    yield ("asl_connected_nodes", "gauge", "Nodes linked to each local node, as tracked from AMI events",
+           [({"node": number}, len(handler.connected_nodes)) for number, handler in event_handlers.items()])
+    talkers = [
+        (number, source, talker)
+        for number, handler in event_handlers.items()
+        for source, talker in (("rx", handler.activity.rx), ("tx", handler.activity.tx))
+    ]
+    yield ("asl_keyups_total", "counter", "Keyups per local node receiver (rx) and transmitter (tx)",
+           [({"node": number, "source": source}, talker.keyups) for number, source, talker in talkers])
+    yield ("asl_talk_seconds_total", "counter", "Completed transmission time per local node receiver and transmitter",
+           [({"node": number, "source": source}, talker.talk) for number, source, talker in talkers])
+    
+    sinks = webhook_dispatcher.sinks
+    yield ("asl_webhook_queued", "gauge", "Events waiting in each webhook sink queue",
+           [({"sink": sink.name}, sink.queue.qsize()) for sink in sinks])
+    yield ("asl_webhook_events_sent_total", "counter", "Events delivered by each webhook sink",
+           [({"sink": sink.name}, sink.metrics["events_sent"]) for sink in sinks])
+    yield ("asl_webhook_attempts_failed_total", "counter", "Failed webhook POST attempts",
+           [({"sink": sink.name}, sink.metrics["attempts_failed"]) for sink in sinks])
+    
+    yield ("asl_rate_limited_total", "counter", "Requests refused by the per-key route rate limits",
+           [({}, rate_limiter.limited)])
+    yield ("asl_link_work_in_flight", "gauge", "Link operations running (sync and async)",
+           [({}, link_gate.inflight)])
+    yield ("asl_link_work_shed_total", "counter", "Link operations refused at the in-flight cap",
+           [({}, link_gate.shed)])
+    yield ("asl_jobs", "gauge", "Jobs held, by status",
+           [({"status": state}, count) for state, count in job_store.stats().items()])
+    yield ("asl_event_subscribers", "gauge", "Open GET /events streams",
+           [({}, event_stream.stats()["subscribers"])])
+
+
+metrics.add_collector(collect_metrics)
 
 
 # Security: API Key validation
 async def verify_api_key(x_api_key: str = Header(...)):
     """Verify API key from request header."""
-    if x_api_key != config.api_key:
-        logger.warning("Invalid API key attempt")
+    with phase('auth'):
+        if x_api_key != config.api_key:
+            logger.warning("Invalid API key attempt")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key"
+            )
+    return x_api_key
+
+
+# Rate limiting: a token bucket per API key and route
+async def rate_limit(request: Request, x_api_key: str = Depends(verify_api_key)):
+    """Reject requests over the route's per-minute limit with 429."""
+    route = request.scope['route']
+    with phase('auth'):
+        wait = rate_limiter.check(x_api_key, route, request.app.router.routes)
+    if wait:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid API key"
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded for {route.path}",
+            headers={"Retry-After": retry_after(wait)}
         )
-    return x_api_key
 
 
-# Audit logging
-def audit_log(command: str, user: str = "api", details: str = ""):
-    """Log command execution to audit file."""
-    timestamp = datetime.utcnow().isoformat()
-    log_entry = f"{timestamp} | {user} | {command} | {details}\n"
+# AMI availability: fail fast instead of queueing behind a dead connection
+async def require_ami():
+    """Reject requests with 503 while AMI is not connected."""
+    if not ami_client.connected:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"AMI not connected ({ami_client.state})",
+            headers={"Retry-After": "5"}
+        )
+
+
+# Local node selection: /nodes/{local}/... routes, or the default node
+async def local_node(local: Optional[str] = None) -> LocalNode:
+    """Resolve the local node a request targets (404 if not configured)."""
+    try:
+        return ami_client.node(local)
+    except UnknownNodeError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+def _via(node: LocalNode) -> str:
+    """Audit suffix naming the local node, when there is more than one."""
+    return f" via {node.number}" if len(ami_client.local_nodes) > 1 else ""
+
+
+# Admission: cap link operations in flight and shed the excess with 429
+def admit(work):
+    """Take a link work slot, or close work and refuse the request."""
+    if not link_gate.try_enter():
+        work.close()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many link operations in flight ({link_gate.limit})",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def run_link_work(kind: str, node: LocalNode, work, run_async: bool = False):
+    """Run link work under the in-flight cap, now or as a background job."""
+    admit(work)
+    if run_async:
+        return submit_job(kind, node, work)
+    try:
+        return await work
+    finally:
+        link_gate.leave()
+
+
+# Async mode: run link work as a background job and answer 202 right away
+def submit_job(kind: str, node: LocalNode, work) -> JSONResponse:
+    """Start admitted work as a job; the client polls (or waits on) GET /jobs/{id}.
     
+    The job holds its link work slot until it finishes.
+    """
     try:
-        with open(config.audit_file, 'a') as f:
-            f.write(log_entry)
-    except Exception as e:
-        logger.error(f"Audit log failed: {e}")
+        job = job_store.submit(kind, node.number, work)
+    except JobStoreFullError as e:
+        link_gate.leave()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+    job.task.add_done_callback(link_gate.leave)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=job.to_dict(),
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+
+# Audit logging
+def audit_log(command: str, user: str = "api", details: str = ""):
+    """Queue a command for the audit log (written in the background)."""
+    with phase('audit'):
+        audit_writer.record(command, user, details)
 
 
 # Pydantic models
@@ -103,6 +434,13 @@ class ConnectRequest(BaseModel):
 class DisconnectRequest(BaseModel):
     node: str = Field(..., description="Node number to disconnect")
 
+class BatchOperation(BaseModel):
+    action: Literal["connect", "monitor", "disconnect"] = Field(..., description="Link operation")
+    node: str = Field(..., description="Node number to operate on")
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=25, description="Operations, run in order")
+
 
 # API Routes
 
@@ -111,44 +449,101 @@ async def root():
     """Health check endpoint."""
     return {
         "service": "ASL Agent",
+        "version": app.version,
         "node": config.node_number,
         "callsign": config.node_callsign,
+        "local_nodes": list(ami_client.local_nodes),
         "status": "running",
-        "ami_connected": ami_client.connected
+        "ami_connected": ami_client.connected,
+        "ami_state": ami_client.state
     }
 
 
-@app.get("/status", dependencies=[Depends(verify_api_key)])
-async def get_status():
-    """Get node status and statistics."""
+@app.get("/diagnostics", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def diagnostics():
+    """Internal counters: AMI lanes, jobs, events, webhooks, admission, tracing and more."""
+    return {
+        "ami_state": ami_client.state,
+        "ami_pool": ami_client.pool.stats(),
+        "jobs": job_store.stats(),
+        "events": event_stream.stats(),
+        "webhooks": webhook_dispatcher.stats(),
+        "audit": audit_writer.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "link_work": link_gate.stats(),
+        "tracing": span_exporter.stats(),
+        "history": link_history.stats(),
+        "series": stats_series.stats(),
+        "directory": node_directory.stats()
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics (text exposition format)."""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/status", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+@app.get("/nodes/{local}/status", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+async def get_status(raw: bool = False, node: LocalNode = Depends(local_node)):
+    """Get node status and statistics (add ?raw=true for raw rpt stats lines)."""
     try:
-        stats = await ami_client.get_node_stats()
-        audit_log("status", details="Status retrieved")
+        stats = await ami_client.get_node_stats(raw, node.number)
+        audit_log("status", details=f"Status retrieved{_via(node)}")
         return stats
+    except (AMIUnavailableError, asyncio.TimeoutError) as e:
+        raise HTTPException(status_code=503, detail=str(e) or "AMI command timed out")
+    except PoolFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Status error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/nodes", dependencies=[Depends(verify_api_key)])
-async def get_nodes():
+@app.get("/status/all", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+async def get_all_status(raw: bool = False):
+    """Get status of every local node, queried concurrently."""
+    nodes = await ami_client.get_all_stats(raw)
+    failed = [number for number, stats in nodes.items() if "error" in stats]
+    audit_log("status-all", details=f"{len(nodes) - len(failed)}/{len(nodes)} nodes retrieved")
+    return {"nodes": nodes, "count": len(nodes), "failed": failed}
+
+
+@app.get("/nodes", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+@app.get("/nodes/{local}/links", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+async def get_nodes(node: LocalNode = Depends(local_node)):
     """Get list of connected nodes."""
     try:
-        nodes = await ami_client.get_connected_nodes()
-        audit_log("nodes", details=f"{len(nodes)} nodes connected")
-        return {"connected_nodes": nodes, "count": len(nodes)}
+        nodes = await ami_client.get_connected_nodes(local=node.number)
+        audit_log("nodes", details=f"{len(nodes)} nodes connected{_via(node)}")
+        return {
+            "connected_nodes": nodes,
+            "count": len(nodes),
+            "cache_age": node.nodes_cache.age
+        }
+    except (AMIUnavailableError, asyncio.TimeoutError) as e:
+        raise HTTPException(status_code=503, detail=str(e) or "AMI command timed out")
+    except PoolFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Nodes error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/connect", dependencies=[Depends(verify_api_key)])
-async def connect_node(request: ConnectRequest):
-    """Connect to another AllStar node."""
+@app.post("/connect", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+@app.post("/nodes/{local}/connect", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+async def connect_node(request: ConnectRequest, node: LocalNode = Depends(local_node),
+                       run_async: bool = Query(False, alias="async")):
+    """Connect to another AllStar node (?async=true answers 202 with a job id)."""
+    return await run_link_work("connect", node, _connect_node(request, node), run_async)
+
+
+async def _connect_node(request: ConnectRequest, node: LocalNode) -> Dict:
     try:
         mode = "monitor" if request.monitor_only else "transceive"
-        result = await ami_client.connect_node(request.node, request.monitor_only)
-        audit_log("connect", details=f"Node {request.node} ({mode})")
+        result = await ami_client.connect_node(request.node, request.monitor_only, node.number)
+        audit_log("connect", details=f"Node {request.node} ({mode}){_via(node)}")
         
         if not result.get("success"):
             raise HTTPException(status_code=400, detail=result.get("error"))
@@ -157,21 +552,32 @@ async def connect_node(request: ConnectRequest):
             "success": True,
             "message": f"Connected to node {request.node} in {mode} mode",
             "node": request.node,
-            "mode": mode
+            "mode": mode,
+            "time_to_link": result.get("time_to_link")
         }
     except HTTPException:
         raise
+    except (AMIUnavailableError, asyncio.TimeoutError) as e:
+        raise HTTPException(status_code=503, detail=str(e) or "AMI command timed out")
+    except PoolFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Connect error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/disconnect", dependencies=[Depends(verify_api_key)])
-async def disconnect_node(request: DisconnectRequest):
-    """Disconnect from a specific node."""
+@app.post("/disconnect", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+@app.post("/nodes/{local}/disconnect", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+async def disconnect_node(request: DisconnectRequest, node: LocalNode = Depends(local_node),
+                          run_async: bool = Query(False, alias="async")):
+    """Disconnect from a specific node (?async=true answers 202 with a job id)."""
+    return await run_link_work("disconnect", node, _disconnect_node(request, node), run_async)
+
+
+async def _disconnect_node(request: DisconnectRequest, node: LocalNode) -> Dict:
     try:
-        result = await ami_client.disconnect_node(request.node)
-        audit_log("disconnect", details=f"Node {request.node}")
+        result = await ami_client.disconnect_node(request.node, node.number)
+        audit_log("disconnect", details=f"Node {request.node}{_via(node)}")
         
         if not result.get("success"):
             raise HTTPException(status_code=400, detail=result.get("error"))
@@ -179,45 +585,235 @@ async def disconnect_node(request: DisconnectRequest):
         return {
             "success": True,
             "message": f"Disconnected from node {request.node}",
-            "node": request.node
+            "node": request.node,
+            "time_to_unlink": result.get("time_to_unlink")
         }
     except HTTPException:
         raise
+    except (AMIUnavailableError, asyncio.TimeoutError) as e:
+        raise HTTPException(status_code=503, detail=str(e) or "AMI command timed out")
+    except PoolFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Disconnect error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/disconnect-all", dependencies=[Depends(verify_api_key)])
-async def disconnect_all():
+@app.post("/disconnect-all", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+@app.post("/nodes/{local}/disconnect-all", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+async def disconnect_all(node: LocalNode = Depends(local_node)):
     """Disconnect from all nodes."""
+    return await run_link_work("disconnect-all", node, _disconnect_all(node))
+
+
+async def _disconnect_all(node: LocalNode) -> Dict:
     try:
-        result = await ami_client.disconnect_all()
-        audit_log("disconnect-all", details="All nodes disconnected")
+        result = await ami_client.disconnect_all(node.number)
+        audit_log("disconnect-all", details=f"All nodes disconnected{_via(node)}")
         
         return {
             "success": True,
             "message": "Disconnected from all nodes"
         }
+    except (AMIUnavailableError, asyncio.TimeoutError) as e:
+        raise HTTPException(status_code=503, detail=str(e) or "AMI command timed out")
+    except PoolFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Disconnect all error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/audit", dependencies=[Depends(verify_api_key)])
-async def get_audit_log(lines: int = 50):
-    """Get recent audit log entries."""
+@app.post("/batch", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+@app.post("/nodes/{local}/batch", dependencies=[Depends(verify_api_key), Depends(rate_limit), Depends(require_ami)])
+async def batch(request: BatchRequest, node: LocalNode = Depends(local_node),
+                run_async: bool = Query(False, alias="async")):
+    """Run several connect/monitor/disconnect operations in one request."""
+    nodes = [op.node for op in request.operations]
+    if len(set(nodes)) != len(nodes):
+        raise HTTPException(status_code=400, detail="Each node may appear only once per batch")
+    
+    return await run_link_work("batch", node, _batch(request, node), run_async)
+
+
+async def _batch(request: BatchRequest, node: LocalNode) -> Dict:
     try:
-        with open(config.audit_file, 'r') as f:
-            all_lines = f.readlines()
-            recent = all_lines[-lines:] if len(all_lines) > lines else all_lines
+        start = asyncio.get_running_loop().time()
+        results = await ami_client.run_link_operations(
+            [(op.action, op.node) for op in request.operations], node.number
+        )
+        elapsed = round(asyncio.get_running_loop().time() - start, 3)
         
+        for result in results:
+            outcome = "ok" if result["success"] else "failed"
+            audit_log("batch", details=f"{result['action']} node {result['node']} ({outcome}){_via(node)}")
+        
+        succeeded = sum(1 for result in results if result["success"])
         return {
-            "entries": [line.strip() for line in recent],
-            "count": len(recent)
+            "success": succeeded == len(results),
+            "message": f"{succeeded}/{len(results)} operations succeeded",
+            "results": results,
+            "elapsed": elapsed
         }
-    except FileNotFoundError:
-        return {"entries": [], "count": 0}
+    except (AMIUnavailableError, asyncio.TimeoutError) as e:
+        raise HTTPException(status_code=503, detail=str(e) or "AMI command timed out")
+    except PoolFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Batch error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def get_job(job_id: str, wait: float = 0):
+    """Get a job's state; ?wait=N blocks up to N seconds for it to finish."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found (or expired)")
+    
+    await job_store.wait(job, min(wait, config.jobs_max_wait))
+    return job.to_dict()
+
+
+@app.get("/events", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def stream_events(
+    node: Optional[str] = None,
+    last_event_id: Optional[int] = Header(None),
+    since: Optional[int] = None
+):
+    """Server-sent stream of link and keying events.
+    
+    Reconnect with the Last-Event-ID header (or ?since=ID) to resume; a
+    "reset" event means events were missed and state should be re-read.
+    ?node= limits the stream to one local node.
+    """
+    if node is not None:
+        await local_node(node)
+    resume = last_event_id if last_event_id is not None else since
+    
+    async def frames():
+        yield "retry: 3000\n\n"
+        async for event in event_stream.subscribe(resume, config.events_heartbeat):
+            if event is None:
+                yield ": keep-alive\n\n"
+            elif node is None or event.id is None or event.data.get("node") == node:
+                yield event.to_sse()
+    
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/history", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+@app.get("/nodes/{local}/history", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def get_history(
+    days: int = Query(7, ge=0, le=3650),
+    top: int = Query(20, ge=1, le=500),
+    remote: Optional[str] = None,
+    node: LocalNode = Depends(local_node)
+):
+    """Link time per remote node from the history rollups, most linked first.
+    
+    days counts back from today in UTC days (0 = all time); links still up
+    count up to now. ?remote= narrows it to one node and adds its recent
+    sessions.
+    """
+    if not link_history.running:
+        raise HTTPException(status_code=503, detail="Link history is not enabled (history.file)")
+    try:
+        return await link_history.query(node.number, days, top, remote)
+    except Exception as e:
+        logger.error(f"History error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/activity", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+@app.get("/nodes/{local}/activity", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def get_activity(top: int = Query(20, ge=1, le=500), node: LocalNode = Depends(local_node)):
+    """Keying activity from AMI events: keyups, talk time, longest transmission and busy ratio.
+    
+    rx and tx are the local node's receiver and transmitter; linked_nodes
+    are the top linked nodes by talk time in the rolling window.
+    """
+    return {"node": node.number, **event_handlers[node.number].activity.snapshot(top)}
+
+
+@app.get("/stats/series", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+@app.get("/nodes/{local}/stats/series", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def get_stats_series(
+    window: int = Query(3600, ge=1, le=366 * 86400),
+    fields: Optional[str] = None,
+    step: Optional[float] = Query(None, gt=0),
+    node: LocalNode = Depends(local_node)
+):
+    """Sampled rpt stats fields over the last window seconds, one array per field.
+    
+    ?fields= is a comma-separated subset (default: all). The finest
+    resolution covering the window is used unless ?step= picks one. Values
+    are oldest first, one per step from start; null where no sample was taken.
+    """
+    if not stats_series.running:
+        raise HTTPException(status_code=503, detail="Stats sampling is not enabled (series.interval)")
+    names = [f for f in fields.split(",") if f] if fields else list(SERIES_FIELDS)
+    unknown = [f for f in names if f not in SERIES_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    try:
+        series = stats_series.query(node.number, window, names, step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Plain lists of numbers: skip the per-value walk of response serialization
+    return JSONResponse(series)
+
+
+@app.get("/directory", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def search_directory(q: str = Query(..., min_length=1, max_length=100),
+                           limit: int = Query(20, ge=1, le=500)):
+    """Search the AllStar node directory by node number, callsign prefix or location words."""
+    if not node_directory.loaded:
+        raise HTTPException(status_code=503, detail="Node directory is not loaded (directory.file)")
+    results = node_directory.search(q, limit)
+    return {"query": q, "count": len(results), "results": results}
+
+
+@app.get("/directory/{number}", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def get_directory_entry(number: str):
+    """One node's directory entry: callsign, description and location."""
+    if not node_directory.loaded:
+        raise HTTPException(status_code=503, detail="Node directory is not loaded (directory.file)")
+    entry = node_directory.lookup(number)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Node {number} is not in the directory")
+    return entry
+
+
+@app.get("/audit", dependencies=[Depends(verify_api_key), Depends(rate_limit)])
+async def get_audit_log(
+    lines: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    command: Optional[str] = None,
+    node: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """Get recent audit log entries.
+    
+    Pass next_cursor back as ?cursor= for the page before. command, node
+    (any node number in the details) and since/until (ISO times, UTC if no
+    offset) filter the entries.
+    """
+    try:
+        with phase('audit'):
+            await audit_writer.flush()
+            return await asyncio.to_thread(
+                query_audit, config.audit_dir, lines, cursor, command, node, since, until
+            )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {e}")
     except Exception as e:
         logger.error(f"Audit log error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
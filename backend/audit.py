@@ -0,0 +1,598 @@
+"""Audit log: a buffered background writer over time-indexed JSONL segments.
+
+Records live in ``audit_dir`` as ``audit-YYYYMMDD-NNN.jsonl`` segments, one
+JSON object per line. A new segment starts each UTC day (or when the current
+one reaches ``max_bytes``); closed segments are gzip-compressed. Next to
+every segment an ``.idx`` file holds a sparse index: one ``timestamp offset``
+line per ~64 KB block. Compressed segments are written as one gzip member per
+block, so the same index lets a reader seek straight to any block of either
+form, and time-range queries only open the segments and blocks they need.
+"""
+import asyncio
+import base64
+import binascii
+import bisect
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Uncompressed bytes between sparse index entries (one gzip member each)
+INDEX_EVERY = 65536
+
+SEGMENT_RE = re.compile(r'^audit-(\d{8})-(\d+)\.jsonl(\.gz)?$')
+
+# Flush/fsync policies
+POLICY_RECORD = 'record'      # after every write
+POLICY_INTERVAL = 'interval'  # at most every flush_interval seconds
+POLICY_SHUTDOWN = 'shutdown'  # only when the writer stops
+POLICIES = (POLICY_RECORD, POLICY_INTERVAL, POLICY_SHUTDOWN)
+
+
+class InvalidCursorError(ValueError):
+    """Raised for a malformed cursor or one whose segment has expired."""
+
+
+def format_record(record: Dict) -> str:
+    """The classic ``timestamp | user | command | details`` line."""
+    return (f"{record.get('ts', '')} | {record.get('user', '')} | "
+            f"{record.get('command', '')} | {record.get('details', '')}")
+
+
+def normalize_time(value: str) -> str:
+    """ISO time (any offset) -> the naive-UTC ISO form audit records use."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(timespec='microseconds')
+
+
+def list_segments(directory: Path) -> List[str]:
+    """Segment names (without .gz), oldest first."""
+    if not directory.is_dir():
+        return []
+    found = {}
+    for entry in os.listdir(directory):
+        match = SEGMENT_RE.match(entry)
+        if match:
+            name = entry[:-3] if match.group(3) else entry
+            found[name] = (match.group(1), int(match.group(2)))
+    return sorted(found, key=found.get)
+
+
+def segment_day(name: str) -> str:
+    """audit-20261016-000.jsonl -> 2026-10-16"""
+    day = SEGMENT_RE.match(name).group(1)
+    return f"{day[:4]}-{day[4:6]}-{day[6:]}"
+
+
+def read_index(path: Path) -> List[Tuple[str, int]]:
+    """Parse a sparse index file; a torn last line is ignored."""
+    index = []
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2 and line.endswith('\n'):
+                index.append((parts[0], int(parts[1])))
+    return index
+
+
+def open_segment(directory: Path, name: str) -> Tuple[IO[bytes], bool, List[Tuple[str, int]]]:
+    """Open a segment in whichever form it is in: (file, compressed, index).
+
+    The compressed form wins. The plain file may vanish while it is being
+    compressed, in which case the compressed one is picked up on retry.
+    """
+    for _ in range(2):
+        for compressed, data in ((True, directory / f"{name}.gz"), (False, directory / name)):
+            try:
+                index = read_index(data.with_name(data.name + '.idx'))
+                return open(data, 'rb'), compressed, index
+            except FileNotFoundError:
+                continue
+    raise FileNotFoundError(name)
+
+
+def read_block(f: IO[bytes], index: List[Tuple[str, int]], block: int, compressed: bool) -> List[bytes]:
+    """The lines of one indexed block."""
+    start = index[block][1]
+    f.seek(start)
+    if block + 1 < len(index):
+        data = f.read(index[block + 1][1] - start)
+    else:
+        data = f.read()
+    if compressed:
+        data = gzip.decompress(data)
+    lines = data.split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+class SegmentLog:
+    """Append side of the segment store. Blocking; used from worker threads."""
+
+    def __init__(self, directory: str, max_bytes: int = 0, retention_days: int = 0):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.name: Optional[str] = None
+        self._day: Optional[str] = None
+        self._file: Optional[IO[bytes]] = None
+        self._index: Optional[IO[str]] = None
+        self._size = 0
+        self._indexed_at: Optional[int] = None
+
+    def append(self, records: List[Dict]):
+        """Write records, starting a new segment on a new day or at max_bytes."""
+        chunk: List[bytes] = []
+        for record in records:
+            day = record['ts'][:10]
+            if self._file is None:
+                self._open(day)
+            elif day > self._day or (self.max_bytes and self._size >= self.max_bytes):
+                self._file.write(b''.join(chunk))
+                chunk = []
+                self._rotate(day)
+            if self._indexed_at is None or self._size - self._indexed_at >= INDEX_EVERY:
+                self._index.write(f"{record['ts']} {self._size}\n")
+                self._indexed_at = self._size
+            data = json.dumps(record, separators=(',', ':')).encode() + b'\n'
+            chunk.append(data)
+            self._size += len(data)
+        if chunk:
+            self._file.write(b''.join(chunk))
+
+    def flush(self):
+        if self._file is not None:
+            # Data before index, so the index never points past the data
+            self._file.flush()
+            self._index.flush()
+
+    def fsync(self):
+        if self._file is not None:
+            self.flush()
+            os.fsync(self._file.fileno())
+            os.fsync(self._index.fileno())
+
+    def close(self):
+        if self._file is None:
+            return
+        self.fsync()
+        self._file.close()
+        self._index.close()
+        self._file = self._index = None
+
+    def is_empty(self) -> bool:
+        return not list_segments(self.directory)
+
+    def _open(self, day: str):
+        """Reopen today's newest plain segment, or start a new one."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        names = list_segments(self.directory)
+        for name in names[:-1]:
+            if (self.directory / name).exists():
+                self._compress(name)  # left uncompressed by a crash
+        self._expire()
+        self._day = day
+        if names and (self.directory / names[-1]).exists():
+            last = names[-1]
+            if segment_day(last) == day and not (
+                    self.max_bytes and (self.directory / last).stat().st_size >= self.max_bytes):
+                self._reopen(last)
+                return
+            self._compress(last)
+        self._start(day)
+
+    def _reopen(self, name: str):
+        path = self.directory / name
+        index_path = path.with_name(name + '.idx')
+        size = path.stat().st_size
+        index = read_index(index_path) if index_path.exists() else []
+        # Drop index entries past the data (crash before the data was flushed)
+        index = [(ts, offset) for ts, offset in index if offset < size]
+        with open(index_path, 'w') as f:
+            f.writelines(f"{ts} {offset}\n" for ts, offset in index)
+        self._file = open(path, 'ab')
+        if size:
+            with open(path, 'rb') as f:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    # Torn last record: end it so the next one starts on its own line
+                    self._file.write(b'\n')
+                    size += 1
+        self._index = open(index_path, 'a')
+        self.name = name
+        self._size = size
+        self._indexed_at = index[-1][1] if index else None
+
+    def _start(self, day: str):
+        stamp = day.replace('-', '')
+        seqs = [int(SEGMENT_RE.match(n).group(2)) for n in list_segments(self.directory)
+                if SEGMENT_RE.match(n).group(1) == stamp]
+        name = f"audit-{stamp}-{max(seqs, default=-1) + 1:03d}.jsonl"
+        path = self.directory / name
+        self._file = open(path, 'ab')
+        self._index = open(path.with_name(name + '.idx'), 'a')
+        self.name = name
+        self._size = 0
+        self._indexed_at = None
+
+    def _rotate(self, day: str):
+        name = self.name
+        self.close()
+        self._compress(name)
+        self._expire()
+        self._day = day
+        self._start(day)
+
+    def _compress(self, name: str):
+        """Rewrite a closed segment as one gzip member per index block."""
+        path = self.directory / name
+        index_path = path.with_name(name + '.idx')
+        size = path.stat().st_size
+        index = read_index(index_path) if index_path.exists() else []
+        index = [(ts, offset) for ts, offset in index if offset < size]
+        if not index:
+            path.unlink()
+            index_path.unlink(missing_ok=True)
+            return
+
+        gz_path = path.with_name(name + '.gz')
+        gz_index = []
+        with open(path, 'rb') as src, open(f"{gz_path}.tmp", 'wb') as dst:
+            ends = [offset for _, offset in index[1:]] + [size]
+            for (ts, offset), end in zip(index, ends):
+                src.seek(offset)
+                gz_index.append((ts, dst.tell()))
+                dst.write(gzip.compress(src.read(end - offset)))
+            dst.flush()
+            os.fsync(dst.fileno())
+        with open(f"{gz_path}.idx.tmp", 'w') as f:
+            f.writelines(f"{ts} {offset}\n" for ts, offset in gz_index)
+        # Index first: whenever the .gz exists, its index does too
+        os.replace(f"{gz_path}.idx.tmp", f"{gz_path}.idx")
+        os.replace(f"{gz_path}.tmp", gz_path)
+        path.unlink()
+        index_path.unlink(missing_ok=True)
+
+    def _expire(self):
+        """Delete segments dated more than retention_days ago."""
+        if not self.retention_days:
+            return
+        cutoff = (datetime.utcnow() - timedelta(days=self.retention_days)).date().isoformat()
+        for name in list_segments(self.directory):
+            if segment_day(name) < cutoff and name != self.name:
+                for suffix in ('', '.idx', '.gz', '.gz.idx'):
+                    (self.directory / f"{name}{suffix}").unlink(missing_ok=True)
+
+
+class AuditWriter:
+    """Queue audit records and append them to the segment log in the background.
+
+    record() never blocks: it builds the record and queues it. A writer
+    task drains everything queued into a single append, done in a worker
+    thread. ``flush`` decides when Python's buffers are flushed to the OS
+    and ``fsync`` when the OS is told to put them on disk: after every
+    write ("record"), every ``flush_interval`` seconds ("interval") or only
+    at shutdown ("shutdown"). stop() writes out everything still queued,
+    then flushes and fsyncs.
+    """
+
+    def __init__(self, directory: str, flush: str = POLICY_INTERVAL, fsync: str = POLICY_SHUTDOWN,
+                 flush_interval: float = 1.0, max_bytes: int = 0, retention_days: int = 0,
+                 legacy_file: Optional[str] = None, queue_size: int = 10000):
+        for name, policy in (('flush', flush), ('fsync', fsync)):
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown audit {name} policy: {policy} (use one of {', '.join(POLICIES)})")
+        self.log = SegmentLog(directory, max_bytes, retention_days)
+        self.flush_policy = flush
+        self.fsync_policy = fsync
+        self.flush_interval = flush_interval
+        self.legacy_file = legacy_file
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._unsynced = False
+        self._last_flush = 0.0
+
+    @property
+    def directory(self) -> Path:
+        return self.log.directory
+
+    def record(self, command: str, user: str = "api", details: str = ""):
+        """Queue one audit record."""
+        record = {
+            "ts": datetime.utcnow().isoformat(timespec='microseconds'),
+            "user": user,
+            "command": command,
+            "details": details
+        }
+        if self._task is None:
+            # Not started (or already stopped): write through so nothing is lost
+            try:
+                self._write([record])
+                self._sync(flush=True, fsync=False)
+            except OSError as e:
+                logger.error(f"Audit log failed: {e}")
+            return
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(f"Audit queue full, dropped: {format_record(record)}")
+
+    async def flush(self):
+        """Wait until everything queued so far is written and flushed."""
+        if self._task is None:
+            return
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put(done)
+        await done
+
+    async def start(self):
+        if self.legacy_file:
+            try:
+                await asyncio.to_thread(self._import_legacy, Path(self.legacy_file))
+            except OSError as e:
+                logger.error(f"Audit log import failed: {e}")
+        self._last_flush = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+    async def reconfigure(self, directory: str, flush: str, fsync: str, flush_interval: float,
+                          max_bytes: int, retention_days: int):
+        """Apply new settings (config reload) without losing queued records.
+
+        The writer is stopped (which writes out and fsyncs what it has),
+        reconfigured and started again. The queue is kept, so records
+        arriving meanwhile are written under the new settings.
+        """
+        for name, policy in (('flush', flush), ('fsync', fsync)):
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown audit {name} policy: {policy} (use one of {', '.join(POLICIES)})")
+        running = self._task is not None
+        if running:
+            # _task stays set meanwhile, so record() keeps queueing
+            await self.queue.put(None)
+            await self._task
+            await asyncio.to_thread(self._close)
+        self.log = SegmentLog(directory, max_bytes, retention_days)
+        self.flush_policy = flush
+        self.fsync_policy = fsync
+        self.flush_interval = flush_interval
+        if running:
+            self._last_flush = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write out the queue, flush and fsync, and close the segment."""
+        if self._task is None:
+            return
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+        await asyncio.to_thread(self._close)
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "segment": self.log.name,
+            "flush": self.flush_policy,
+            "fsync": self.fsync_policy
+        }
+
+    async def _run(self):
+        while True:
+            timeout = None
+            if self._interval_pending():
+                timeout = max(0.0, self._last_flush + self.flush_interval - time.monotonic())
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                self._last_flush = time.monotonic()
+                try:
+                    await asyncio.to_thread(self._sync,
+                                            self.flush_policy == POLICY_INTERVAL,
+                                            self.fsync_policy == POLICY_INTERVAL)
+                except OSError as e:
+                    logger.error(f"Audit log sync failed: {e}")
+                continue
+
+            # Take everything already queued in one go
+            items = [item]
+            while not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            records = [i for i in items if isinstance(i, dict)]
+            waiters = [i for i in items if isinstance(i, asyncio.Future)]
+            stopping = None in items
+
+            try:
+                if records:
+                    await asyncio.to_thread(self._write, records)
+                    self.written += len(records)
+                    await asyncio.to_thread(self._sync,
+                                            self.flush_policy == POLICY_RECORD or bool(waiters),
+                                            self.fsync_policy == POLICY_RECORD)
+                elif waiters:
+                    await asyncio.to_thread(self._sync, True, False)
+            except OSError as e:
+                logger.error(f"Audit log failed: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            if stopping:
+                return
+
+    def _interval_pending(self) -> bool:
+        """True if a flush or fsync is waiting for the interval timer."""
+        return ((self._dirty and self.flush_policy == POLICY_INTERVAL)
+                or (self._unsynced and self.fsync_policy == POLICY_INTERVAL))
+
+    def _write(self, records: List[Dict]):
+        """Append records (worker thread)."""
+        self.log.append(records)
+        self._dirty = self._unsynced = True
+
+    def _sync(self, flush: bool, fsync: bool):
+        """Flush Python's buffers and/or fsync (worker thread)."""
+        if (flush or fsync) and self._dirty:
+            self.log.flush()
+            self._dirty = False
+        if fsync and self._unsynced:
+            self.log.fsync()
+            self._unsynced = False
+
+    def _close(self):
+        self.log.close()
+        self._dirty = self._unsynced = False
+
+    def _import_legacy(self, path: Path):
+        """One-off import of the old text audit log into an empty store.
+
+        Imported files are renamed to ``*.imported`` and left in place.
+        """
+        rotated = [p for p in path.parent.glob(f"{path.name}.*") if p.suffix[1:].isdigit()]
+        files = sorted(rotated, key=lambda p: int(p.suffix[1:]), reverse=True)
+        if path.exists():
+            files.append(path)
+        if not files or not self.log.is_empty():
+            return
+
+        count = 0
+        for legacy in files:
+            records = []
+            with open(legacy, 'r', errors='replace') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split(' | ', 3)
+                    if len(parts) < 3:
+                        continue
+                    try:
+                        ts = normalize_time(parts[0])
+                    except ValueError:
+                        continue
+                    records.append({"ts": ts, "user": parts[1], "command": parts[2],
+                                    "details": parts[3] if len(parts) > 3 else ""})
+            self.log.append(records)
+            count += len(records)
+        self.log.close()
+        for legacy in files:
+            os.replace(legacy, legacy.with_name(legacy.name + '.imported'))
+        logger.info(f"Imported {count} audit records from {path} into {self.directory}")
+
+
+def encode_cursor(name: str, block: int, line: int) -> str:
+    return base64.urlsafe_b64encode(f"{name}:{block}:{line}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        name, block, line = raw.split(':')
+        if not SEGMENT_RE.match(name):
+            raise ValueError(name)
+        return name, int(block), int(line)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursorError("Invalid audit cursor") from None
+
+
+def query_audit(directory: str, limit: int, cursor: Optional[str] = None,
+                command: Optional[str] = None, node: Optional[str] = None,
+                since: Optional[str] = None, until: Optional[str] = None) -> Dict:
+    """Newest-first scan of the segments for up to limit matching records.
+
+    Segments dated after ``until`` are never opened, and within a segment
+    the index picks the newest block that can hold records before
+    ``until``. The scan stops at the first record older than ``since``.
+    The other filters are applied record by record. ``next_cursor``
+    (opaque: segment, block and line) pages further back and stays valid
+    when the segment is compressed. Entries are returned oldest first,
+    like a tail. Blocking; run it in a worker thread.
+    """
+    since = normalize_time(since) if since else None
+    until = normalize_time(until) if until else None
+    node_pattern = re.compile(rf'\b{re.escape(node)}\b') if node else None
+    directory = Path(directory)
+
+    names = list_segments(directory)
+    start = len(names) - 1
+    start_block = start_line = None
+    if cursor:
+        name, start_block, start_line = decode_cursor(cursor)
+        if name not in names:
+            raise InvalidCursorError("Audit cursor has expired (segment deleted)")
+        start = names.index(name)
+
+    entries: List[str] = []
+    oldest = None  # (segment, block, line) of the oldest entry taken so far
+
+    def result(next_cursor: Optional[str] = None) -> Dict:
+        return {"entries": entries[::-1], "count": len(entries), "next_cursor": next_cursor}
+
+    for position in range(start, -1, -1):
+        name = names[position]
+        if until and segment_day(name) > until[:10]:
+            continue
+        try:
+            f, compressed, index = open_segment(directory, name)
+        except FileNotFoundError:
+            continue  # expired meanwhile
+        with f:
+            last = len(index) - 1
+            if position == start and start_block is not None:
+                last = min(last, start_block)
+            if until:
+                last = min(last, bisect.bisect_right([ts for ts, _ in index], until) - 1)
+            for block in range(last, -1, -1):
+                lines = read_block(f, index, block, compressed)
+                if position == start and block == start_block:
+                    lines = lines[:start_line]
+                for line_no in range(len(lines) - 1, -1, -1):
+                    try:
+                        record = json.loads(lines[line_no])
+                    except ValueError:
+                        continue  # torn by a crash
+                    ts = record.get('ts', '')
+                    if until and ts > until:
+                        continue
+                    if since and ts < since:
+                        return result()
+                    if command and record.get('command') != command:
+                        continue
+                    if node_pattern and not node_pattern.search(record.get('details', '')):
+                        continue
+                    if len(entries) == limit:
+                        # More remain: continue from just before the oldest entry returned
+                        return result(encode_cursor(*oldest))
+                    entries.append(format_record(record))
+                    oldest = (name, block, line_no)
+
+    return result()
+
+
+def _open_writer() -> AuditWriter:
+    return AuditWriter(
+        config.audit_dir,
+        flush=config.audit_flush,
+        fsync=config.audit_fsync,
+        flush_interval=config.audit_flush_interval,
+        max_bytes=config.audit_max_bytes,
+        retention_days=config.audit_retention_days,
+        legacy_file=config.audit_file
+    )
+
+
+# Global audit writer
+audit_writer = _open_writer()
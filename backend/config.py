@@ -1,27 +1,30 @@
 """Configuration loader for ASL Agent."""
+import copy
+import operator
+import os
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set, Tuple, get_origin, get_type_hints
 
 
-class Config:
-    """Load and provide access to configuration."""
+class ConfigError(ValueError):
+    """Raised when config.yaml has a setting of the wrong type or value."""
+
+
+class Settings:
+    """Setting definitions: how each one is read from the parsed YAML.
     
-    def __init__(self, config_path: str = "/opt/asl-agent/config.yaml"):
-        self.config_path = Path(config_path)
-        self._config: Dict[str, Any] = {}
-        self.load()
+    Each property is evaluated once per load by ConfigSnapshot; the return
+    annotation is the type the setting is validated against.
+    """
     
-    def load(self):
-        """Load configuration from YAML file."""
-        if not self.config_path.exists():
-            raise FileNotFoundError(f"Config file not found: {self.config_path}")
-        
-        with open(self.config_path, 'r') as f:
-            self._config = yaml.safe_load(f)
+    def __init__(self, raw: Dict[str, Any]):
+        self._config = raw
+        self.keys: List[str] = []
     
     def get(self, key: str, default: Any = None) -> Any:
         """Get configuration value by dot-notation key."""
+        self.keys.append(key)
         keys = key.split('.')
         value = self._config
         
@@ -49,13 +52,122 @@ class Config:
     def ami_password(self) -> str:
         return self.get('ami.password', '')
     
+    @property
+    def ami_login_timeout(self) -> float:
+        return self.get('ami.login_timeout', 10)
+    
+    @property
+    def ami_command_timeout(self) -> float:
+        return self.get('ami.command_timeout', 10)
+    
+    @property
+    def ami_pool_size(self) -> int:
+        return self.get('ami.pool.size', 2)
+    
+    @property
+    def ami_lanes(self) -> Dict[str, Dict[str, int]]:
+        defaults = {
+            'control': {'concurrency': 2, 'queue_depth': 16},
+            'read': {'concurrency': 1, 'queue_depth': 32},
+            'poll': {'concurrency': 1, 'queue_depth': 4},
+        }
+        return {
+            lane: {**settings, **(self.get(f'ami.pool.{lane}') or {})}
+            for lane, settings in defaults.items()
+        }
+    
+    @property
+    def connect_timeout(self) -> float:
+        return self.get('ami.connect_timeout', 15)
+    
+    @property
+    def disconnect_timeout(self) -> float:
+        return self.get('ami.disconnect_timeout', 10)
+    
+    @property
+    def cache_ttl(self) -> float:
+        return self.get('cache.ttl', 2)
+    
+    @property
+    def cache_stale(self) -> float:
+        return self.get('cache.stale_while_revalidate', 10)
+    
+    @property
+    def jobs_max(self) -> int:
+        return self.get('jobs.max_jobs', 200)
+    
+    @property
+    def jobs_retention(self) -> float:
+        return self.get('jobs.retention', 600)
+    
+    @property
+    def jobs_max_wait(self) -> float:
+        return self.get('jobs.max_wait', 25)
+    
+    @property
+    def events_buffer_size(self) -> int:
+        return self.get('events.buffer_size', 1000)
+    
+    @property
+    def events_queue_size(self) -> int:
+        return self.get('events.queue_size', 256)
+    
+    @property
+    def events_heartbeat(self) -> float:
+        return self.get('events.heartbeat', 15)
+    
+    @property
+    def activity_window(self) -> float:
+        return self.get('activity.window', 3600)
+    
+    @property
+    def activity_bucket(self) -> float:
+        return self.get('activity.bucket', 60)
+    
+    @property
+    def activity_max_nodes(self) -> int:
+        return self.get('activity.max_nodes', 200)
+    
+    @property
+    def series_interval(self) -> float:
+        return self.get('series.interval', 60)
+    
+    @property
+    def series_resolutions(self) -> List[Dict[str, float]]:
+        """Ring resolutions, e.g. [{'step': 60, 'span': 86400}] (seconds)."""
+        resolutions = self.get('series.resolutions')
+        if resolutions is None:
+            resolutions = [
+                {'step': 60, 'span': 86400},
+                {'step': 900, 'span': 30 * 86400},
+            ]
+        if not resolutions:
+            raise ValueError("at least one resolution is required")
+        for r in resolutions:
+            values = [r.get('step'), r.get('span')]
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and v > 0 for v in values):
+                raise ValueError(f"expected positive step and span, got {r!r}")
+            if r['span'] < r['step']:
+                raise ValueError(f"span shorter than step: {r!r}")
+        return resolutions
+    
+    @property
+    def local_nodes(self) -> List[Dict[str, str]]:
+        """Local app_rpt nodes: the 'nodes' list, or the single 'node' section."""
+        nodes = self.get('nodes') or [self.get('node') or {}]
+        return [
+            {'number': str(n.get('number', '')), 'callsign': n.get('callsign', '')}
+            for n in nodes
+        ]
+    
     @property
     def node_number(self) -> str:
-        return self.get('node.number', '')
+        """Default local node (the first one when several are configured)."""
+        return self.local_nodes[0]['number']
     
     @property
     def node_callsign(self) -> str:
-        return self.get('node.callsign', '')
+        return self.local_nodes[0]['callsign']
     
     @property
     def api_host(self) -> str:
@@ -77,6 +189,54 @@ class Config:
     def n8n_url(self) -> str:
         return self.get('webhooks.n8n_url', '')
     
+    @property
+    def webhook_sinks(self) -> List[Dict[str, Any]]:
+        """Webhook sinks: the 'webhooks.sinks' list, or n8n_url as a single unfiltered sink."""
+        sinks = self.get('webhooks.sinks')
+        if sinks:
+            return sinks
+        return [{'name': 'n8n', 'url': self.n8n_url}] if self.n8n_url else []
+    
+    @property
+    def webhook_timeout(self) -> float:
+        return self.get('webhooks.timeout', 5)
+    
+    @property
+    def webhook_queue_size(self) -> int:
+        return self.get('webhooks.queue_size', 1000)
+    
+    @property
+    def webhook_batch_window(self) -> float:
+        return self.get('webhooks.batch_window', 2.0)
+    
+    @property
+    def webhook_batch_max(self) -> int:
+        return self.get('webhooks.batch_max', 50)
+    
+    @property
+    def webhook_retry_attempts(self) -> int:
+        return self.get('webhooks.retry.attempts', 3)
+    
+    @property
+    def webhook_retry_initial(self) -> float:
+        return self.get('webhooks.retry.initial', 1.0)
+    
+    @property
+    def webhook_retry_max(self) -> float:
+        return self.get('webhooks.retry.max', 60.0)
+    
+    @property
+    def webhook_spool_dir(self) -> str:
+        return self.get('webhooks.spool_dir', '/opt/asl-agent/webhook-spool')
+    
+    @property
+    def webhook_spool_max_files(self) -> int:
+        return self.get('webhooks.spool_max_files', 1000)
+    
+    @property
+    def reconcile_interval(self) -> float:
+        return self.get('monitoring.reconcile_interval', 300)
+    
     @property
     def log_level(self) -> str:
         return self.get('logging.level', 'INFO')
@@ -85,14 +245,237 @@ class Config:
     def audit_file(self) -> str:
         return self.get('logging.audit_file', '/opt/asl-agent/audit.log')
     
+    @property
+    def audit_dir(self) -> str:
+        return self.get('logging.audit_dir', '/opt/asl-agent/audit')
+    
+    @property
+    def audit_flush(self) -> str:
+        return self.get('logging.audit_flush', 'interval')
+    
+    @property
+    def audit_fsync(self) -> str:
+        return self.get('logging.audit_fsync', 'shutdown')
+    
+    @property
+    def audit_flush_interval(self) -> float:
+        return self.get('logging.audit_flush_interval', 1.0)
+    
+    @property
+    def audit_max_bytes(self) -> int:
+        return self.get('logging.audit_max_bytes', 10 * 1024 * 1024)
+    
+    @property
+    def audit_retention_days(self) -> int:
+        return self.get('logging.audit_retention_days', 365)
+    
+    @property
+    def reload_watch_interval(self) -> float:
+        return self.get('reload.watch_interval', 5)
+    
+    @property
+    def tracing_export_file(self) -> str:
+        return self.get('tracing.export_file', '')
+    
+    @property
+    def tracing_export_min_ms(self) -> float:
+        return self.get('tracing.export_min_ms', 0)
+    
+    @property
+    def tracing_export_max_bytes(self) -> int:
+        return self.get('tracing.export_max_bytes', 10 * 1024 * 1024)
+    
+    @property
+    def history_file(self) -> str:
+        return self.get('history.file', '/opt/asl-agent/history.db')
+    
+    @property
+    def history_retention_days(self) -> int:
+        return self.get('history.retention_days', 365)
+    
+    @property
+    def directory_file(self) -> str:
+        return self.get('directory.file', '/var/lib/asterisk/astdb.txt')
+    
+    @property
+    def directory_index_file(self) -> str:
+        return self.get('directory.index_file', '/opt/asl-agent/astdb.idx')
+    
+    @property
+    def directory_refresh_interval(self) -> float:
+        return self.get('directory.refresh_interval', 300)
+    
     @property
     def rate_limit(self) -> int:
         return self.get('security.rate_limit_per_minute', 10)
     
+    @property
+    def read_rate_limit(self) -> int:
+        return self.get('security.read_rate_limit_per_minute', 300)
+    
+    @property
+    def route_limits(self) -> Dict[str, int]:
+        """Per-route requests per minute, e.g. {'/connect': 4}."""
+        limits = self.get('security.route_limits') or {}
+        for path, limit in limits.items():
+            if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+                raise ValueError(f"{path}: expected a non-negative int, got {limit!r}")
+        return limits
+    
+    @property
+    def max_inflight(self) -> int:
+        return self.get('security.max_inflight', 8)
+    
     @property
     def require_confirmation(self) -> list:
         return self.get('security.require_confirmation', [])
 
 
-# Global config instance
-config = Config()
+# Every setting, in definition order
+SETTINGS: Tuple[str, ...] = tuple(
+    name for name, value in vars(Settings).items() if isinstance(value, property)
+)
+SETTING_TYPES: Dict[str, Any] = {
+    name: get_type_hints(getattr(Settings, name).fget)['return'] for name in SETTINGS
+}
+
+# Settings limited to a fixed set of values
+CHOICES = {
+    'log_level': ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'),
+    'audit_flush': ('record', 'interval', 'shutdown'),
+    'audit_fsync': ('record', 'interval', 'shutdown'),
+}
+PORTS = ('ami_port', 'api_port')
+
+
+def _validate(name: str, value: Any, keys: List[str]) -> Any:
+    """Check (and lightly coerce) one setting against its declared type."""
+    expected = SETTING_TYPES[name]
+    where = keys[0] if keys else name
+    number = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if expected is str:
+        if value is None:
+            value = ''
+        elif number:
+            value = str(value)
+        ok = isinstance(value, str)
+    elif expected is bool:
+        ok = isinstance(value, bool)
+    elif expected is int:
+        ok = number and isinstance(value, int)
+    elif expected is float:
+        ok = number
+    else:
+        ok = isinstance(value, get_origin(expected) or expected)
+    if not ok:
+        type_name = getattr(expected, '__name__', None) or str(expected).replace('typing.', '')
+        raise ConfigError(f"{where}: expected {type_name}, got {value!r}")
+    
+    if expected in (int, float) and value < 0:
+        raise ConfigError(f"{where}: must not be negative, got {value!r}")
+    if name in PORTS and not 0 < value < 65536:
+        raise ConfigError(f"{where}: not a valid port: {value!r}")
+    if name in CHOICES:
+        value = value.upper() if name == 'log_level' else value
+        if value not in CHOICES[name]:
+            raise ConfigError(f"{where}: must be one of {', '.join(CHOICES[name])}, got {value!r}")
+    return value
+
+
+class ConfigSnapshot:
+    """One validated, read-only view of config.yaml.
+    
+    Every setting is resolved once into a plain attribute, so reading one
+    is an attribute lookup rather than a walk of the YAML dict. Values are
+    copies, and the snapshot refuses assignment.
+    """
+    
+    def __init__(self, raw: Dict[str, Any]):
+        settings = Settings(copy.deepcopy(raw))
+        for name in SETTINGS:
+            settings.keys = []
+            try:
+                value = copy.deepcopy(getattr(settings, name))
+            except (AttributeError, TypeError, ValueError) as e:
+                # e.g. a mapping where a list belongs
+                raise ConfigError(f"{settings.keys[0] if settings.keys else name}: {e}") from None
+            value = _validate(name, value, settings.keys)
+            object.__setattr__(self, name, value)
+        
+        numbers = [n['number'] for n in self.local_nodes]
+        if not all(numbers):
+            raise ConfigError("node.number (or every nodes[].number) is required")
+        if len(set(numbers)) != len(numbers):
+            raise ConfigError(f"Duplicate local node numbers: {numbers}")
+        object.__setattr__(self, '_settings', settings)
+    
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("Config snapshots are read-only")
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Raw dot-notation lookup, for keys that have no setting."""
+        return self._settings.get(key, default)
+    
+    def diff(self, other: 'ConfigSnapshot') -> Set[str]:
+        """Names of the settings whose values differ between two snapshots."""
+        return {name for name in SETTINGS if getattr(self, name) != getattr(other, name)}
+
+
+class Config:
+    """Load and provide access to configuration.
+    
+    Settings are read as attributes (``config.api_key``) from the current
+    ConfigSnapshot. reload() builds a new snapshot from the file and swaps
+    it in as a single reference assignment, so a request sees either the
+    old settings or the new ones. A file that fails to parse or validate
+    leaves the current snapshot in place.
+    """
+    
+    def __init__(self, config_path: str = "/opt/asl-agent/config.yaml"):
+        self.config_path = Path(config_path)
+        self.snapshot: Optional[ConfigSnapshot] = None
+        self.file_signature: Optional[Tuple[int, int]] = None
+        self.load()
+    
+    def load(self):
+        """Load configuration from YAML file."""
+        self.snapshot, self.file_signature = self._read()
+    
+    def reload(self) -> Set[str]:
+        """Re-read the file and swap in the new snapshot; returns the changed settings."""
+        snapshot, signature = self._read()
+        changed = self.snapshot.diff(snapshot)
+        self.snapshot, self.file_signature = snapshot, signature
+        return changed
+    
+    def stat(self) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of the config file, or None if it is missing."""
+        try:
+            st = os.stat(self.config_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get configuration value by dot-notation key."""
+        return self.snapshot.get(key, default)
+    
+    def _read(self) -> Tuple[ConfigSnapshot, Optional[Tuple[int, int]]]:
+        if not self.config_path.exists():
+            raise FileNotFoundError(f"Config file not found: {self.config_path}")
+        
+        signature = self.stat()
+        with open(self.config_path, 'r') as f:
+            raw = yaml.safe_load(f) or {}
+        if not isinstance(raw, dict):
+            raise ConfigError(f"{self.config_path} must contain a YAML mapping")
+        return ConfigSnapshot(raw), signature
+
+
+# config.<setting> reads the current snapshot (a plain attribute lookup)
+for _name in SETTINGS:
+    setattr(Config, _name, property(operator.attrgetter(f'snapshot.{_name}')))
+
+
+# Global config instance (ASL_AGENT_CONFIG overrides the path, e.g. for benchmarks)
+config = Config(os.environ.get('ASL_AGENT_CONFIG', '/opt/asl-agent/config.yaml'))
@@ -1,112 +1,220 @@
 """AMI event handler for monitoring node connections."""
 import asyncio
 import logging
-import aiohttp
 from datetime import datetime
 from typing import Dict, Optional
+from activity import NodeActivity
+from ami_client import parse_link_list
 from config import config
+from event_stream import event_stream
+from link_history import link_history
+from webhooks import webhook_dispatcher
 
 logger = logging.getLogger(__name__)
 
 
 class EventHandler:
-    """Handle AMI events and send webhooks to n8n."""
+    """Handle AMI events for one local node and send webhooks to n8n."""
     
-    def __init__(self, ami_client):
+    def __init__(self, ami_client, local: Optional[str] = None):
         self.ami_client = ami_client
-        self.session: Optional[aiohttp.ClientSession] = None
+        self.node = ami_client.node(local)
         self.connected_nodes = set()
+        self.node_modes: Dict[str, str] = {}
+        # Bumped by every link event that changes connected_nodes or node_modes
+        self.link_generation = 0
+        self.keyed_nodes = set()
+        self.rx_keyed = False
+        self.tx_keyed = False
+        self.activity = NodeActivity(config.activity_window, config.activity_bucket, config.activity_max_nodes)
+        self.last_event: Optional[datetime] = None
     
     async def start(self):
         """Start event monitoring."""
-        if config.webhooks_enabled:
-            self.session = aiohttp.ClientSession()
-            logger.info("Event handler started with webhooks enabled")
-        else:
-            logger.info("Event handler started (webhooks disabled)")
+        for pattern in ('RPT_LINKS', 'RPT_ALINKS'):
+            self.ami_client.register_event(pattern, self.on_link_event)
+        for pattern in ('RPT_RXKEYED', 'RPT_TXKEYED'):
+            self.ami_client.register_event(pattern, self.on_keying_event)
+        self.ami_client.add_state_listener(self.on_ami_state)
+        logger.info(f"Event handler for node {self.node.number} started")
     
     async def stop(self):
-        """Stop event monitoring and cleanup."""
-        if self.session:
-            await self.session.close()
-        logger.info("Event handler stopped")
+        """Stop event monitoring."""
+        logger.info(f"Event handler for node {self.node.number} stopped")
+    
+    def send_webhook(self, event_type: str, data: Dict):
+        """Queue a webhook notification; delivery is batched in the background."""
+        webhook_dispatcher.submit(event_type, self.node.number, self.node.callsign, data)
+    
+    async def on_node_connect(self, node_number: str, mode: str = "", info: str = ""):
+        """Announce a new link (connected_nodes is already updated)."""
+        logger.info(f"Node connected to {self.node.number}: {node_number}")
+        link_history.opened(self.node.number, node_number, mode)
+        event_stream.publish("node_connected", {
+            "node": self.node.number,
+            "connected_node": node_number,
+            "mode": mode
+        })
+        
+        self.send_webhook("node_connected", {
+            "connected_node": node_number,
+            "mode": mode,
+            "info": info
+        })
+    
+    async def on_node_disconnect(self, node_number: str, mode: str = ""):
+        """Announce a dropped link (mode is the link's last known mode)."""
+        logger.info(f"Node disconnected from {self.node.number}: {node_number}")
+        link_history.closed(self.node.number, node_number)
+        event_stream.publish("node_disconnected", {
+            "node": self.node.number,
+            "disconnected_node": node_number
+        })
+        
+        self.send_webhook("node_disconnected", {
+            "disconnected_node": node_number,
+            "mode": mode
+        })
     
-    async def send_webhook(self, event_type: str, data: Dict):
-        """Send webhook notification to n8n."""
-        if not config.webhooks_enabled or not self.session:
+    def on_link_event(self, manager, message):
+        """Apply an app_rpt link-list event to connected_nodes.
+        
+        connected_nodes and node_modes are updated here, synchronously and
+        in event order; only the announcements (log, history, event stream,
+        webhooks) are scheduled as tasks, in the same order.
+        """
+        if not self._is_local(message):
             return
+        self.last_event = datetime.utcnow()
         
-        payload = {
-            "event_type": event_type,
-            "timestamp": datetime.utcnow().isoformat(),
-            "node": config.node_number,
-            "callsign": config.node_callsign,
-            "data": data
-        }
+        links = parse_link_list(message.get('EventValue', ''))
+        # Links still being set up ("C") are not connected yet
+        current = {node: flags for node, flags in links.items() if flags[:1] != 'C'}
         
-        try:
-            async with self.session.post(
-                config.n8n_url,
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=5)
-            ) as response:
-                if response.status == 200:
-                    logger.info(f"Webhook sent: {event_type}")
-                else:
-                    logger.warning(f"Webhook failed: {response.status}")
-        except Exception as e:
-            logger.error(f"Webhook error: {e}")
+        if message.get('Event') == 'RPT_ALINKS':
+            keyed_nodes = {node for node, flags in current.items() if 'K' in flags}
+            for node in keyed_nodes - self.keyed_nodes:
+                self.activity.set_remote(node, True)
+            for node in self.keyed_nodes - keyed_nodes:
+                self.activity.set_remote(node, False)
+            self.keyed_nodes = keyed_nodes
+        modes = {node: flags[:1] for node, flags in current.items()}
+        if set(current) != self.connected_nodes or any(
+            self.node_modes.get(node) != mode for node, mode in modes.items()
+        ):
+            self.link_generation += 1
+        self.node_modes.update(modes)
+        
+        for node in set(current) - self.connected_nodes:
+            self.connected_nodes.add(node)
+            asyncio.ensure_future(self.on_node_connect(node, self.node_modes[node]))
+        for node in self.connected_nodes - set(current):
+            self.connected_nodes.remove(node)
+            mode = self.node_modes.pop(node, "")
+            asyncio.ensure_future(self.on_node_disconnect(node, mode))
     
-    async def on_node_connect(self, node_number: str, info: str = ""):
-        """Handle node connection event."""
-        if node_number not in self.connected_nodes:
-            self.connected_nodes.add(node_number)
-            logger.info(f"Node connected: {node_number}")
-            
-            await self.send_webhook("node_connected", {
-                "connected_node": node_number,
-                "info": info
-            })
+    def on_keying_event(self, manager, message):
+        """Track local RX/TX keying from RPT_RXKEYED/RPT_TXKEYED events."""
+        if not self._is_local(message):
+            return
+        self.last_event = datetime.utcnow()
+        
+        keyed = message.get('EventValue', '0').strip() == '1'
+        if message.get('Event') == 'RPT_RXKEYED':
+            self.rx_keyed = keyed
+            self.activity.set_rx(keyed)
+        else:
+            self.tx_keyed = keyed
+            self.activity.set_tx(keyed)
+        logger.debug(f"{message.get('Event')}: {keyed}")
+        event_stream.publish("keying", {
+            "node": self.node.number,
+            "rx_keyed": self.rx_keyed,
+            "tx_keyed": self.tx_keyed
+        })
     
-    async def on_node_disconnect(self, node_number: str):
-        """Handle node disconnection event."""
-        if node_number in self.connected_nodes:
-            self.connected_nodes.remove(node_number)
-            logger.info(f"Node disconnected: {node_number}")
-            
-            await self.send_webhook("node_disconnected", {
-                "disconnected_node": node_number
-            })
+    def on_ami_state(self, state: str):
+        """Reconcile right after (re)connecting; events may have been missed.
+        
+        Keying is unknown while AMI is down, so transmissions in progress end.
+        """
+        if state == 'up':
+            asyncio.ensure_future(self.check_node_changes())
+        elif state == 'down':
+            self.rx_keyed = self.tx_keyed = False
+            self.keyed_nodes = set()
+            self.activity.unkey_all()
+    
+    def _is_local(self, message) -> bool:
+        """Check an app_rpt event belongs to this handler's node.
+        
+        Events without a Node header are only attributable when a single
+        local node is configured.
+        """
+        node = message.get('Node')
+        if not node:
+            return len(self.ami_client.local_nodes) == 1
+        return node == self.node.number
     
     async def check_node_changes(self):
-        """Poll for node connection changes."""
+        """Reconcile connected_nodes against rpt nodes.
+        
+        Link events keep the set current; this catches anything missed
+        while AMI was down or events were filtered. A poll that link events
+        overtook may predate them, so it is retried, and the round skipped
+        if links keep changing.
+        """
         try:
-            current_nodes = await self.ami_client.get_connected_nodes()
+            for attempt in range(3):
+                generation = self.link_generation
+                current_nodes = await self.ami_client.get_connected_nodes(
+                    fresh=True, lane='poll', local=self.node.number
+                )
+                if generation == self.link_generation:
+                    break
+            else:
+                logger.debug(f"Skipping reconcile for {self.node.number}: links changed during each poll")
+                return
             current_set = {node['node'] for node in current_nodes}
+            previous_modes = self.node_modes
+            self.node_modes = {node['node']: node['mode'] for node in current_nodes}
             
-            # Detect new connections
-            for node in current_set - self.connected_nodes:
+            # Apply the whole change before announcing any of it
+            added = current_set - self.connected_nodes
+            removed = self.connected_nodes - current_set
+            self.connected_nodes = set(current_set)
+            
+            for node in added:
                 node_info = next((n['info'] for n in current_nodes if n['node'] == node), "")
-                await self.on_node_connect(node, node_info)
+                await self.on_node_connect(node, self.node_modes[node], node_info)
+            for node in removed:
+                await self.on_node_disconnect(node, previous_modes.get(node, ""))
             
-            # Detect disconnections
-            for node in self.connected_nodes - current_set:
-                await self.on_node_disconnect(node)
+            # Sessions left open by a previous run end here if the link is gone
+            link_history.reconcile(self.node.number, self.node_modes)
             
         except Exception as e:
-            logger.error(f"Error checking node changes: {e}")
+            logger.error(f"Error checking node changes for {self.node.number}: {e}")
     
     async def monitoring_loop(self):
-        """Background task to monitor node changes."""
-        logger.info("Starting node monitoring loop")
+        """Background reconciliation poll behind the event-driven tracking.
+        
+        The first reconcile comes from on_ami_state when AMI is up, so the
+        loop waits a round first and skips rounds while AMI is down.
+        """
+        interval = config.reconcile_interval
+        logger.info(f"Starting node {self.node.number} reconciliation loop (every {interval}s)")
         
         while True:
             try:
-                await self.check_node_changes()
-                await asyncio.sleep(30)  # Check every 30 seconds
+                await asyncio.sleep(interval)
+                # Re-read each round so a config reload takes effect
+                interval = config.reconcile_interval
+                if self.ami_client.connected:
+                    await self.check_node_changes()
             except asyncio.CancelledError:
                 logger.info("Monitoring loop cancelled")
                 break
             except Exception as e:
                 logger.error(f"Monitoring loop error: {e}")
-                await asyncio.sleep(30)
+                await asyncio.sleep(interval)
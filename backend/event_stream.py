@@ -0,0 +1,129 @@
+"""In-process fan-out of link events to streaming (SSE) subscribers."""
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from config import config
+
+
+class StreamEvent:
+    """One published event; id is None for stream control events."""
+
+    __slots__ = ('id', 'type', 'data', 'time')
+
+    def __init__(self, event_id: Optional[int], event_type: str, data: Dict[str, Any]):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.time = time.time()
+
+    def to_sse(self) -> str:
+        """Serialize as a text/event-stream frame."""
+        payload = json.dumps({**self.data, "ts": self.time})
+        if self.id is None:
+            return f"event: {self.type}\ndata: {payload}\n\n"
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+class EventStream:
+    """Monotonic event ids, a bounded replay buffer and live subscribers.
+
+    Ids start at the boot time in microseconds, so they keep increasing
+    across restarts and an id from an earlier run is always older than
+    anything in this run's buffer. Every subscriber gets its own bounded queue, filled synchronously by
+    publish(). A subscriber that falls ``queue_size`` events behind is cut
+    off; it can reconnect with its last id and catch up from the buffer,
+    as long as the buffer still reaches back that far.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int):
+        self.buffer: deque = deque(maxlen=max(1, buffer_size))
+        self.queue_size = max(1, queue_size)
+        # Per-boot epoch: a previous run would need over one event per
+        # microsecond of uptime for its ids to reach this run's
+        first_id = time.time_ns() // 1000
+        self.last_id = first_id - 1
+        self._ids = itertools.count(first_id)
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> int:
+        """Record an event and hand it to every subscriber; returns its id."""
+        event = StreamEvent(next(self._ids), event_type, data)
+        self.last_id = event.id
+        self.buffer.append(event)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind: make room for the sentinel that ends its stream
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+        return event.id
+
+    def since(self, last_id: int) -> Tuple[List[StreamEvent], bool]:
+        """Buffered events after last_id, and whether none were lost in between."""
+        events = [event for event in self.buffer if event.id > last_id]
+        oldest = self.buffer[0].id if self.buffer else self.last_id + 1
+        complete = oldest <= last_id + 1 and last_id <= self.last_id
+        return events, complete
+
+    async def subscribe(self, last_id: Optional[int] = None,
+                        heartbeat: float = 15.0) -> AsyncIterator[Optional[StreamEvent]]:
+        """Yield events as they are published; None means "send a heartbeat".
+
+        With last_id, buffered events after it are replayed first. If the
+        buffer no longer reaches back to last_id (including any id from
+        before a restart) a "reset" event is sent instead, telling the
+        client to resync its state before applying further events.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # Subscribed before replaying so nothing published meanwhile is missed
+        self._subscribers.add(queue)
+        sent = self.last_id
+        try:
+            if last_id is not None:
+                backlog, complete = self.since(last_id)
+                if complete:
+                    for event in backlog:
+                        yield event
+                else:
+                    yield StreamEvent(None, 'reset', {"last_id": self.last_id})
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                if event.id <= sent:
+                    continue
+                sent = event.id
+                yield event
+        finally:
+            self._subscribers.discard(queue)
+
+    def resize(self, buffer_size: int, queue_size: int):
+        """Change the replay buffer and subscriber queue sizes (config reload).
+
+        The newest buffered events are kept; existing subscribers keep
+        their current queues.
+        """
+        self.buffer = deque(self.buffer, maxlen=max(1, buffer_size))
+        self.queue_size = max(1, queue_size)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "last_id": self.last_id,
+            "buffered": len(self.buffer),
+            "subscribers": len(self._subscribers)
+        }
+
+
+# Global event stream
+event_stream = EventStream(config.events_buffer_size, config.events_queue_size)
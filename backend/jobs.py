@@ -0,0 +1,155 @@
+"""In-memory table of background link jobs."""
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, Optional
+
+from fastapi import HTTPException
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+
+class JobStoreFullError(RuntimeError):
+    """Raised when every retained job is still running."""
+
+
+class Job:
+    """One background operation and its outcome."""
+
+    def __init__(self, kind: str, local: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.local = local
+        self.status = JOB_PENDING
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "node": self.local,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "error": self.error,
+            "status_code": self.status_code
+        }
+
+
+class JobStore:
+    """Bounded table of jobs.
+
+    Finished jobs are kept for ``retention`` seconds. When more than
+    ``max_jobs`` are held, the oldest finished jobs are dropped first; if
+    all of them are still running, new submissions are refused.
+    """
+
+    def __init__(self, max_jobs: int, retention: float):
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self.configure(max_jobs, retention)
+
+    def configure(self, max_jobs: int, retention: float):
+        """Set the limits; jobs already held are pruned to them lazily."""
+        self.max_jobs = max(1, max_jobs)
+        self.retention = retention
+
+    def submit(self, kind: str, local: str, work: Awaitable[Dict]) -> Job:
+        """Start work in the background and return its job."""
+        self._prune(room=1)
+        if len(self.jobs) >= self.max_jobs:
+            if asyncio.iscoroutine(work):
+                work.close()
+            raise JobStoreFullError(f"Too many jobs in flight ({self.max_jobs})")
+
+        job = Job(kind, local)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, work))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait up to timeout seconds for a job to finish."""
+        if not job.done and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(job.task), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        counts = {JOB_PENDING: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    async def cancel_all(self):
+        """Cancel unfinished jobs (agent shutdown)."""
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: Job, work: Awaitable[Dict]):
+        job.status = JOB_RUNNING
+        job.started = time.time()
+        try:
+            job.result = await work
+            job.status = JOB_SUCCEEDED
+            job.status_code = 200
+        except HTTPException as e:
+            job.status = JOB_FAILED
+            job.error = str(e.detail)
+            job.status_code = e.status_code
+        except asyncio.CancelledError:
+            job.status = JOB_FAILED
+            job.error = "Cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.status = JOB_FAILED
+            job.error = str(e)
+            job.status_code = 500
+        finally:
+            job.finished = time.time()
+
+    def _prune(self, room: int = 0):
+        """Drop expired finished jobs, then the oldest finished ones to make room."""
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self.jobs.values() if j.done and j.finished < cutoff]:
+            del self.jobs[job_id]
+
+        excess = len(self.jobs) + room - self.max_jobs
+        if excess > 0:
+            finished = [j.id for j in self.jobs.values() if j.done]
+            for job_id in itertools.islice(finished, excess):
+                del self.jobs[job_id]
+
+
+# Global job store
+job_store = JobStore(config.jobs_max, config.jobs_retention)
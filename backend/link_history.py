@@ -0,0 +1,380 @@
+"""Link history: connect/disconnect sessions in SQLite (WAL mode) with per-node rollups.
+
+Every link is a row in ``sessions`` (local node, remote node, mode, start
+and end; ``ended`` is NULL while the link is up). When a session closes its
+duration is added to ``daily`` (per local node, UTC day and remote node,
+split at midnight) and ``totals`` (all time), so "top nodes this week" and
+"total link time per node" read the small rollup tables rather than scanning
+sessions. Writes are queued and applied in batches from a worker thread;
+nothing on the event loop touches the database.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    local TEXT NOT NULL,
+    node TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_node ON sessions (local, node, started);
+CREATE UNIQUE INDEX IF NOT EXISTS sessions_open ON sessions (local, node) WHERE ended IS NULL;
+CREATE TABLE IF NOT EXISTS daily (
+    local TEXT NOT NULL,
+    day TEXT NOT NULL,
+    node TEXT NOT NULL,
+    sessions INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (local, day, node)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS totals (
+    local TEXT NOT NULL,
+    node TEXT NOT NULL,
+    sessions INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    first REAL NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (local, node)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Old sessions and daily rollups are pruned this often
+PRUNE_EVERY = 86400
+
+
+def day_pieces(started: float, ended: float) -> List[Tuple[str, float]]:
+    """Split a session into (UTC day, seconds) pieces at midnight."""
+    pieces = []
+    t = started
+    while True:
+        day = datetime.fromtimestamp(t, timezone.utc).date()
+        midnight = datetime.combine(day + timedelta(days=1), datetime.min.time(), timezone.utc).timestamp()
+        if ended <= midnight:
+            pieces.append((day.isoformat(), ended - t))
+            return pieces
+        pieces.append((day.isoformat(), midnight - t))
+        t = midnight
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds')
+
+
+class LinkHistory:
+    """Record link sessions per local node and answer rollup queries.
+
+    Open links are also kept in memory (``open``), so opened()/closed()
+    never wait on the database. Sessions still open from a previous run are
+    carried over; the first reconcile() keeps those still linked and closes
+    the rest at the time the agent last stopped. Off while ``path`` is empty.
+    """
+
+    def __init__(self, path: str, retention_days: int, queue_size: int = 10000):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.open: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self.carried: Set[Tuple[str, str]] = set()
+        self.last_stop: Optional[float] = None
+        self.written = 0
+        self.dropped = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._pruned = 0.0
+        self.configure(path, retention_days)
+
+    def configure(self, path: str, retention_days: int):
+        """Apply new settings; a new path takes effect on the next start()."""
+        self.path = path
+        self.retention_days = retention_days
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def opened(self, local: str, node: str, mode: str = "", now: Optional[float] = None):
+        """A link came up (a session carried over from the last run just continues)."""
+        if self._task is None:
+            return
+        key = (local, node)
+        if key in self.open:
+            self.carried.discard(key)
+            return
+        now = time.time() if now is None else now
+        self.open[key] = (now, mode)
+        self._submit(('open', local, node, mode, now))
+
+    def closed(self, local: str, node: str, now: Optional[float] = None):
+        """A link went down."""
+        entry = self.open.pop((local, node), None)
+        if entry is None or self._task is None:
+            return
+        self.carried.discard((local, node))
+        now = time.time() if now is None else now
+        self._submit(('close', local, node, entry[0], max(now, entry[0])))
+
+    def reconcile(self, local: str, current: Dict[str, str]):
+        """Match open sessions to the links rpt nodes reports (node -> mode)."""
+        if self._task is None:
+            return
+        now = time.time()
+        for key in [key for key in self.open if key[0] == local and key[1] not in current]:
+            # Carried over and gone: it ended while the agent was down
+            ended = self.last_stop if key in self.carried and self.last_stop else now
+            self.closed(local, key[1], ended)
+        for node, mode in current.items():
+            self.opened(local, node, mode, now)
+
+    async def flush(self):
+        """Wait until everything queued so far is written."""
+        if self._task is None:
+            return
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put(done)
+        await done
+
+    async def start(self):
+        if not self.path:
+            return
+        try:
+            self.open, self.last_stop = await asyncio.to_thread(self._open_db)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Link history disabled, cannot open {self.path}: {e}")
+            return
+        self.carried = set(self.open)
+        self._pruned = 0.0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write out the queue and close the database; open sessions stay open."""
+        if self._task is None:
+            return
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+        await asyncio.to_thread(self._close_db, time.time())
+
+    async def reconfigure(self, path: str, retention_days: int):
+        """Apply new settings (config reload), reopening the database."""
+        await self.stop()
+        self.configure(path, retention_days)
+        await self.start()
+
+    async def query(self, local: str, days: int, top: int, node: Optional[str] = None,
+                    recent: int = 20) -> Dict:
+        """Top remote nodes by link time over the last ``days`` UTC days (0 = all time).
+
+        Links still up count up to now. With ``node``, only that node, plus
+        its most recent sessions.
+        """
+        await self.flush()
+        now = time.time()
+        if days:
+            since_day = (datetime.fromtimestamp(now, timezone.utc).date() - timedelta(days=days - 1))
+            since = datetime.combine(since_day, datetime.min.time(), timezone.utc).timestamp()
+        else:
+            since_day, since = None, 0.0
+        live = {key[1]: entry for key, entry in self.open.items() if key[0] == local}
+        rows, recent_rows = await asyncio.to_thread(
+            self._query, local, since_day.isoformat() if since_day else None, node, recent
+        )
+
+        nodes: Dict[str, Dict] = {}
+        for remote, sessions, seconds, first, last in rows:
+            nodes[remote] = {"node": remote, "sessions": sessions, "seconds": seconds,
+                             "first_seen": first, "last_seen": last, "linked": False}
+        for remote, (started, mode) in live.items():
+            if node is not None and remote != node:
+                continue
+            entry = nodes.setdefault(remote, {"node": remote, "sessions": 0, "seconds": 0.0,
+                                              "first_seen": started, "last_seen": None})
+            entry["sessions"] += 1 if started >= since else 0
+            entry["seconds"] += now - max(started, since)
+            entry["linked"] = True
+            entry["mode"] = mode
+            if entry["first_seen"] is None or started < entry["first_seen"]:
+                entry["first_seen"] = started
+            entry["last_seen"] = now
+
+        ranked = sorted(nodes.values(), key=lambda e: e["seconds"], reverse=True)[:top]
+        for entry in ranked:
+            entry["seconds"] = round(entry["seconds"], 1)
+            entry["first_seen"] = _iso(entry["first_seen"])
+            entry["last_seen"] = _iso(entry["last_seen"])
+        result = {
+            "node": local,
+            "days": days,
+            "since": _iso(since) if days else None,
+            "nodes": ranked,
+            "count": len(ranked),
+            "total_seconds": round(sum(entry["seconds"] for entry in nodes.values()), 1)
+        }
+        if node is not None:
+            result["recent_sessions"] = [
+                {"mode": mode, "start": _iso(started), "end": _iso(ended),
+                 "seconds": round((ended or now) - started, 1)}
+                for mode, started, ended in recent_rows
+            ]
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "file": self.path or None,
+            "running": self.running,
+            "open_sessions": len(self.open),
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped
+        }
+
+    def _submit(self, op: Tuple):
+        try:
+            self.queue.put_nowait(op)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(f"Link history queue full, dropped {op[0]} of {op[2]}")
+
+    async def _run(self):
+        while True:
+            items = [await self.queue.get()]
+            while not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            ops = [item for item in items if isinstance(item, tuple)]
+            try:
+                if ops:
+                    await asyncio.to_thread(self._apply, ops)
+                    self.written += len(ops)
+                if self.retention_days and time.monotonic() - self._pruned >= PRUNE_EVERY:
+                    self._pruned = time.monotonic()
+                    await asyncio.to_thread(self._prune, time.time())
+            except sqlite3.Error as e:
+                self.dropped += len(ops)
+                logger.error(f"Link history write to {self.path} failed: {e}")
+            for item in items:
+                if isinstance(item, asyncio.Future) and not item.done():
+                    item.set_result(None)
+            if None in items:
+                return
+
+    # Worker thread side
+
+    def _open_db(self) -> Tuple[Dict[Tuple[str, str], Tuple[float, str]], Optional[float]]:
+        """Open (or create) the database; returns the open sessions and the last stop time."""
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            open_sessions = {
+                (local, node): (started, mode)
+                for local, node, mode, started in db.execute(
+                    "SELECT local, node, mode, started FROM sessions WHERE ended IS NULL")
+            }
+            row = db.execute("SELECT value FROM meta WHERE key = 'last_stop'").fetchone()
+        except sqlite3.Error:
+            db.close()
+            raise
+        with self._lock:
+            self._db = db
+        return open_sessions, float(row[0]) if row else None
+
+    def _close_db(self, stopped: float):
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_stop', ?)",
+                                 (repr(stopped),))
+            except sqlite3.Error as e:
+                logger.error(f"Link history: could not record shutdown time: {e}")
+            self._db.close()
+            self._db = None
+
+    def _apply(self, ops: List[Tuple]):
+        """Write a batch of open/close operations (and their rollups) in one transaction."""
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN")
+            try:
+                for op in ops:
+                    if op[0] == 'open':
+                        _, local, node, mode, started = op
+                        db.execute("INSERT OR IGNORE INTO sessions (local, node, mode, started) "
+                                   "VALUES (?, ?, ?, ?)", (local, node, mode, started))
+                        continue
+                    _, local, node, started, ended = op
+                    db.execute("UPDATE sessions SET ended = ? WHERE local = ? AND node = ? AND ended IS NULL",
+                               (ended, local, node))
+                    for i, (day, seconds) in enumerate(day_pieces(started, ended)):
+                        db.execute(
+                            "INSERT INTO daily (local, day, node, sessions, seconds) VALUES (?, ?, ?, ?, ?) "
+                            "ON CONFLICT (local, day, node) DO UPDATE SET "
+                            "sessions = sessions + excluded.sessions, seconds = seconds + excluded.seconds",
+                            (local, day, node, 1 if i == 0 else 0, seconds))
+                    db.execute(
+                        "INSERT INTO totals (local, node, sessions, seconds, first, last) VALUES (?, ?, 1, ?, ?, ?) "
+                        "ON CONFLICT (local, node) DO UPDATE SET sessions = sessions + 1, "
+                        "seconds = seconds + excluded.seconds, first = MIN(first, excluded.first), "
+                        "last = MAX(last, excluded.last)",
+                        (local, node, ended - started, started, ended))
+                db.execute("COMMIT")
+            except sqlite3.Error:
+                db.execute("ROLLBACK")
+                raise
+
+    def _prune(self, now: float):
+        """Drop closed sessions and daily rollups past retention (totals are kept)."""
+        cutoff = now - self.retention_days * 86400
+        cutoff_day = datetime.fromtimestamp(cutoff, timezone.utc).date().isoformat()
+        with self._lock:
+            sessions = self._db.execute("DELETE FROM sessions WHERE ended < ?", (cutoff,)).rowcount
+            days = self._db.execute("DELETE FROM daily WHERE day < ?", (cutoff_day,)).rowcount
+        if sessions or days:
+            logger.info(f"Link history: pruned {sessions} sessions, {days} daily rollups")
+
+    def _query(self, local: str, since_day: Optional[str], node: Optional[str],
+               recent: int) -> Tuple[List[Tuple], List[Tuple]]:
+        """(node, sessions, seconds, first, last) rollup rows, and recent sessions of ``node``."""
+        where, params = "d.local = ?", [local]
+        if node is not None:
+            where += " AND d.node = ?"
+            params.append(node)
+        with self._lock:
+            if since_day is None:
+                rows = self._db.execute(
+                    f"SELECT d.node, d.sessions, d.seconds, d.first, d.last FROM totals d WHERE {where}",
+                    params).fetchall()
+            else:
+                rows = self._db.execute(
+                    f"SELECT d.node, SUM(d.sessions), SUM(d.seconds), t.first, t.last FROM daily d "
+                    f"JOIN totals t ON t.local = d.local AND t.node = d.node "
+                    f"WHERE {where} AND d.day >= ? GROUP BY d.node",
+                    params + [since_day]).fetchall()
+            recent_rows = []
+            if node is not None:
+                recent_rows = self._db.execute(
+                    "SELECT mode, started, ended FROM sessions WHERE local = ? AND node = ? "
+                    "ORDER BY started DESC LIMIT ?", (local, node, recent)).fetchall()
+        return rows, recent_rows
+
+
+# Global link history store
+link_history = LinkHistory(config.history_file, config.history_retention_days)
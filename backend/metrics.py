@@ -0,0 +1,204 @@
+"""Prometheus metrics: preallocated histograms, scrape-time collectors and text exposition."""
+import bisect
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bucket upper bounds (seconds, or events for queue depth)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LINK_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+DEPTH_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# AMI command types; anything else is counted as "other"
+COMMAND_TYPES = ('rpt stats', 'rpt nodes', 'rpt cmd ilink', 'other')
+LINK_ACTIONS = ('connect', 'monitor', 'disconnect')
+LINK_OUTCOMES = ('verified', 'timeout', 'failed')
+
+# A collector returns (name, type, help, [(labels, value), ...]) families at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+def command_type(command: str) -> str:
+    """Bounded label for an AMI command: 'rpt stats 2000' -> 'rpt stats'."""
+    words = command.split(' ', 4)
+    if len(words) > 3 and words[1] == 'cmd':
+        kind = f"{words[0]} cmd {words[3]}"
+    else:
+        kind = ' '.join(words[:2])
+    return kind if kind in COMMAND_TYPES else 'other'
+
+
+class Histogram:
+    """Bucket counts, sum and count for one label set."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class HistogramFamily:
+    """A histogram name with fixed label names; one Histogram per label values.
+
+    Children are created once (up front via ``preset`` or on first use)
+    and cached, so callers hold on to them and the hot path is a method
+    call on a plain object.
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...],
+                 buckets: Sequence[float], preset: Iterable[Tuple[str, ...]] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.children: Dict[Tuple[str, ...], Histogram] = {}
+        for values in preset:
+            self.labels(*values)
+
+    def labels(self, *values: str) -> Histogram:
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = Histogram(self.buckets)
+        return child
+
+    def render(self, out: List[str]):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} histogram")
+        for values, child in self.children.items():
+            labels = dict(zip(self.labelnames, values))
+            cumulative = 0
+            for bound, count in zip(child.bounds, child.counts):
+                cumulative += count
+                out.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+            out.append(f"{self.name}_bucket{_labels({**labels, 'le': '+Inf'})} {child.count}")
+            out.append(f"{self.name}_sum{_labels(labels)} {_number(child.sum)}")
+            out.append(f"{self.name}_count{_labels(labels)} {child.count}")
+
+
+class Registry:
+    """Histograms updated in place, plus collectors read at scrape time.
+
+    Counters and gauges the agent already keeps (cache hits, reconnects,
+    queue sizes) are read by collectors when /metrics is scraped rather
+    than mirrored on every update.
+    """
+
+    def __init__(self):
+        self.families: List[HistogramFamily] = []
+        self.collectors: List[Collector] = []
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...],
+                  buckets: Sequence[float], preset: Iterable[Tuple[str, ...]] = ()) -> HistogramFamily:
+        family = HistogramFamily(name, help_text, labelnames, buckets, preset)
+        self.families.append(family)
+        return family
+
+    def add_collector(self, collector: Collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        out: List[str] = []
+        for family in self.families:
+            family.render(out)
+        for collector in self.collectors:
+            for name, kind, help_text, samples in collector():
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    out.append(f"{name}{_labels(labels)} {_number(value)}")
+        out.append("")
+        return "\n".join(out)
+
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware timing each request until its response starts, per route.
+
+    Streaming responses (GET /events) are timed to their first byte.
+    Requests that match no route are labelled "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        responded = False
+
+        async def send_wrapper(message):
+            nonlocal responded
+            if message['type'] == 'http.response.start':
+                responded = True
+                _observe_request(scope, message['status'], time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not responded:
+                _observe_request(scope, 500, time.perf_counter() - started)
+            raise
+
+
+def _observe_request(scope, status: int, seconds: float):
+    route = scope.get('route')
+    path = getattr(route, 'path', None) or 'unmatched'
+    HTTP_REQUEST_SECONDS.labels(path, scope['method'], str(status)).observe(seconds)
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+# Global registry and the metrics updated on hot paths
+metrics = Registry()
+AMI_COMMAND_SECONDS = metrics.histogram(
+    'asl_ami_command_seconds', 'AMI command round trip (after the lane grant), by command type',
+    ('command',), LATENCY_BUCKETS, preset=[(kind,) for kind in COMMAND_TYPES]
+)
+AMI_LANE_WAIT_SECONDS = metrics.histogram(
+    'asl_ami_lane_wait_seconds', 'Time waiting for an AMI session, by pool lane',
+    ('lane',), LATENCY_BUCKETS, preset=[('control',), ('read',), ('poll',)]
+)
+LINK_VERIFY_SECONDS = metrics.histogram(
+    'asl_link_verify_seconds', 'Connect/disconnect time from ilink command to verified (or given up)',
+    ('action', 'outcome'), LINK_BUCKETS,
+    preset=[(action, outcome) for action in LINK_ACTIONS for outcome in LINK_OUTCOMES]
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'asl_http_request_seconds', 'HTTP request latency to the start of the response, by route',
+    ('route', 'method', 'status'), LATENCY_BUCKETS
+)
+WEBHOOK_QUEUE_DEPTH = metrics.histogram(
+    'asl_webhook_queue_depth', 'Events already queued for a webhook sink when one is added',
+    ('sink',), DEPTH_BUCKETS
+)
+WEBHOOK_POST_SECONDS = metrics.histogram(
+    'asl_webhook_post_seconds', 'Webhook batch POST latency, by sink',
+    ('sink',), LATENCY_BUCKETS
+)
@@ -0,0 +1,345 @@
+"""Offline AllStar node directory: the astdb file, indexed for fast lookup.
+
+The directory is the ``node|callsign|description|location`` list AllStar
+nodes keep a local copy of (refreshed by the node's astdb update job). It is
+read into memory as is rather than parsed into records; lookups go through
+a companion index file of compact sorted arrays of line offsets:
+
+- entries by node number (binary search: enriching /nodes, GET /directory/{node})
+- entries by callsign (prefix search)
+- location words (prefix search)
+
+The index is built once per directory update and written to ``index_file``,
+stamped with the directory's size and mtime, so later loads just read the
+directory and map the index. The index is replaced atomically and so is
+safe to map; the directory is not mapped, as the update job may rewrite it
+in place. If the index cannot be written the arrays are kept in memory
+instead.
+"""
+import asyncio
+import bisect
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ASLDIR01'
+# magic, byte order check, directory mtime_ns and size, entries, location words
+HEADER = struct.Struct('=8sIqqII4x')
+BYTE_ORDER = 0x01020304
+_WORD = re.compile(rb'[0-9A-Za-z]+')
+# Index columns are unsigned 32-bit
+_MAX = 0xFFFFFFFF
+
+
+class DirectoryIndex:
+    """One loaded directory file and its sorted arrays (read-only)."""
+
+    def __init__(self, data: bytes, numbers: Sequence[int], offsets: Sequence[int],
+                 by_call: Sequence[int], word_offsets: Sequence[int],
+                 word_lengths: Sequence[int], word_entries: Sequence[int]):
+        self.data = data
+        self.numbers = numbers
+        self.offsets = offsets
+        self.by_call = by_call
+        self.word_offsets = word_offsets
+        self.word_lengths = word_lengths
+        self.word_entries = word_entries
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def find(self, number: int, lo: int = 0) -> int:
+        """Position of a node number, or -1."""
+        i = bisect.bisect_left(self.numbers, number, lo)
+        return i if i < len(self.numbers) and self.numbers[i] == number else -1
+
+    def entry(self, i: int) -> Dict[str, Optional[str]]:
+        fields = self._line(self.offsets[i]).decode('utf-8', 'replace').split('|')
+        fields += [''] * (4 - len(fields))
+        return {
+            "node": fields[0],
+            "callsign": fields[1] or None,
+            "description": fields[2] or None,
+            "location": fields[3] or None
+        }
+
+    def by_callsign(self, prefix: str) -> Iterable[int]:
+        """Entries whose callsign starts with prefix (any case), in callsign order."""
+        key = prefix.upper().encode()
+        call = self._callsign
+        lo = bisect.bisect_left(self.by_call, key, key=call)
+        for j in range(lo, len(self.by_call)):
+            i = self.by_call[j]
+            if not call(i).startswith(key):
+                break
+            yield i
+
+    def by_location(self, prefix: str) -> Set[int]:
+        """Entries with a location word starting with prefix (any case)."""
+        key = prefix.lower().encode()
+        word = self._word
+        lo = bisect.bisect_left(range(len(self.word_offsets)), key, key=word)
+        found = set()
+        for t in range(lo, len(self.word_offsets)):
+            if not word(t).startswith(key):
+                break
+            found.add(self.word_entries[t])
+        return found
+
+    def _line(self, offset: int) -> bytes:
+        end = self.data.find(b'\n', offset)
+        return self.data[offset:end if end >= 0 else len(self.data)].rstrip(b'\r')
+
+    def _callsign(self, i: int) -> bytes:
+        offset = self.offsets[i]
+        start = self.data.find(b'|', offset) + 1
+        end = self.data.find(b'|', start)
+        return self.data[start:end].upper()
+
+    def _word(self, t: int) -> bytes:
+        offset = self.word_offsets[t]
+        return self.data[offset:offset + self.word_lengths[t]].lower()
+
+
+def build_index(data: bytes) -> Tuple[array, ...]:
+    """One pass over the directory: (numbers, offsets, by_call, word offsets, lengths, entries).
+
+    Node numbers too large for the index are skipped.
+    """
+    if len(data) > _MAX:
+        raise ValueError(f"directory too large to index ({len(data)} bytes)")
+    numbers: List[int] = []
+    offsets: List[int] = []
+    calls: List[bytes] = []
+    words: List[Tuple[bytes, int, int, int]] = []
+    position = 0
+    for line in data.split(b'\n'):
+        fields = line.rstrip(b'\r').split(b'|')
+        if len(fields) > 1 and fields[0].isdigit() and int(fields[0]) <= _MAX:
+            if len(fields) > 3 and fields[3]:
+                row = len(numbers)
+                start = position + len(fields[0]) + len(fields[1]) + len(fields[2]) + 3
+                for m in _WORD.finditer(fields[3]):
+                    words.append((m[0].lower(), start + m.start(), len(m[0]), row))
+            numbers.append(int(fields[0]))
+            offsets.append(position)
+            calls.append(fields[1].upper())
+        position += len(line) + 1
+
+    # Entries in node number order; rank maps a row in file order to its entry
+    order = sorted(range(len(numbers)), key=numbers.__getitem__)
+    rank = array('I', bytes(4 * len(order)))
+    for entry, row in enumerate(order):
+        rank[row] = entry
+    by_call = sorted(range(len(order)), key=lambda entry: calls[order[entry]])
+    words.sort()
+    return (
+        array('I', [numbers[row] for row in order]),
+        array('I', [offsets[row] for row in order]),
+        array('I', by_call),
+        array('I', [w[1] for w in words]),
+        array('I', [w[2] for w in words]),
+        array('I', [rank[w[3]] for w in words])
+    )
+
+
+class NodeDirectory:
+    """The loaded directory, reloaded in the background when the file changes."""
+
+    def __init__(self, path: str, index_path: str, refresh_interval: float):
+        self.index: Optional[DirectoryIndex] = None
+        self.signature: Optional[Tuple[int, int]] = None
+        self.mapped = False
+        self.loaded_at: Optional[float] = None
+        self.load_ms: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.configure(path, index_path, refresh_interval)
+
+    def configure(self, path: str, index_path: str, refresh_interval: float):
+        """Apply new settings; a new path takes effect on the next load."""
+        self.path = path
+        self.index_path = index_path
+        self.refresh_interval = refresh_interval
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None
+
+    def lookup(self, node: str) -> Optional[Dict[str, Optional[str]]]:
+        index = self.index
+        if index is None or not node.isdigit():
+            return None
+        i = index.find(int(node))
+        return index.entry(i) if i >= 0 else None
+
+    def annotate(self, nodes: List[Dict]):
+        """Add callsign, description and location to rpt nodes entries, in one sorted pass."""
+        index = self.index
+        if index is None:
+            return
+        numbered = sorted(
+            ((int(n["node"]), n) for n in nodes if n.get("node", "").isdigit()), key=lambda p: p[0]
+        )
+        lo = 0
+        for number, node in numbered:
+            i = index.find(number, lo)
+            if i < 0:
+                # Private node numbers (and nodes newer than the file) are not listed
+                node.update(callsign=None, description=None, location=None)
+                continue
+            entry = index.entry(i)
+            node.update(callsign=entry["callsign"], description=entry["description"],
+                        location=entry["location"])
+            lo = i
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Optional[str]]]:
+        """Node number, callsign prefix, or location words (all must match), by node number."""
+        index = self.index
+        if index is None:
+            return []
+        words = [w.decode() for w in _WORD.findall(query.encode())]
+        if not words:
+            return []
+        if len(words) == 1 and words[0].isdigit():
+            i = index.find(int(words[0]))
+            return [index.entry(i)] if i >= 0 else []
+
+        found = None
+        for word in words:
+            matches = index.by_location(word)
+            found = matches if found is None else found & matches
+        if len(words) == 1:
+            found |= set(index.by_callsign(words[0]))
+        return [index.entry(i) for i in sorted(found)[:limit]]
+
+    def stats(self) -> Dict:
+        index = self.index
+        return {
+            "file": self.path or None,
+            "loaded": index is not None,
+            "entries": len(index) if index is not None else 0,
+            "mapped": self.mapped,
+            "load_ms": self.load_ms
+        }
+
+    async def start(self):
+        if not self.path:
+            return
+        await self.refresh()
+        if self.refresh_interval and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def reconfigure(self, path: str, index_path: str, refresh_interval: float):
+        """Apply new settings (config reload), reloading the directory."""
+        await self.stop()
+        self.configure(path, index_path, refresh_interval)
+        self.index, self.signature, self.mapped, self.load_ms = None, None, False, None
+        await self.start()
+
+    async def refresh(self):
+        """Load the directory if it changed since the last load."""
+        try:
+            st = os.stat(self.path)
+        except OSError as e:
+            # Once at startup, and when a loaded file goes away
+            if self.signature is not None or self.task is None:
+                logger.warning(f"Node directory unavailable: {e}")
+            self.signature = None
+            return
+        if (st.st_mtime_ns, st.st_size) == self.signature:
+            return
+        try:
+            started = time.perf_counter()
+            self.index, self.mapped, signature = await asyncio.to_thread(self._load)
+            self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.signature = signature
+            self.loaded_at = time.time()
+            logger.info(f"Node directory loaded: {len(self.index)} nodes in {self.load_ms} ms")
+        except (OSError, ValueError) as e:
+            logger.error(f"Node directory load failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    def _load(self) -> Tuple[DirectoryIndex, bool, Tuple[int, int]]:
+        """Read the directory and map (or build) its index: (index, mapped, signature)."""
+        with open(self.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+            # The update job may be rewriting the file in place; try again next refresh
+            if os.fstat(f.fileno()).st_mtime_ns != st.st_mtime_ns or len(data) != st.st_size:
+                raise ValueError(f"{self.path} changed while it was being read")
+        signature = (st.st_mtime_ns, st.st_size)
+        arrays = self._map_index(signature)
+        if arrays is not None:
+            return DirectoryIndex(data, *arrays), True, signature
+
+        arrays = build_index(data)
+        if self.index_path:
+            try:
+                self._write_index(signature, arrays)
+                mapped = self._map_index(signature)
+                if mapped is not None:
+                    return DirectoryIndex(data, *mapped), True, signature
+            except OSError as e:
+                logger.warning(f"Could not write node directory index {self.index_path}: {e}")
+        return DirectoryIndex(data, *arrays), False, signature
+
+    def _map_index(self, signature: Tuple[int, int]) -> Optional[Tuple[memoryview, ...]]:
+        """The index file's arrays (zero-copy views), if it matches the directory."""
+        if not self.index_path:
+            return None
+        try:
+            with open(self.index_path, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(buf) < HEADER.size:
+            return None
+        magic, order, mtime, size, entries, words = HEADER.unpack_from(buf)
+        counts = (entries, entries, entries, words, words, words)
+        if (magic, order, (mtime, size)) != (MAGIC, BYTE_ORDER, signature) \
+                or len(buf) != HEADER.size + 4 * sum(counts):
+            return None
+        view = memoryview(buf)
+        arrays, position = [], HEADER.size
+        for count in counts:
+            arrays.append(view[position:position + 4 * count].cast('I'))
+            position += 4 * count
+        return tuple(arrays)
+
+    def _write_index(self, signature: Tuple[int, int], arrays: Tuple[array, ...]):
+        numbers, words = len(arrays[0]), len(arrays[3])
+        temp = f"{self.index_path}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, BYTE_ORDER, signature[0], signature[1], numbers, words))
+            for values in arrays:
+                values.tofile(f)
+        os.replace(temp, self.index_path)
+
+
+# Global node directory
+node_directory = NodeDirectory(
+    config.directory_file, config.directory_index_file, config.directory_refresh_interval
+)
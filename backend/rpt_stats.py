@@ -0,0 +1,133 @@
+"""Single-pass parser for app_rpt ``rpt stats`` output.
+
+Lines look like "Keyups today.....................................: 208";
+indented continuation lines follow when app_rpt wraps a long
+connected-node list. Both are matched with precompiled patterns, one
+match per line.
+"""
+import re
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+
+# "Label....: value"; labels hold no dots or colons, so this never backtracks
+_FIELD = re.compile(r'([^.:]+)\.+:(.*)')
+# An indented line continuing the previous value
+_CONTINUATION = re.compile(r'[ \t]+(\S.*)')
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+_FLAGS = {
+    'ENABLED': True, 'YES': True, 'UP': True,
+    'DISABLED': False, 'NO': False, 'DOWN': False,
+}
+_NONE = frozenset(('', 'N/A', '<NONE>'))
+
+
+def _flag(value: str) -> Union[bool, str]:
+    """ENABLED/YES/UP -> True, DISABLED/NO/DOWN -> False, else unchanged."""
+    return _FLAGS.get(value, value)
+
+
+def _int(value: str) -> Union[int, str]:
+    return int(value) if value.isdigit() else value
+
+
+def _optional(value: str) -> Union[str, None]:
+    return None if value in _NONE else value
+
+
+def _duration(value: str) -> Union[int, float, str]:
+    """"HH:MM:SS" -> seconds (int); "HH:MM:SS:mmm" -> seconds (float)."""
+    parts = value.split(':')
+    try:
+        if len(parts) == 3:
+            h, m, s = map(int, parts)
+            return h * 3600 + m * 60 + s
+        if len(parts) == 4:
+            h, m, s, ms = map(int, parts)
+            return round(h * 3600 + m * 60 + s + ms / 1000, 3)
+    except ValueError:
+        pass
+    return value
+
+
+def _node_list(value: str) -> List[str]:
+    if value in _NONE:
+        return []
+    return value.replace(',', ' ').split()
+
+
+# label -> (key, converter); labels not listed are kept as strings
+FIELDS: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    'Selected system state': ('selected_system_state', _int),
+    'Signal on input': ('signal_on_input', _flag),
+    'System': ('system', _flag),
+    'Parrot Mode': ('parrot_mode', _flag),
+    'Scheduler': ('scheduler', _flag),
+    'Tail Time': ('tail_time', str),
+    'Time out timer': ('time_out_timer', _flag),
+    'Incoming connections': ('incoming_connections', _flag),
+    'Time out timer state': ('time_out_timer_state', str),
+    'Time outs since system initialization': ('time_outs_total', _int),
+    'Identifier state': ('identifier_state', str),
+    'Kerchunks today': ('kerchunks_today', _int),
+    'Kerchunks since system initialization': ('kerchunks_total', _int),
+    'Keyups today': ('keyups_today', _int),
+    'Keyups since system initialization': ('keyups_total', _int),
+    'DTMF commands today': ('dtmf_commands_today', _int),
+    'DTMF commands since system initialization': ('dtmf_commands_total', _int),
+    'Last DTMF command executed': ('last_dtmf_command', _optional),
+    'TX time today': ('tx_time_today', _duration),
+    'TX time since system initialization': ('tx_time_total', _duration),
+    'Uptime': ('uptime', _duration),
+    'Nodes currently connected to us': ('connected_nodes', _node_list),
+    'Autopatch': ('autopatch', _flag),
+    'Autopatch state': ('autopatch_state', str),
+    'Autopatch called number': ('autopatch_called_number', _optional),
+    'Reverse patch/IAXRPT connected': ('reverse_patch', str),
+    'User linking commands': ('user_linking_commands', _flag),
+    'User functions': ('user_functions', _flag),
+}
+
+
+def _key_for(label: str) -> Tuple[str, Callable[[str], Any]]:
+    """Key for a label missing from FIELDS: snake_case, kept as a string."""
+    return _NON_WORD.sub('_', label.strip().lower()).strip('_'), str
+
+
+def parse_rpt_stats(lines: Iterable[str]) -> Dict[str, Any]:
+    """Parse ``rpt stats`` output lines into typed fields in one pass.
+
+    Each line is matched once against _FIELD ("label....: value");
+    indented lines without a dot leader continue the previous value
+    (app_rpt wraps the connected node list). Counters become ints,
+    ENABLED/DISABLED style flags become bools, uptime and TX times become
+    seconds, and the node list becomes a list. Labels not in FIELDS are
+    kept as snake_case strings.
+    """
+    fields = FIELDS
+    field, continuation = _FIELD.match, _CONTINUATION.match
+    stats: Dict[str, Any] = {}
+    key = convert = value = None
+    for line in lines:
+        m = field(line)
+        label = m[1].strip() if m else None
+        if label:
+            if key is not None:
+                stats[key] = convert(value)
+            key, convert = fields.get(label) or _key_for(label)
+            value = m[2].strip()
+            continue
+        m = continuation(line) if key is not None else None
+        if m:
+            value += ' ' + m[1].rstrip()
+        elif key is not None:
+            stats[key] = convert(value)
+            key = None
+    if key is not None:
+        stats[key] = convert(value)
+    return stats
+
+
+def format_duration(seconds: Union[int, float]) -> str:
+    """Seconds -> "H:MM:SS", the way app_rpt prints uptime."""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
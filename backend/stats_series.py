@@ -0,0 +1,212 @@
+"""Downsampled time series of the numeric ``rpt stats`` fields.
+
+A background sampler reads each local node's stats every ``interval``
+seconds and records them into rings at several resolutions (e.g. 1 min
+for a day, 15 min for 30 days). Samples are queried from AMI in the poll
+lane, not read from the stats cache, so they are never stale and do not
+compete with API reads. A ring is one preallocated ``array('d')`` per
+field; a slot's time is implied by its position, and the last sample
+taken in a slot's step is the one kept, which suits both the counters and
+the gauges recorded. Slots with no sample (AMI down, agent stopped) hold
+NaN and come back as null. Series live in memory only.
+"""
+import asyncio
+import logging
+import math
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from ami_client import ami_client
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# rpt stats fields recorded; connected_nodes is recorded as a count
+FIELDS = (
+    'uptime', 'keyups_today', 'keyups_total', 'kerchunks_today', 'kerchunks_total',
+    'tx_time_today', 'tx_time_total', 'dtmf_commands_today', 'dtmf_commands_total',
+    'time_outs_total', 'selected_system_state', 'connected_nodes'
+)
+# Recorded as floats; the rest come back as ints
+FLOAT_FIELDS = frozenset({'tx_time_today', 'tx_time_total'})
+
+
+class Ring:
+    """One resolution: ``slots`` slots of ``step`` seconds, a column per field."""
+
+    __slots__ = ('step', 'slots', 'index', 'columns')
+
+    def __init__(self, step: float, span: float):
+        self.step = step
+        self.slots = max(1, math.ceil(span / step))
+        self.index: Optional[int] = None
+        blank = array('d', [math.nan]) * self.slots
+        self.columns: Dict[str, array] = {field: array('d', blank) for field in FIELDS}
+
+    def record(self, now: float, values: Dict[str, float]):
+        self._advance(now)
+        pos = self.index % self.slots
+        for field, column in self.columns.items():
+            column[pos] = values.get(field, math.nan)
+
+    def window(self, now: float, count: int, fields: Sequence[str]) -> Dict:
+        """The last ``count`` slots up to now, oldest first, one list per field."""
+        self._advance(now)
+        count = max(1, min(count, self.slots))
+        end = self.index % self.slots + 1
+        start = end - count
+        series = {}
+        for field in fields:
+            column = self.columns[field]
+            # Two C-level slices when the window wraps the end of the array
+            values = (column[start:end] if start >= 0 else column[start:] + column[:end]).tolist()
+            if field in FLOAT_FIELDS:
+                series[field] = [None if v != v else v for v in values]
+            else:
+                series[field] = [None if v != v else int(v) for v in values]
+        return {
+            "step": self.step,
+            "start": _iso((self.index - count + 1) * self.step),
+            "end": _iso((self.index + 1) * self.step),
+            "count": count,
+            "series": series
+        }
+
+    def _advance(self, now: float):
+        """Move to now's slot, blanking the slots skipped over."""
+        index = int(now // self.step)
+        if self.index is None:
+            self.index = index
+            return
+        if index <= self.index:
+            return
+        for i in range(self.index + 1, self.index + 1 + min(index - self.index, self.slots)):
+            pos = i % self.slots
+            for column in self.columns.values():
+                column[pos] = math.nan
+        self.index = index
+
+
+class StatsSeries:
+    """Sampler and rings for every local node.
+
+    An interval of 0 turns sampling off. Changing the resolutions starts
+    the series over.
+    """
+
+    def __init__(self, interval: float, resolutions: List[Dict[str, float]]):
+        self.resolutions: List[Dict[str, float]] = []
+        self.nodes: Dict[str, List[Ring]] = {}
+        self.samples = 0
+        self.errors = 0
+        self.task: Optional[asyncio.Task] = None
+        self.configure(interval, resolutions)
+
+    def configure(self, interval: float, resolutions: List[Dict[str, float]]):
+        """Apply new settings; new resolutions start the series over."""
+        self.interval = interval
+        resolutions = sorted(resolutions, key=lambda r: r['step'])
+        if resolutions != self.resolutions or set(self.nodes) != set(ami_client.local_nodes):
+            self.resolutions = resolutions
+            self.nodes = {
+                number: [Ring(r['step'], r['span']) for r in self.resolutions]
+                for number in ami_client.local_nodes
+            }
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None
+
+    async def start(self):
+        if not self.interval or self.task is not None:
+            return
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Stats sampler started (every {self.interval}s, "
+                    f"{len(self.resolutions)} resolution(s))")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def reconfigure(self, interval: float, resolutions: List[Dict[str, float]]):
+        """Apply new settings (config reload), restarting the sampler."""
+        await self.stop()
+        self.configure(interval, resolutions)
+        await self.start()
+
+    def query(self, local: str, window: float, fields: Sequence[str],
+              step: Optional[float] = None) -> Dict:
+        """The last ``window`` seconds of ``fields`` for one node.
+
+        Uses the finest resolution whose span covers the window (or the one
+        with the given step), clipping the window to that resolution's span.
+        """
+        rings = self.nodes.get(local) or []
+        if step is not None:
+            matches = [r for r in rings if r.step == step]
+            if not matches:
+                raise ValueError(f"No resolution with step {step:g}s "
+                                 f"(have: {', '.join(f'{r.step:g}' for r in rings)})")
+            ring = matches[0]
+        else:
+            covering = [r for r in rings if r.step * r.slots >= window]
+            ring = covering[0] if covering else rings[-1]
+        return {
+            "node": local,
+            "interval": self.interval,
+            **ring.window(time.time(), math.ceil(window / ring.step), fields)
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "resolutions": [{"step": r['step'], "span": r['span']} for r in self.resolutions],
+            "samples": self.samples,
+            "errors": self.errors
+        }
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            if ami_client.connected:
+                await asyncio.gather(*(self._sample(number) for number in self.nodes))
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def _sample(self, local: str):
+        try:
+            result = await ami_client.get_node_stats(local=local, fresh=True, lane='poll')
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"Stats sample for node {local} failed: {e}")
+            return
+        stats = result.get("stats") or {}
+        values = {}
+        for field in FIELDS:
+            value = stats.get(field)
+            if field == 'connected_nodes':
+                value = len(value) if isinstance(value, list) else None
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[field] = float(value)
+        now = time.time()
+        for ring in self.nodes.get(local, ()):
+            ring.record(now, values)
+        self.samples += 1
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds')
+
+
+# Global stats series instance
+stats_series = StatsSeries(config.series_interval, config.series_resolutions)
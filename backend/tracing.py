@@ -0,0 +1,229 @@
+"""Per-request phase timing: Server-Timing headers and an optional JSONL span export."""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Phases, in the order they are reported
+PHASES = ('auth', 'ami_wait', 'ami_exec', 'parse', 'audit')
+
+# Client-supplied X-Request-ID values are kept only if they look like an id
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+
+class Trace:
+    """Timed phases (spans) of one HTTP request.
+
+    Spans are (phase, start offset, duration) in seconds. Once the response
+    has started the trace is finished and later spans (a background cache
+    refresh or async job the request started) are ignored.
+    """
+
+    __slots__ = ('id', 'start', 'wall', 'spans', 'total', 'finished')
+
+    def __init__(self, request_id: str):
+        self.id = request_id
+        self.start = time.perf_counter()
+        self.wall = time.time()
+        self.spans: List[Tuple[str, float, float]] = []
+        self.total = 0.0
+        self.finished = False
+
+    def add(self, name: str, started: float, seconds: float):
+        if not self.finished:
+            self.spans.append((name, started - self.start, seconds))
+
+    def finish(self):
+        self.finished = True
+        self.total = time.perf_counter() - self.start
+
+    def totals(self) -> Dict[str, float]:
+        """Seconds per phase (summed over repeated spans)."""
+        totals = dict.fromkeys(PHASES, 0.0)
+        for name, _, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in milliseconds)."""
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.totals().items()]
+        parts.append(f"total;dur={self.total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+
+
+def record_phase(name: str, started: float, seconds: float):
+    """Add a span to the current request's trace (no-op outside a request)."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, started, seconds)
+
+
+class phase:
+    """Context manager timing a block as a phase of the current request."""
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_phase(self.name, self.started, time.perf_counter() - self.started)
+
+
+class SpanExporter:
+    """Append finished request traces to a JSONL file from a background task.
+
+    Off while ``path`` is empty. Requests faster than ``min_ms`` are not
+    exported. The file is rolled over to ``<path>.1`` past ``max_bytes``
+    (0 = never). export() never blocks; traces are dropped if the queue
+    is full.
+    """
+
+    def __init__(self, path: str, min_ms: float, max_bytes: int, queue_size: int = 1000):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.exported = 0
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self.configure(path, min_ms, max_bytes)
+
+    def configure(self, path: str, min_ms: float, max_bytes: int):
+        """Apply new settings; queued traces go to the new file."""
+        self.path = path
+        self.min_seconds = min_ms / 1000
+        self.max_bytes = max_bytes
+
+    def export(self, trace: Trace, scope: Dict[str, Any], status: int):
+        if not self.path or self._task is None or trace.total < self.min_seconds:
+            return
+        route = scope.get('route')
+        record = {
+            "id": trace.id,
+            "ts": trace.wall,
+            "method": scope['method'],
+            "route": getattr(route, 'path', None),
+            "path": scope['path'],
+            "status": status,
+            "total_ms": round(trace.total * 1000, 3),
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 3), "dur_ms": round(seconds * 1000, 3)}
+                for name, start, seconds in trace.spans
+            ]
+        }
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write out what is queued and stop."""
+        if self._task is None:
+            return
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "file": self.path or None,
+            "queued": self.queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped
+        }
+
+    async def _run(self):
+        while True:
+            items = [await self.queue.get()]
+            while not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            records = [item for item in items if item is not None]
+            if records and self.path:
+                lines = "".join(json.dumps(record, separators=(',', ':')) + "\n" for record in records)
+                try:
+                    await asyncio.to_thread(self._write, self.path, self.max_bytes, lines)
+                    self.exported += len(records)
+                except OSError as e:
+                    self.dropped += len(records)
+                    logger.error(f"Trace export to {self.path} failed: {e}")
+            if None in items:
+                return
+
+    @staticmethod
+    def _write(path: str, max_bytes: int, lines: str):
+        try:
+            if max_bytes and os.path.getsize(path) >= max_bytes:
+                os.replace(path, f"{path}.1")
+        except FileNotFoundError:
+            pass
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware giving every request a Trace.
+
+    The response carries a Server-Timing header with the phase totals and
+    an X-Request-ID header (the client's, if it sent a usable one), and
+    the trace is handed to the span exporter.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(_request_id(scope))
+        token = current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                trace.finish()
+                message = {**message, 'headers': [
+                    *message.get('headers', ()),
+                    (b'server-timing', trace.server_timing().encode()),
+                    (b'x-request-id', trace.id.encode())
+                ]}
+                span_exporter.export(trace, scope, message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+
+
+def _request_id(scope) -> str:
+    for name, value in scope['headers']:
+        if name == b'x-request-id':
+            value = value.decode('latin-1')
+            if REQUEST_ID_RE.match(value):
+                return value
+            break
+    return uuid.uuid4().hex[:16]
+
+
+# Global span exporter
+span_exporter = SpanExporter(
+    config.tracing_export_file, config.tracing_export_min_ms, config.tracing_export_max_bytes
+)
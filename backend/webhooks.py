@@ -0,0 +1,430 @@
+"""Background webhook delivery: batching, retries and an on-disk spool."""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from config import config
+from metrics import WEBHOOK_POST_SECONDS, WEBHOOK_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookRejectedError(RuntimeError):
+    """Raised when an endpoint refuses a batch with a non-retryable status."""
+
+
+# Filter keys a sink may use, and the event field each one matches
+FILTER_FIELDS = {
+    'event_types': 'event_type',
+    'nodes': 'node',
+    'remote_nodes': 'remote_node',
+    'modes': 'mode'
+}
+
+
+class WebhookSink:
+    """One webhook endpoint with its own queue, batching, retries and spool.
+
+    Events are queued without blocking the caller. A delivery task
+    coalesces everything that arrives within ``batch_window`` seconds (up
+    to ``batch_max`` events) into one POST, retried with jittered
+    exponential backoff over a keep-alive session. Up to ``concurrency``
+    batches are in flight at once (1 keeps them in order). A batch that
+    still fails is written to the spool directory, as is every later batch
+    until the spool has drained, so events survive restarts. Batches the
+    endpoint rejects outright (4xx other than 408 and 429) are logged and
+    dropped.
+    """
+
+    def __init__(self, name: str, url: str, spool_dir: str, concurrency: int = 1,
+                 filters: Optional[Dict[str, List[str]]] = None):
+        self.name = name
+        self.url = url
+        self.filters = filters or {}
+        self.concurrency = max(1, concurrency)
+        self.spool_dir = Path(spool_dir) / name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.webhook_queue_size)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[Dict[str, Any]] = []
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._inflight: Dict[asyncio.Task, List[Dict[str, Any]]] = {}
+        self._seq = itertools.count()
+        self.post_seconds_total = 0.0
+        self.post_seconds_max = 0.0
+        self.posts = 0
+        self.depth_histogram = WEBHOOK_QUEUE_DEPTH.labels(name)
+        self.post_histogram = WEBHOOK_POST_SECONDS.labels(name)
+        self.metrics = {
+            "events_queued": 0,
+            "events_sent": 0,
+            "batches_sent": 0,
+            "attempts_failed": 0,
+            "batches_spooled": 0,
+            "batches_rejected": 0,
+            "spool_dropped": 0
+        }
+        self.last_error: Optional[str] = None
+        self.last_success: Optional[float] = None
+
+    def submit(self, event: Dict[str, Any]):
+        """Queue an event; spools straight to disk if the queue is full."""
+        self.metrics["events_queued"] += 1
+        self.depth_histogram.observe(self.queue.qsize())
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._spool([event])
+
+    async def start(self):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=config.webhook_timeout)
+        )
+        self._task = asyncio.create_task(self._run())
+        pending = len(self._spool_files())
+        if pending:
+            logger.info(f"Webhook {self.name}: {pending} spooled batches to resend")
+
+    async def stop(self):
+        """Stop delivery; anything not yet sent is spooled for the next start."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        inflight = list(self._inflight.items())
+        for task, _ in inflight:
+            task.cancel()
+        await asyncio.gather(*(task for task, _ in inflight), return_exceptions=True)
+        for task, batch in inflight:
+            if task.cancelled():
+                self._spool(batch)
+        batch = self._batch
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            self._spool(batch)
+        self._batch = []
+        if self.session:
+            await self.session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": len(self._inflight),
+            "queued": self.queue.qsize(),
+            "spooled": len(self._spool_files()),
+            "post_seconds_avg": round(self.post_seconds_total / self.posts, 4) if self.posts else 0.0,
+            "post_seconds_max": round(self.post_seconds_max, 4),
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            **self.metrics
+        }
+
+    async def _run(self):
+        while True:
+            # Drain older spooled batches first so events stay in order
+            await self._drain_spool()
+
+            self._batch = [await self.queue.get()]
+            deadline = asyncio.get_running_loop().time() + config.webhook_batch_window
+            while len(self._batch) < config.webhook_batch_max:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # self._batch stays set until the batch is spooled or handed to a
+            # delivery task, so stop() can spool it if cancelled midway
+            if self._spool_files():
+                self._spool(self._batch)
+            else:
+                await self._slots.acquire()
+                task = asyncio.create_task(self._deliver(self._batch))
+                self._inflight[task] = self._batch
+                task.add_done_callback(self._delivered)
+            self._batch = []
+
+    async def _deliver(self, batch: List[Dict[str, Any]]):
+        try:
+            if not await self._deliver_with_retry(batch):
+                self._spool(batch)
+        finally:
+            self._slots.release()
+
+    def _delivered(self, task: asyncio.Task):
+        self._inflight.pop(task, None)
+
+    async def _deliver_with_retry(self, batch: List[Dict[str, Any]]) -> bool:
+        """Try a batch up to webhooks.retry_attempts times; True once delivered."""
+        delay = config.webhook_retry_initial
+        for attempt in range(config.webhook_retry_attempts):
+            if attempt:
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+                delay = min(delay * 2, config.webhook_retry_max)
+            try:
+                await self._post(batch)
+                return True
+            except WebhookRejectedError as e:
+                logger.error(f"Webhook {self.name} rejected {len(batch)} events: {e}")
+                self.metrics["batches_rejected"] += 1
+                return True
+            except Exception as e:
+                self.metrics["attempts_failed"] += 1
+                self.last_error = str(e) or type(e).__name__
+                logger.warning(f"Webhook {self.name} attempt {attempt + 1} failed: {self.last_error}")
+        return False
+
+    async def _drain_spool(self):
+        """Resend spooled batches oldest first, backing off while the endpoint is down."""
+        delay = config.webhook_retry_initial
+        while True:
+            files = self._spool_files()
+            if not files:
+                return
+            path = files[0]
+            try:
+                batch = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                logger.error(f"Webhook {self.name}: unreadable spool file {path.name}: {e}")
+                path.unlink(missing_ok=True)
+                continue
+
+            try:
+                await self._post(batch)
+            except WebhookRejectedError as e:
+                logger.error(f"Webhook {self.name} rejected spooled batch {path.name}: {e}")
+                self.metrics["batches_rejected"] += 1
+            except Exception as e:
+                self.metrics["attempts_failed"] += 1
+                self.last_error = str(e) or type(e).__name__
+                # New events keep arriving meanwhile; spool them behind this one
+                self._spool_queued()
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+                delay = min(delay * 2, config.webhook_retry_max)
+                continue
+            path.unlink(missing_ok=True)
+            delay = config.webhook_retry_initial
+
+    def _spool_queued(self):
+        batch = []
+        while not self.queue.empty() and len(batch) < config.webhook_batch_max:
+            batch.append(self.queue.get_nowait())
+        if batch:
+            self._spool(batch)
+
+    async def _post(self, batch: List[Dict[str, Any]]):
+        payload = {
+            "sent_at": datetime.utcnow().isoformat(),
+            "count": len(batch),
+            "events": batch
+        }
+        started = time.monotonic()
+        try:
+            async with self.session.post(self.url, json=payload) as response:
+                status = response.status
+        finally:
+            elapsed = time.monotonic() - started
+            self.posts += 1
+            self.post_seconds_total += elapsed
+            self.post_seconds_max = max(self.post_seconds_max, elapsed)
+            self.post_histogram.observe(elapsed)
+
+        if 200 <= status < 300:
+            self.metrics["batches_sent"] += 1
+            self.metrics["events_sent"] += len(batch)
+            self.last_success = time.time()
+            logger.info(f"Webhook {self.name}: sent {len(batch)} events")
+            return
+        if 400 <= status < 500 and status not in (408, 429):
+            raise WebhookRejectedError(f"HTTP {status}")
+        raise RuntimeError(f"HTTP {status}")
+
+    def _spool(self, batch: List[Dict[str, Any]]):
+        """Write a batch to the spool directory (atomically, oldest dropped past the cap)."""
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            name = f"{time.time_ns():020d}-{next(self._seq):06d}.json"
+            tmp = self.spool_dir / f".{name}.tmp"
+            tmp.write_text(json.dumps(batch))
+            os.replace(tmp, self.spool_dir / name)
+            self.metrics["batches_spooled"] += 1
+
+            files = self._spool_files()
+            for old in files[:max(0, len(files) - config.webhook_spool_max_files)]:
+                old.unlink(missing_ok=True)
+                self.metrics["spool_dropped"] += 1
+                logger.warning(f"Webhook {self.name}: spool full, dropped {old.name}")
+        except OSError as e:
+            logger.error(f"Webhook {self.name}: failed to spool {len(batch)} events: {e}")
+
+    def _spool_files(self) -> List[Path]:
+        try:
+            return sorted(self.spool_dir.glob('*.json'))
+        except OSError:
+            return []
+
+
+class SinkIndex:
+    """Sinks indexed by filter value, built once when the sinks are created.
+
+    For each filter field there is a map from value to the sinks that
+    accept it, plus the set of sinks with no filter on that field. Matching
+    an event intersects one small set per field, so the cost follows the
+    number of matching sinks, not sinks times predicates. Results are
+    memoized per distinct key since events repeat a handful of shapes.
+    """
+
+    def __init__(self, sinks: List[WebhookSink]):
+        self.sinks = sinks
+        self._by_value: Dict[str, Dict[str, FrozenSet[int]]] = {}
+        self._unfiltered: Dict[str, FrozenSet[int]] = {}
+        for key, field in FILTER_FIELDS.items():
+            by_value = defaultdict(set)
+            unfiltered = set()
+            for i, sink in enumerate(sinks):
+                values = sink.filters.get(key)
+                if values:
+                    for value in values:
+                        by_value[str(value)].add(i)
+                else:
+                    unfiltered.add(i)
+            self._by_value[field] = {v: frozenset(ids) | unfiltered for v, ids in by_value.items()}
+            self._unfiltered[field] = frozenset(unfiltered)
+        self._memo: Dict[Tuple[str, ...], Tuple[WebhookSink, ...]] = {}
+
+    def match(self, event: Dict[str, Any]) -> Tuple[WebhookSink, ...]:
+        key = tuple(str(event.get(field) or '') for field in FILTER_FIELDS.values())
+        matched = self._memo.get(key)
+        if matched is None:
+            candidates = frozenset(range(len(self.sinks)))
+            for field, value in zip(FILTER_FIELDS.values(), key):
+                candidates &= self._by_value[field].get(value, self._unfiltered[field])
+                if not candidates:
+                    break
+            matched = tuple(self.sinks[i] for i in sorted(candidates))
+            if len(self._memo) < 4096:
+                self._memo[key] = matched
+        return matched
+
+
+def build_sinks(definitions: Iterable[Dict[str, Any]], spool_dir: str) -> List[WebhookSink]:
+    """Create sinks from config definitions, rejecting bad ones early."""
+    sinks = []
+    for i, definition in enumerate(definitions):
+        name = str(definition.get('name') or f"sink{i + 1}")
+        url = definition.get('url')
+        if not url:
+            raise ValueError(f"Webhook sink {name} has no url")
+        if any(sink.name == name for sink in sinks):
+            raise ValueError(f"Duplicate webhook sink name: {name}")
+        filters = definition.get('filter') or {}
+        unknown = set(filters) - set(FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Webhook sink {name}: unknown filter keys {sorted(unknown)}")
+        filters = {
+            key: [str(v) for v in (values if isinstance(values, list) else [values])]
+            for key, values in filters.items() if values
+        }
+        sinks.append(WebhookSink(name, url, spool_dir, definition.get('concurrency', 1), filters))
+    return sinks
+
+
+class WebhookDispatcher:
+    """Routes events to the webhook sinks whose filters accept them."""
+
+    def __init__(self):
+        self.sinks: List[WebhookSink] = []
+        self.index = SinkIndex([])
+        self.events_submitted = 0
+        self.events_unmatched = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    async def start(self):
+        if not config.webhooks_enabled or not config.webhook_sinks:
+            logger.info("Webhooks disabled")
+            return
+        self.sinks = build_sinks(config.webhook_sinks, config.webhook_spool_dir)
+        self.index = SinkIndex(self.sinks)
+        for sink in self.sinks:
+            await sink.start()
+        logger.info(f"Webhook dispatcher started ({len(self.sinks)} sinks)")
+
+    async def stop(self):
+        for sink in self.sinks:
+            await sink.stop()
+        self.sinks = []
+        self.index = SinkIndex([])
+
+    async def restart(self):
+        """Rebuild the sinks from the current config (config reload).
+
+        The new sinks take events from the moment they are built. The old
+        ones spool whatever they have not delivered, and the new sinks
+        resend that spool before their own queue, so nothing is lost or
+        reordered. Bad sink definitions raise before anything changes.
+        """
+        sinks = []
+        if config.webhooks_enabled and config.webhook_sinks:
+            sinks = build_sinks(config.webhook_sinks, config.webhook_spool_dir)
+        old = self.sinks
+        self.sinks = sinks
+        self.index = SinkIndex(sinks)
+        for sink in old:
+            await sink.stop()
+        for sink in sinks:
+            await sink.start()
+        logger.info(f"Webhook dispatcher restarted ({len(sinks)} sinks)")
+
+    def submit(self, event_type: str, node: str, callsign: str, data: Dict[str, Any]):
+        """Queue an event for every matching sink; never blocks."""
+        if not self.sinks:
+            return
+        event = {
+            "event_type": event_type,
+            "timestamp": datetime.utcnow().isoformat(),
+            "node": node,
+            "callsign": callsign,
+            "data": data
+        }
+        self.events_submitted += 1
+        sinks = self.index.match({
+            "event_type": event_type,
+            "node": node,
+            "remote_node": data.get("connected_node") or data.get("disconnected_node"),
+            "mode": data.get("mode")
+        })
+        if not sinks:
+            self.events_unmatched += 1
+        for sink in sinks:
+            sink.submit(event)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events_submitted": self.events_submitted,
+            "events_unmatched": self.events_unmatched,
+            "sinks": {sink.name: sink.stats() for sink in self.sinks}
+        }
+
+
+# Global webhook dispatcher
+webhook_dispatcher = WebhookDispatcher()
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""AMI simulator that emulates app_rpt, for running the agent without Asterisk.
+
+Speaks the Asterisk Manager protocol (Login, Logoff, Ping, Command and
+events) over TCP and simulates ``rpt stats``, ``rpt nodes`` and ``rpt cmd
+<node> ilink`` for a set of local nodes and a pool of reachable remote
+nodes. Link changes are announced with RPT_LINKS/RPT_ALINKS events (and
+optionally VarSet), keying with RPT_RXKEYED/RPT_TXKEYED and the K
+flag of RPT_ALINKS for linked nodes.
+
+Latency, link-up delay, flapping links and failures (failed links,
+error responses, unanswered commands, dropped AMI connections) can be
+injected. Point the agent's ami.host/ami.port at it.
+
+Usage:
+  python3 benchmarks/ami_simulator.py --port 5038 --nodes 2000
+  python3 benchmarks/ami_simulator.py --nodes 2000,2001 --initial-links 5 \\
+      --latency-ms 20 --jitter-ms 10 --link-delay 1.5 --flap-interval 30
+  python3 benchmarks/ami_simulator.py --error-rate 0.05 --hang-rate 0.01 --drop-interval 120
+
+Remote nodes are numbered from --remote-base; connecting to any other
+node never comes up, like an offline node.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("ami_simulator")
+
+ILINK_DISCONNECT = "1"
+ILINK_MONITOR = "2"
+ILINK_TRANSCEIVE = "3"
+ILINK_DISCONNECT_ALL = "6"
+
+STATS_LABEL_WIDTH = 49
+NODES_PER_LINE = 8
+
+
+@dataclass
+class SimOptions:
+    """Simulator behaviour; times are in seconds, rates are probabilities (0-1)."""
+
+    local_nodes: list[str] = field(default_factory=lambda: ["2000"])
+    remote_nodes: int = 200          # Reachable remote nodes
+    remote_base: int = 50000         # First reachable remote node number
+    initial_links: int = 0           # Transceive links per local node at start
+    username: str | None = None      # Required login (None accepts any)
+    secret: str | None = None
+    latency: float = 0.002           # Added to every action
+    jitter: float = 0.0              # Extra random latency, 0..jitter
+    link_delay: float = 0.5          # Connect: "C" (connecting) for this long, then up
+    unlink_delay: float = 0.1        # Disconnect: link drops after this long
+    link_fail_rate: float = 0.0      # Reachable node that still never links
+    error_rate: float = 0.0          # Command answered with Response: Error
+    hang_rate: float = 0.0           # Command never answered
+    flap_interval: float = 0.0       # Mean seconds between link flaps (0 = off)
+    flap_down: float = 5.0           # Seconds a flapped link stays down
+    keying_interval: float = 0.0     # Mean seconds between keyups, local or linked (0 = off)
+    key_duration: float = 2.0        # Mean seconds each keyup lasts
+    drop_interval: float = 0.0       # Close every AMI connection this often (0 = off)
+    varset_events: bool = False      # Also send VarSet RPT_LINKS events
+    seed: int | None = None
+
+
+class SimNode:
+    """One simulated local app_rpt node."""
+
+    def __init__(self, number: str):
+        self.number = number
+        self.links: dict[str, str] = {}  # node -> T (transceive), R (monitor) or C (connecting)
+        self.keyed: set[str] = set()
+        self.rx_keyed = False
+        self.keyups = 0
+        self.started = time.monotonic()
+
+    def link_list(self, alinks: bool = False) -> str:
+        """RPT_LINKS ("2,T2001,R2002") or RPT_ALINKS ("2,2001TU,2002RK") value."""
+        if alinks:
+            entries = [f"{node}{mode}{'K' if node in self.keyed else 'U'}"
+                       for node, mode in sorted(self.links.items())]
+        else:
+            entries = [f"{mode}{node}" for node, mode in sorted(self.links.items())]
+        return ",".join([str(len(entries))] + entries)
+
+    def rpt_nodes(self) -> list[str]:
+        entries = [f"{mode}{node}" for node, mode in sorted(self.links.items())]
+        lines = [", ".join(entries[i:i + NODES_PER_LINE]) for i in range(0, len(entries), NODES_PER_LINE)]
+        return [
+            "************************* CONNECTED NODES *************************",
+            "",
+            *(lines or ["<NONE>"]),
+            "",
+            "********************** END OF CONNECTED NODES **********************",
+        ]
+
+    def rpt_stats(self) -> list[str]:
+        uptime = int(time.monotonic() - self.started)
+        connected = sorted(node for node, mode in self.links.items() if mode != "C")
+        wrapped = [", ".join(connected[i:i + NODES_PER_LINE])
+                   for i in range(0, len(connected), NODES_PER_LINE)] or ["<NONE>"]
+        wrapped = [chunk + ("," if i < len(wrapped) - 1 else "") for i, chunk in enumerate(wrapped)]
+
+        def field_line(label: str, value: object) -> str:
+            return f"{label}{'.' * (STATS_LABEL_WIDTH - len(label))}: {value}"
+
+        lines = [
+            f"************************ NODE {self.number} STATISTICS *************************",
+            "",
+            field_line("Selected system state", 0),
+            field_line("Signal on input", "YES" if self.rx_keyed else "NO"),
+            field_line("System", "ENABLED"),
+            field_line("Parrot Mode", "DISABLED"),
+            field_line("Scheduler", "ENABLED"),
+            field_line("Tail Time", "STANDARD"),
+            field_line("Time out timer", "ENABLED"),
+            field_line("Incoming connections", "ENABLED"),
+            field_line("Time out timer state", "RESET"),
+            field_line("Time outs since system initialization", 0),
+            field_line("Identifier state", "CLEAN"),
+            field_line("Kerchunks today", 0),
+            field_line("Kerchunks since system initialization", 0),
+            field_line("Keyups today", self.keyups),
+            field_line("Keyups since system initialization", self.keyups),
+            field_line("DTMF commands today", 0),
+            field_line("DTMF commands since system initialization", 0),
+            field_line("Last DTMF command executed", "N/A"),
+            field_line("TX time today", "00:00:00:000"),
+            field_line("TX time since system initialization", "00:00:00:000"),
+            field_line("Uptime", f"{uptime // 3600:02d}:{uptime // 60 % 60:02d}:{uptime % 60:02d}"),
+            field_line("Nodes currently connected to us", wrapped[0]),
+        ]
+        lines += [" " * (STATS_LABEL_WIDTH + 2) + chunk for chunk in wrapped[1:]]
+        lines += [
+            field_line("Autopatch", "ENABLED"),
+            field_line("Autopatch state", "DOWN"),
+            field_line("Autopatch called number", "N/A"),
+            field_line("Reverse patch/IAXRPT connected", "DOWN"),
+            field_line("User linking commands", "ENABLED"),
+            field_line("User functions", "ENABLED"),
+        ]
+        return lines
+
+
+class Session:
+    """One AMI client connection."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.logged_in = False
+        self.events = True
+
+    def send(self, *headers: tuple[str, object]):
+        if not self.writer.is_closing():
+            self.writer.write("".join(f"{k}: {v}\r\n" for k, v in headers).encode() + b"\r\n")
+
+
+class AMISimulator:
+    """An asyncio AMI server backed by simulated app_rpt nodes."""
+
+    def __init__(self, options: SimOptions):
+        self.options = options
+        self.random = random.Random(options.seed)
+        self.nodes = {number: SimNode(number) for number in options.local_nodes}
+        self.remote = {str(options.remote_base + i) for i in range(options.remote_nodes)}
+        self.sessions: set[Session] = set()
+        self.stats = {"connections": 0, "actions": 0, "commands": 0, "events": 0,
+                      "errors": 0, "hangs": 0, "drops": 0, "flaps": 0}
+        self.server: asyncio.AbstractServer | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+        remotes = sorted(self.remote)
+        for node in self.nodes.values():
+            for remote in self.random.sample(remotes, min(options.initial_links, len(remotes))):
+                node.links[remote] = "T"
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 5038):
+        """Listen (port 0 picks a free one) and start the background behaviours."""
+        self.server = await asyncio.start_server(self._serve, host, port)
+        if self.options.flap_interval:
+            self._spawn(self._flap_loop())
+        if self.options.keying_interval:
+            self._spawn(self._keying_loop())
+        if self.options.drop_interval:
+            self._spawn(self._drop_loop())
+        logger.info(f"AMI simulator on {host}:{self.port}, local nodes {', '.join(self.nodes)}")
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.server:
+            self.server.close()
+        for session in list(self.sessions):
+            session.writer.close()
+        if self.server:
+            await self.server.wait_closed()
+
+    # Protocol
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = Session(writer)
+        self.stats["connections"] += 1
+        writer.write(b"Asterisk Call Manager/9.0.0\r\n")
+        try:
+            while True:
+                try:
+                    block = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    return
+                headers: dict[str, str] = {}
+                for line in block.decode(errors="replace").split("\r\n"):
+                    if ": " in line:
+                        key, value = line.split(": ", 1)
+                        headers.setdefault(key.lower(), value)
+                await self._action(session, headers)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            return
+        finally:
+            self.sessions.discard(session)
+            writer.close()
+
+    async def _action(self, session: Session, headers: dict[str, str]):
+        self.stats["actions"] += 1
+        action = headers.get("action", "").lower()
+        action_id = ("ActionID", headers.get("actionid", ""))
+        delay = self.options.latency + self.random.uniform(0, self.options.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if action == "login":
+            username, secret = headers.get("username"), headers.get("secret")
+            if self.options.username is not None and (
+                    username != self.options.username or secret != self.options.secret):
+                session.send(("Response", "Error"), action_id, ("Message", "Authentication failed"))
+                return
+            session.logged_in = True
+            session.events = headers.get("events", "on").lower() != "off"
+            self.sessions.add(session)
+            session.send(("Response", "Success"), action_id, ("Message", "Authentication accepted"))
+            if session.events:
+                session.send(("Event", "FullyBooted"), ("Privilege", "system,all"), ("Status", "Fully Booted"))
+        elif not session.logged_in:
+            session.send(("Response", "Error"), action_id, ("Message", "Permission denied"))
+        elif action == "logoff":
+            session.send(("Response", "Goodbye"), action_id, ("Message", "Thanks for all the fish."))
+            session.writer.close()
+        elif action == "ping":
+            session.send(("Response", "Success"), action_id, ("Ping", "Pong"), ("Timestamp", f"{time.time():.6f}"))
+        elif action == "command":
+            self.stats["commands"] += 1
+            roll = self.random.random()
+            if roll < self.options.hang_rate:
+                self.stats["hangs"] += 1
+                return
+            if roll < self.options.hang_rate + self.options.error_rate:
+                self.stats["errors"] += 1
+                session.send(("Response", "Error"), action_id, ("Message", "Simulated command failure"))
+                return
+            output = self._command(headers.get("command", ""))
+            session.send(("Response", "Success"), action_id, ("Message", "Command output follows"),
+                         *(("Output", line) for line in output))
+        else:
+            session.send(("Response", "Error"), action_id, ("Message", "Invalid/unknown command"))
+
+    def _command(self, command: str) -> list[str]:
+        words = command.split()
+        if len(words) >= 3 and words[0] == "rpt" and words[1] in ("stats", "nodes", "cmd"):
+            node = self.nodes.get(words[2])
+            if node is None:
+                return [f"Error: Invalid node number {words[2]}"]
+            if words[1] == "stats":
+                return node.rpt_stats()
+            if words[1] == "nodes":
+                return node.rpt_nodes()
+            if len(words) >= 5 and words[3] == "ilink":
+                self._ilink(node, words[4], words[5] if len(words) > 5 else "")
+                return []
+        return [f"No such command '{command}' (type 'core show help {command}' for other possible commands)"]
+
+    # Simulated app_rpt behaviour
+
+    def _ilink(self, node: SimNode, mode: str, remote: str):
+        if mode == ILINK_DISCONNECT_ALL:
+            if node.links:
+                self._later(self.options.unlink_delay, self._unlink, node, *list(node.links))
+        elif mode == ILINK_DISCONNECT:
+            if remote in node.links:
+                self._later(self.options.unlink_delay, self._unlink, node, remote)
+        elif mode in (ILINK_MONITOR, ILINK_TRANSCEIVE) and remote:
+            link_mode = "T" if mode == ILINK_TRANSCEIVE else "R"
+            if node.links.get(remote, "C") != "C":
+                # Already linked: app_rpt just changes the mode
+                node.links[remote] = link_mode
+                self._publish_links(node)
+                return
+            node.links[remote] = "C"
+            self._publish_links(node)
+            if remote in self.remote and self.random.random() >= self.options.link_fail_rate:
+                self._later(self.options.link_delay, self._link_up, node, remote, link_mode)
+            else:
+                # Never answers: app_rpt gives up on the attempt after a while
+                self._later(max(self.options.link_delay * 4, 5.0), self._link_failed, node, remote)
+
+    def _link_up(self, node: SimNode, remote: str, mode: str):
+        if node.links.get(remote) == "C":
+            node.links[remote] = mode
+            self._publish_links(node)
+
+    def _link_failed(self, node: SimNode, remote: str):
+        if node.links.get(remote) == "C":
+            del node.links[remote]
+            self._publish_links(node)
+
+    def _unlink(self, node: SimNode, *remotes: str):
+        changed = False
+        for remote in remotes:
+            changed |= node.links.pop(remote, None) is not None
+            node.keyed.discard(remote)
+        if changed:
+            self._publish_links(node)
+
+    def _publish_links(self, node: SimNode):
+        links, alinks = node.link_list(), node.link_list(alinks=True)
+        self._event(("Event", "RPT_LINKS"), ("Privilege", "call,all"), ("Node", node.number), ("EventValue", links))
+        self._event(("Event", "RPT_ALINKS"), ("Privilege", "call,all"), ("Node", node.number), ("EventValue", alinks))
+        if self.options.varset_events:
+            self._event(("Event", "VarSet"), ("Privilege", "dialplan,all"), ("Node", node.number),
+                        ("Variable", "RPT_LINKS"), ("Value", links))
+
+    def _event(self, *headers: tuple[str, object]):
+        self.stats["events"] += 1
+        for session in list(self.sessions):
+            if session.events:
+                session.send(*headers)
+
+    async def _flap_loop(self):
+        """Drop a random established link now and then; it comes back after flap_down."""
+        while True:
+            await asyncio.sleep(self.random.expovariate(1 / self.options.flap_interval))
+            candidates = [(node, remote, mode) for node in self.nodes.values()
+                          for remote, mode in node.links.items() if mode != "C"]
+            if not candidates:
+                continue
+            node, remote, mode = self.random.choice(candidates)
+            self.stats["flaps"] += 1
+            self._unlink(node, remote)
+            self._later(self.options.flap_down, self._relink, node, remote, mode)
+
+    def _relink(self, node: SimNode, remote: str, mode: str):
+        if remote not in node.links:
+            node.links[remote] = mode
+            self._publish_links(node)
+
+    async def _keying_loop(self):
+        """Key up a local node's receiver or a linked node now and then.
+
+        A linked node keying up shows as K in RPT_ALINKS; either way the
+        local transmitter follows (RPT_TXKEYED), as on a repeater.
+        """
+        while True:
+            await asyncio.sleep(self.random.expovariate(1 / self.options.keying_interval))
+            node = self.random.choice(list(self.nodes.values()))
+            linked = [remote for remote, mode in node.links.items() if mode != "C"]
+            if node.rx_keyed or node.keyed:
+                continue
+            remote = self.random.choice(linked) if linked and self.random.random() < 0.5 else None
+            if remote:
+                node.keyed.add(remote)
+                self._publish_links(node)
+            else:
+                node.rx_keyed = True
+                self._keying_event(node, "RPT_RXKEYED", 1)
+            node.keyups += 1
+            self._keying_event(node, "RPT_TXKEYED", 1)
+            self._later(self.random.uniform(0.5, 1.5) * self.options.key_duration, self._unkey, node, remote)
+
+    def _unkey(self, node: SimNode, remote: str | None):
+        if remote:
+            if remote in node.keyed:
+                node.keyed.discard(remote)
+                self._publish_links(node)
+        else:
+            node.rx_keyed = False
+            self._keying_event(node, "RPT_RXKEYED", 0)
+        self._keying_event(node, "RPT_TXKEYED", 0)
+
+    def _keying_event(self, node: SimNode, event: str, value: int):
+        self._event(("Event", event), ("Privilege", "call,all"), ("Node", node.number), ("EventValue", value))
+
+    async def _drop_loop(self):
+        """Close every AMI connection periodically, as an Asterisk restart would."""
+        while True:
+            await asyncio.sleep(self.options.drop_interval)
+            self.stats["drops"] += 1
+            logger.info(f"Dropping {len(self.sessions)} AMI connections")
+            for session in list(self.sessions):
+                session.writer.close()
+            self.sessions.clear()
+
+    def _later(self, delay: float, callback, *args):
+        asyncio.get_running_loop().call_later(delay, callback, *args)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+def parse_args(argv: list[str]) -> tuple[argparse.Namespace, SimOptions]:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=5038)
+    p.add_argument("--nodes", default="2000", help="Comma-separated local node numbers")
+    p.add_argument("--remote-nodes", type=int, default=200, help="Reachable remote nodes")
+    p.add_argument("--remote-base", type=int, default=50000, help="First reachable remote node number")
+    p.add_argument("--initial-links", type=int, default=0, help="Links per local node at start")
+    p.add_argument("--username", help="Require this AMI username (with --secret)")
+    p.add_argument("--secret")
+    p.add_argument("--latency-ms", type=float, default=2.0, help="Delay before every AMI response")
+    p.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random delay, 0..N ms")
+    p.add_argument("--link-delay", type=float, default=0.5, help="Seconds for a link to come up")
+    p.add_argument("--unlink-delay", type=float, default=0.1, help="Seconds for a link to drop")
+    p.add_argument("--link-fail-rate", type=float, default=0.0, help="Share of connects that never come up")
+    p.add_argument("--error-rate", type=float, default=0.0, help="Share of commands answered with an error")
+    p.add_argument("--hang-rate", type=float, default=0.0, help="Share of commands never answered")
+    p.add_argument("--flap-interval", type=float, default=0.0, help="Mean seconds between link flaps")
+    p.add_argument("--flap-down", type=float, default=5.0, help="Seconds a flapped link stays down")
+    p.add_argument("--keying-interval", type=float, default=0.0, help="Mean seconds between keyups")
+    p.add_argument("--drop-interval", type=float, default=0.0, help="Close all AMI connections every N seconds")
+    p.add_argument("--varset-events", action="store_true", help="Also send VarSet RPT_LINKS events")
+    p.add_argument("--seed", type=int, help="Random seed for repeatable runs")
+    p.add_argument("--verbose", action="store_true")
+    args = p.parse_args(argv)
+    options = SimOptions(
+        local_nodes=[n.strip() for n in args.nodes.split(",") if n.strip()],
+        remote_nodes=args.remote_nodes,
+        remote_base=args.remote_base,
+        initial_links=args.initial_links,
+        username=args.username,
+        secret=args.secret,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        link_delay=args.link_delay,
+        unlink_delay=args.unlink_delay,
+        link_fail_rate=args.link_fail_rate,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        flap_interval=args.flap_interval,
+        flap_down=args.flap_down,
+        keying_interval=args.keying_interval,
+        drop_interval=args.drop_interval,
+        varset_events=args.varset_events,
+        seed=args.seed,
+    )
+    return args, options
+
+
+async def run(args: argparse.Namespace, options: SimOptions):
+    simulator = AMISimulator(options)
+    await simulator.start(args.host, args.port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.stop()
+        logger.info(f"Simulator stats: {simulator.stats}")
+
+
+def main(argv: list[str]) -> int:
+    args, options = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s - %(name)s - %(message)s")
+    try:
+        asyncio.run(run(args, options))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""End-to-end load and latency benchmark for the REST API.
+
+Starts benchmarks/ami_simulator.py and backend/asl_agent.py (with a
+throwaway config pointed at the simulator via ASL_AGENT_CONFIG), then
+drives a weighted mix of requests over HTTP from a fixed number of
+concurrent clients for each concurrency level. Throughput and latency
+percentiles per operation are written to a JSON report and, with
+--baseline, compared against a stored report; the exit status is 1 if
+any throughput or p99 moved past --tolerance.
+
+Operations: status (GET /status), nodes (GET /nodes), status_all
+(GET /status/all), connect and disconnect (POST, against the
+simulator's remote nodes; disconnect falls back to connect when nothing
+is linked). Reconciliation runs every --reconcile-interval seconds, so
+runs longer than that include monitoring cycles. Link work over the
+agent's max_inflight is shed with 429 and counted under errors.
+Failed requests (error statuses, and status 0 for connection errors and
+timeouts) are counted per operation and kept out of the latency
+percentiles; a higher failure rate than the baseline's is a regression.
+
+Usage:
+  python3 benchmarks/bench_load.py
+  python3 benchmarks/bench_load.py --mix status=60,nodes=30,connect=5,disconnect=5 \\
+      --concurrency 1,8,32 --duration 30 --output load.json
+  python3 benchmarks/bench_load.py --baseline benchmarks/baseline-pi4.json
+  python3 benchmarks/bench_load.py --output benchmarks/baseline-pi4.json   # store a baseline
+
+Requires the agent's requirements (backend/requirements.txt). Baselines
+are only comparable on the same machine with the same options.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import aiohttp
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND = ROOT / "backend"
+SIMULATOR = Path(__file__).resolve().parent / "ami_simulator.py"
+
+OPERATIONS = {
+    "status": ("GET", "/status"),
+    "nodes": ("GET", "/nodes"),
+    "status_all": ("GET", "/status/all"),
+    "connect": ("POST", "/connect"),
+    "disconnect": ("POST", "/disconnect"),
+}
+PERCENTILES = (50, 90, 99)
+REMOTE_BASE = 50000
+
+
+class Workload:
+    """Picks operations by weight and tracks which remote nodes the clients linked."""
+
+    def __init__(self, mix: dict[str, int], remote_nodes: int, seed: int | None):
+        self.random = random.Random(seed)
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.free = [str(REMOTE_BASE + i) for i in range(remote_nodes)]
+        self.linked: list[str] = []
+
+    def next(self) -> tuple[str, str, str, dict | None]:
+        """(operation, method, path, JSON body) for the next request."""
+        name = self.random.choices(self.names, self.weights)[0]
+        if name == "disconnect" and not self.linked:
+            name = "connect"
+        body = None
+        if name == "connect":
+            if not self.free:
+                name = "disconnect"
+            else:
+                body = {"node": self.free.pop(self.random.randrange(len(self.free)))}
+        if name == "disconnect":
+            body = {"node": self.linked.pop(self.random.randrange(len(self.linked)))}
+        return (name, *OPERATIONS[name], body)
+
+    def done(self, name: str, body: dict | None, status: int):
+        # A node whose connect failed stays free; a failed disconnect stays linked
+        if name == "connect":
+            (self.linked if status == 200 else self.free).append(body["node"])
+        elif name == "disconnect":
+            (self.free if status == 200 else self.linked).append(body["node"])
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples: list[tuple[float, int]], seconds: float) -> dict:
+    # Status 0 is a client-side failure (connection error or timeout), not a response
+    latencies = sorted(elapsed * 1000 for elapsed, status in samples if 0 < status < 400)
+    errors: dict[str, int] = {}
+    for _, status in samples:
+        if not 0 < status < 400:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    return {
+        "requests": len(samples),
+        "succeeded": len(latencies),
+        "failed": len(samples) - len(latencies),
+        "throughput": round(len(samples) / seconds, 2),
+        "errors": errors,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            **{f"p{pct}": round(percentile(latencies, pct), 3) for pct in PERCENTILES},
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+
+async def drive(url: str, api_key: str, workload: Workload, concurrency: int, seconds: float) -> tuple[dict, float]:
+    """Run the mix from ``concurrency`` clients for ``seconds``; returns samples per operation."""
+    samples: dict[str, list[tuple[float, int]]] = defaultdict(list)
+    headers = {"X-API-Key": api_key}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        async def client():
+            while time.perf_counter() < deadline:
+                name, method, path, body = workload.next()
+                started = time.perf_counter()
+                try:
+                    async with session.request(method, url + path, json=body) as resp:
+                        await resp.read()
+                        status = resp.status
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    status = 0
+                samples[name].append((time.perf_counter() - started, status))
+                workload.done(name, body, status)
+
+        started = time.perf_counter()
+        deadline = started + seconds
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return dict(samples), elapsed
+
+
+async def wait_ready(url: str, agent: subprocess.Popen, timeout: float):
+    """Wait until the agent answers GET / with AMI up."""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if agent.poll() is not None:
+                raise RuntimeError(f"agent exited with status {agent.returncode}")
+            try:
+                async with session.get(url + "/") as resp:
+                    if resp.status == 200 and (await resp.json()).get("ami_state") == "up":
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"agent not ready after {timeout:.0f}s")
+
+
+async def agent_counters(url: str, api_key: str) -> dict:
+    """AMI pool and admission counters from GET /diagnostics after a run."""
+    async with aiohttp.ClientSession(headers={"X-API-Key": api_key}) as session:
+        async with session.get(url + "/diagnostics") as resp:
+            diagnostics = await resp.json()
+    return {key: diagnostics.get(key) for key in ("ami_pool", "link_work", "rate_limit")}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_config(workdir: Path, args: argparse.Namespace, ami_port: int, api_port: int, api_key: str) -> Path:
+    settings = {
+        "ami": {"host": "127.0.0.1", "port": ami_port, "username": "bench", "password": "bench"},
+        "nodes": [{"number": node, "callsign": "N0CALL"} for node in args.nodes],
+        "api": {"host": "127.0.0.1", "port": api_port, "api_key": api_key},
+        # Every file the agent writes stays in workdir, never in the production paths
+        "webhooks": {"enabled": False, "spool_dir": str(workdir / "webhook-spool")},
+        "monitoring": {"reconcile_interval": args.reconcile_interval},
+        "logging": {
+            "level": args.log_level,
+            "audit_dir": str(workdir / "audit"),
+            "audit_file": str(workdir / "audit.log"),
+        },
+        "history": {"file": str(workdir / "history.db")},
+        "directory": {"file": "", "index_file": str(workdir / "astdb.idx")},
+        "security": {
+            "rate_limit_per_minute": 0,
+            "read_rate_limit_per_minute": 0,
+            "max_inflight": args.max_inflight,
+        },
+    }
+    path = workdir / "config.yaml"
+    path.write_text(yaml.safe_dump(settings, sort_keys=False))
+    return path
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r} (choose from {', '.join(OPERATIONS)})")
+        try:
+            mix[name] = int(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight for {name} must be an integer") from None
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("mix has no weight")
+    return mix
+
+
+def compare(report: dict, baseline: dict, tolerance: float, min_samples: int) -> list[str]:
+    """Print throughput and latency deltas against the baseline; returns the regressions.
+
+    p99 is only judged for operations with at least ``min_samples``
+    requests in both reports; below that it is mostly noise.
+    """
+    regressions = []
+    if report["options"] != baseline.get("options"):
+        print("warning: baseline was recorded with different options; deltas are indicative only")
+    base_runs = {run["concurrency"]: run for run in baseline.get("runs", [])}
+    print(f"\n{'conc':>4s} {'operation':12s} {'req/s':>9s} {'delta':>7s} {'p50 ms':>9s} {'delta':>7s} {'p99 ms':>9s} {'delta':>7s}")
+    for run in report["runs"]:
+        base_run = base_runs.get(run["concurrency"])
+        if base_run is None:
+            continue
+        for name, result in run["operations"].items():
+            base = base_run["operations"].get(name)
+            if base is None:
+                continue
+            deltas = []
+            for new, old in ((result["throughput"], base["throughput"]),
+                             (result["latency_ms"]["p50"], base["latency_ms"]["p50"]),
+                             (result["latency_ms"]["p99"], base["latency_ms"]["p99"])):
+                deltas.append((new - old) / old if old else 0.0)
+            print(f"{run['concurrency']:4d} {name:12s} {result['throughput']:9.1f} {deltas[0]:+7.1%} "
+                  f"{result['latency_ms']['p50']:9.2f} {deltas[1]:+7.1%} "
+                  f"{result['latency_ms']['p99']:9.2f} {deltas[2]:+7.1%}")
+            if deltas[0] < -tolerance:
+                regressions.append(f"c={run['concurrency']} {name}: throughput {deltas[0]:+.1%}")
+            if deltas[2] > tolerance and min(result["requests"], base["requests"]) >= min_samples:
+                regressions.append(f"c={run['concurrency']} {name}: p99 {deltas[2]:+.1%}")
+            failed = result["failed"] / result["requests"] if result["requests"] else 0.0
+            base_failed = base.get("failed", 0) / base["requests"] if base["requests"] else 0.0
+            if failed > base_failed + tolerance:
+                regressions.append(f"c={run['concurrency']} {name}: {failed:.1%} failed "
+                                   f"(baseline {base_failed:.1%})")
+    return regressions
+
+
+def print_run(run: dict):
+    print(f"\nconcurrency {run['concurrency']}: {run['requests']} requests ({run['failed']} failed) "
+          f"in {run['seconds']:.1f}s, {run['throughput']:.1f} req/s")
+    print(f"  {'operation':12s} {'req/s':>9s} {'mean':>8s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s} {'failed':>7s}  errors")
+    for name, result in run["operations"].items():
+        lat = result["latency_ms"]
+        print(f"  {name:12s} {result['throughput']:9.1f} {lat['mean']:8.2f} {lat['p50']:8.2f} "
+              f"{lat['p90']:8.2f} {lat['p99']:8.2f} {lat['max']:8.2f} {result['failed']:7d}  {result['errors'] or ''}")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    ami_port, api_port = free_port(), free_port()
+    api_key = secrets.token_urlsafe(24)
+    url = f"http://127.0.0.1:{api_port}"
+    workdir = Path(tempfile.mkdtemp(prefix="asl-bench-"))
+    config_path = write_config(workdir, args, ami_port, api_port, api_key)
+
+    simulator_cmd = [
+        sys.executable, str(SIMULATOR), "--port", str(ami_port), "--nodes", ",".join(args.nodes),
+        "--remote-nodes", str(args.remote_nodes), "--remote-base", str(REMOTE_BASE),
+        "--initial-links", str(args.initial_links), "--latency-ms", str(args.ami_latency_ms),
+        "--jitter-ms", str(args.ami_jitter_ms), "--link-delay", str(args.link_delay),
+        "--flap-interval", str(args.flap_interval), "--keying-interval", str(args.keying_interval),
+    ]
+    if args.seed is not None:
+        simulator_cmd += ["--seed", str(args.seed)]
+    log = open(workdir / "bench.log", "w")
+    simulator = subprocess.Popen(simulator_cmd, stdout=log, stderr=subprocess.STDOUT)
+    agent = subprocess.Popen([sys.executable, "asl_agent.py"], cwd=BACKEND, stdout=log, stderr=subprocess.STDOUT,
+                             env={**os.environ, "ASL_AGENT_CONFIG": str(config_path)})
+    print(f"agent on {url}, simulator on port {ami_port}, logs in {workdir / 'bench.log'}")
+
+    runs = []
+    try:
+        await wait_ready(url, agent, args.startup_timeout)
+        workload = Workload(args.mix, args.remote_nodes, args.seed)
+        for concurrency in args.concurrency:
+            if args.warmup:
+                await drive(url, api_key, workload, concurrency, args.warmup)
+            samples, seconds = await drive(url, api_key, workload, concurrency, args.duration)
+            operations = {name: summarize(values, seconds) for name, values in samples.items()}
+            result = {
+                "concurrency": concurrency,
+                "seconds": round(seconds, 3),
+                "requests": sum(op["requests"] for op in operations.values()),
+                "failed": sum(op["failed"] for op in operations.values()),
+                "throughput": round(sum(op["throughput"] for op in operations.values()), 2),
+                "operations": operations,
+                "agent": await agent_counters(url, api_key),
+            }
+            runs.append(result)
+            print_run(result)
+    finally:
+        for process in (agent, simulator):
+            process.terminate()
+        for process in (agent, simulator):
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+
+    return {
+        "benchmark": "bench_load",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": {
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "options": {
+            "mix": args.mix,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "nodes": args.nodes,
+            "remote_nodes": args.remote_nodes,
+            "initial_links": args.initial_links,
+            "ami_latency_ms": args.ami_latency_ms,
+            "ami_jitter_ms": args.ami_jitter_ms,
+            "link_delay": args.link_delay,
+            "flap_interval": args.flap_interval,
+            "keying_interval": args.keying_interval,
+            "reconcile_interval": args.reconcile_interval,
+            "max_inflight": args.max_inflight,
+        },
+        "runs": runs,
+    }
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--mix", type=parse_mix, default=parse_mix("status=60,nodes=35,connect=3,disconnect=2"),
+                   help="Weighted operations, e.g. status=60,nodes=35,connect=3,disconnect=2")
+    p.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 8, 32],
+                   help="Comma-separated client counts, one run each")
+    p.add_argument("--duration", type=float, default=20.0, help="Measured seconds per run")
+    p.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before each run")
+    p.add_argument("--nodes", type=lambda s: s.split(","), default=["2000"], help="Simulated local nodes")
+    p.add_argument("--remote-nodes", type=int, default=500)
+    p.add_argument("--initial-links", type=int, default=10)
+    p.add_argument("--ami-latency-ms", type=float, default=5.0, help="Simulated AMI response time")
+    p.add_argument("--ami-jitter-ms", type=float, default=5.0)
+    p.add_argument("--link-delay", type=float, default=1.0, help="Seconds for a simulated link to come up")
+    p.add_argument("--flap-interval", type=float, default=10.0, help="Mean seconds between link flaps (0 = off)")
+    p.add_argument("--keying-interval", type=float, default=5.0, help="Mean seconds between keyups (0 = off)")
+    p.add_argument("--reconcile-interval", type=float, default=5.0, help="Agent monitoring.reconcile_interval")
+    p.add_argument("--max-inflight", type=int, default=8, help="Agent security.max_inflight")
+    p.add_argument("--log-level", default="WARNING", help="Agent logging.level")
+    p.add_argument("--startup-timeout", type=float, default=30.0)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--output", help="Write the JSON report here (e.g. to store a baseline)")
+    p.add_argument("--baseline", help="Compare against this stored report")
+    p.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop / p99 rise (0.2 = 20%%)")
+    p.add_argument("--min-samples", type=int, default=200, help="Requests an operation needs before its p99 is judged")
+    args = p.parse_args(argv)
+
+    try:
+        report = asyncio.run(run(args))
+    except RuntimeError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nreport written to {args.output}")
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance, args.min_samples)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print(f"\nno regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
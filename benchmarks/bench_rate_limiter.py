@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the admission checks in front of AMI.
+
+Times backend/admission.RateLimiter.check (the per-request token bucket
+lookup for an API key and route) and one AdmissionGate enter/leave pair,
+against an empty function call as the floor. Buckets are warm, as they
+are after a route's first request; the generous limit keeps every check
+on the allowed path.
+
+Usage:
+  python3 benchmarks/bench_rate_limiter.py
+  python3 benchmarks/bench_rate_limiter.py --iterations 500000 --keys 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from admission import AdmissionGate, RateLimiter  # noqa: E402
+
+
+class Route:
+    """The parts of a FastAPI APIRoute the limiter reads."""
+
+    def __init__(self, name: str, path: str, methods: set[str]):
+        self.name = name
+        self.path = path
+        self.methods = methods
+
+
+ROUTES = [
+    Route("get_status", "/status", {"GET"}),
+    Route("get_status", "/nodes/{local}/status", {"GET"}),
+    Route("connect_node", "/connect", {"POST"}),
+    Route("connect_node", "/nodes/{local}/connect", {"POST"}),
+]
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--iterations", type=int, default=200000)
+    p.add_argument("--keys", type=int, default=1, help="API keys with warm buckets")
+    args = p.parse_args(argv)
+
+    limiter = RateLimiter(10 ** 12, 10 ** 12, {"/connect": 10 ** 12})
+    keys = [f"key-{i}" for i in range(args.keys)]
+    for key in keys:
+        for route in ROUTES:
+            assert limiter.check(key, route, ROUTES) == 0
+    gate = AdmissionGate(8)
+    status, key = ROUTES[1], keys[-1]
+
+    def noop():
+        pass
+
+    def check():
+        limiter.check(key, status, ROUTES)
+
+    def enter_leave():
+        gate.try_enter()
+        gate.leave()
+
+    for name, fn in (("call floor", noop), ("rate check", check), ("gate pair", enter_leave)):
+        best = min(timeit.repeat(fn, number=args.iterations, repeat=5))
+        print(f"{name:12s} {best / args.iterations * 1e9:8.1f} ns/op "
+              f"({len(limiter.buckets)} buckets)")
+    assert limiter.limited == 0 and gate.inflight == 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the rpt stats parser.
+
+Compares backend/rpt_stats.parse_rpt_stats against the previous approach
+(substring checks in the agent plus repeated raw_output scans in
+asl-tool.py) on a representative ASL3 ``rpt stats`` output. The legacy
+path only pulls a handful of fields out as strings; parse_rpt_stats
+types every field and is two to three times slower per call (tens of
+microseconds, once per stats cache refresh rather than per request).
+The numbers are the cost of the typed output, not a like for like race.
+
+Usage:
+  python3 benchmarks/bench_stats_parser.py
+  python3 benchmarks/bench_stats_parser.py --iterations 50000 --nodes 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from rpt_stats import parse_rpt_stats  # noqa: E402
+
+
+def sample_output(nodes: int) -> list[str]:
+    """Build rpt stats output with a wrapped list of connected nodes."""
+    ids = [str(2000 + i) for i in range(nodes)]
+    wrapped = [", ".join(ids[i:i + 8]) for i in range(0, len(ids), 8)] or ["<NONE>"]
+    lines = [
+        "************************ NODE 637050 STATISTICS *************************",
+        "",
+        "Selected system state............................: 0",
+        "Signal on input..................................: NO",
+        "System...........................................: ENABLED",
+        "Parrot Mode......................................: DISABLED",
+        "Scheduler........................................: ENABLED",
+        "Tail Time........................................: STANDARD",
+        "Time out timer...................................: ENABLED",
+        "Incoming connections.............................: ENABLED",
+        "Time out timer state.............................: RESET",
+        "Time outs since system initialization............: 0",
+        "Identifier state.................................: CLEAN",
+        "Kerchunks today..................................: 12",
+        "Kerchunks since system initialization............: 40",
+        "Keyups today.....................................: 208",
+        "Keyups since system initialization...............: 1102",
+        "DTMF commands today..............................: 0",
+        "DTMF commands since system initialization........: 3",
+        "Last DTMF command executed.......................: N/A",
+        "TX time today....................................: 01:02:03:456",
+        "TX time since system initialization..............: 10:20:30:400",
+        "Uptime...........................................: 36:35:07",
+        "Nodes currently connected to us..................: "
+        + (wrapped[0] + ("," if len(wrapped) > 1 else "")),
+    ]
+    for i, chunk in enumerate(wrapped[1:], start=1):
+        lines.append(" " * 51 + chunk + ("," if i < len(wrapped) - 1 else ""))
+    lines += [
+        "Autopatch........................................: ENABLED",
+        "Autopatch state..................................: DOWN",
+        "Autopatch called number..........................: N/A",
+        "Reverse patch/IAXRPT connected...................: DOWN",
+        "User linking commands............................: ENABLED",
+        "User functions...................................: ENABLED",
+    ]
+    return lines
+
+
+def legacy_parse(output: list[str]) -> dict:
+    """The previous agent parser plus the asl-tool.py report scans."""
+    stats: dict = {"raw_output": output}
+    for line in output:
+        line = line.strip()
+        if "Uptime" in line and ":" in line:
+            stats["uptime"] = line.split(":")[-1].strip()
+        elif "Keyups today" in line and ":" in line:
+            stats["keyups_today"] = line.split(":")[-1].strip()
+        elif "Nodes currently connected to us" in line and ":" in line:
+            connected = line.split(":")[-1].strip()
+            stats["connected_nodes"] = connected if connected != "<NONE>" else "None"
+
+    def _find(prefix: str) -> str | None:
+        for line in output:
+            if line.strip().startswith(prefix):
+                return line.split(":", 1)[-1].strip()
+        return None
+
+    for prefix in ("Uptime", "System", "Scheduler", "Signal on input", "Autopatch", "Autopatch state"):
+        stats[prefix] = _find(prefix)
+    return stats
+
+
+def main(argv: list[str]) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--iterations", type=int, default=20000)
+    p.add_argument("--nodes", type=int, default=40, help="Connected nodes in the sample")
+    args = p.parse_args(argv)
+
+    output = sample_output(args.nodes)
+    parsed = parse_rpt_stats(output)
+    assert parsed["keyups_today"] == 208
+    assert len(parsed["connected_nodes"]) == args.nodes
+
+    for name, fn in (("parse_rpt_stats", parse_rpt_stats), ("legacy", legacy_parse)):
+        best = min(timeit.repeat(lambda: fn(output), number=args.iterations, repeat=5))
+        print(f"{name:16s} {best / args.iterations * 1e6:8.2f} us/parse "
+              f"({len(output)} lines, {args.nodes} nodes)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
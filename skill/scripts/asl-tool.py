@@ -5,11 +5,18 @@ Goal: provide a single, typed entrypoint that OpenClaw can invoke via exec.
 
 Auth/env:
 - ASL_PI_IP (or ASL_API_BASE) and ASL_API_KEY must be set.
+- ASL_LOCAL_NODE (optional) picks the local node on a multi-node agent;
+  unset means the agent's default node.
+- ASL_ASTDB (optional) is a local copy of the AllStar node database
+  (astdb.txt) for lookup; unset means the agent's directory is searched.
+- ASL_TRACE=1 (optional) tags every request of a run with one X-Request-ID
+  and prints each request's round trip and the agent's Server-Timing
+  phases to stderr; the id matches the agent's trace export file.
 
 New features (phase 2+):
 - report: produce a clean human-readable node report (or JSON)
 - favorites: save node numbers under short names
-- watch: poll for connection changes and emit events
+- watch: stream connection changes from the agent (GET /events) and emit events
 
 Examples:
   asl-tool.py status --out text
@@ -19,12 +26,19 @@ Examples:
   asl-tool.py connect 674982 --monitor-only --out text
   asl-tool.py connect-fav net --out text
   asl-tool.py disconnect 674982 --out text
+  asl-tool.py batch connect:55553 monitor:2560 disconnect:674982 --out text
+  asl-tool.py connect 674982 --async --out text
   asl-tool.py favorites list
   asl-tool.py favorites set net 55553
   asl-tool.py favorites remove net
   asl-tool.py net start ares --out text
   asl-tool.py net tick --out text
   asl-tool.py watch --interval 5
+  asl-tool.py audit --command connect --node 55553 --lines 50
+  asl-tool.py history --days 7 --top 10 --out text
+  asl-tool.py activity --out text
+  asl-tool.py trend --window 86400 --out text
+  asl-tool.py lookup W5XYZ --out text
 """
 
 from __future__ import annotations
@@ -34,9 +48,10 @@ import json
 import os
 import sys
 import time
+import uuid
 from pathlib import Path
 from typing import Any
-from urllib.parse import urljoin
+from urllib.parse import urlencode, urljoin
 
 import requests
 
@@ -66,11 +81,45 @@ def _api_key() -> str:
     return key
 
 
+# Default-node routes and their /nodes/{local}/... equivalents
+_LOCAL_ROUTES = {
+    "/status": "status",
+    "/nodes": "links",
+    "/connect": "connect",
+    "/disconnect": "disconnect",
+    "/disconnect-all": "disconnect-all",
+    "/batch": "batch",
+    "/history": "history",
+    "/activity": "activity",
+    "/stats/series": "stats/series",
+}
+
+
+def _local_path(path: str) -> str:
+    local = _env("ASL_LOCAL_NODE")
+    route, sep, query = path.partition("?")
+    if local and route in _LOCAL_ROUTES:
+        return f"/nodes/{local}/{_LOCAL_ROUTES[route]}{sep}{query}"
+    return path
+
+
+# One request id per run when ASL_TRACE is set
+_TRACE_ID = f"asl-tool-{uuid.uuid4().hex[:12]}"
+
+
 def _req(method: str, path: str, *, json_body: dict | None = None) -> dict:
-    url = urljoin(_base_url(), path.lstrip("/"))
+    url = urljoin(_base_url(), _local_path(path).lstrip("/"))
     headers = {"X-API-Key": _api_key()}
+    trace = _env("ASL_TRACE") not in (None, "0")
+    if trace:
+        headers["X-Request-ID"] = _TRACE_ID
 
+    started = time.monotonic()
     r = requests.request(method, url, headers=headers, json=json_body, timeout=30)
+    if trace:
+        elapsed = (time.monotonic() - started) * 1000
+        timing = r.headers.get("Server-Timing", "(no Server-Timing)")
+        print(f"trace {_TRACE_ID} {method} {path} {r.status_code} {elapsed:.1f}ms | {timing}", file=sys.stderr)
     try:
         payload = r.json()
     except Exception:
@@ -83,6 +132,21 @@ def _req(method: str, path: str, *, json_body: dict | None = None) -> dict:
     return payload
 
 
+def _req_link(args: argparse.Namespace, path: str, body: dict) -> dict:
+    """POST a link operation; with --async, submit a job and wait on it in short polls."""
+    if not getattr(args, "run_async", False):
+        return _req("POST", path, json_body=body)
+
+    job = _req("POST", f"{path}?async=true", json_body=body)
+    while job.get("id") and job.get("status") in ("pending", "running"):
+        job = _req("GET", f"/jobs/{job['id']}?wait=20")
+    if job.get("status") == "succeeded":
+        return job["result"]
+    if job.get("status") == "failed":
+        return {"success": False, "error": job.get("error"), "status": job.get("status_code"), "job": job.get("id")}
+    return job
+
+
 def _state_dir() -> Path:
     # Per-user state. Keeps git clean and survives updates.
     p = _env("ASL_STATE_DIR")
@@ -127,23 +191,68 @@ def _save_favorites(favs: dict[str, int]) -> None:
     )
 
 
+# rpt stats labels shown in status/report -> display key (legacy raw_output scan)
+_STAT_LABELS = {
+    "Uptime": "uptime",
+    "Keyups today": "keyups_today",
+    "System": "system",
+    "Scheduler": "scheduler",
+    "Signal on input": "signal",
+    "Autopatch": "autopatch",
+    "Autopatch state": "autopatch_state",
+}
+
+
+def _stat_text(status: dict[str, Any]) -> dict[str, str]:
+    """Display strings for the rpt stats fields shown in status/report.
+
+    Uses the agent's typed "stats" block; older agents only send
+    raw_output, which is scanned once.
+    """
+    stats = status.get("stats")
+    if isinstance(stats, dict):
+        def text(key: str, yes: str = "ENABLED", no: str = "DISABLED") -> str | None:
+            v = stats.get(key)
+            if isinstance(v, bool):
+                return yes if v else no
+            return None if v is None else str(v)
+
+        uptime = stats.get("uptime")
+        if isinstance(uptime, int):
+            uptime = f"{uptime // 3600}:{uptime // 60 % 60:02d}:{uptime % 60:02d}"
+        out = {
+            "uptime": uptime,
+            "keyups_today": text("keyups_today"),
+            "system": text("system"),
+            "scheduler": text("scheduler"),
+            "signal": text("signal_on_input", "YES", "NO"),
+            "autopatch": text("autopatch"),
+            "autopatch_state": text("autopatch_state"),
+        }
+        return {k: str(v) for k, v in out.items() if v is not None}
+
+    out: dict[str, str] = {}
+    for line in status.get("raw_output") or []:
+        if not isinstance(line, str) or ":" not in line:
+            continue
+        label, _, value = line.partition(":")
+        key = _STAT_LABELS.get(label.strip().rstrip(".").strip())
+        if key and key not in out:
+            out[key] = value.strip()
+    return out
+
+
 def cmd_status(_: argparse.Namespace) -> dict:
     out = _req("GET", "/status")
-    raw = out.get("raw_output") or []
-
-    def _find(prefix: str) -> str | None:
-        for line in raw:
-            if isinstance(line, str) and line.strip().startswith(prefix):
-                return line.split(":", 1)[-1].strip()
-        return None
+    st = _stat_text(out)
 
     node = out.get("node", "?")
     callsign = out.get("callsign", "")
-    uptime = _find("Uptime") or "?"
-    keyups = out.get("keyups_today") or _find("Keyups today") or "?"
-    system = _find("System") or "?"
-    sched = _find("Scheduler") or "?"
-    sig = _find("Signal on input") or "?"
+    uptime = st.get("uptime") or "?"
+    keyups = st.get("keyups_today") or out.get("keyups_today") or "?"
+    system = st.get("system") or "?"
+    sched = st.get("scheduler") or "?"
+    sig = st.get("signal") or "?"
 
     header = f"Node {node} ({callsign})" if callsign else f"Node {node}"
     out["output"] = f"{header} | Up {uptime} | {keyups} keyups | System {system} | Sched {sched} | Signal {sig}"
@@ -160,7 +269,8 @@ def cmd_nodes(_: argparse.Namespace) -> dict:
         val = str(n.get("node", ""))
         if val and val not in seen:
             seen.add(val)
-            dedup.append(val)
+            # Callsign from the agent's node directory, when it has one
+            dedup.append(f"{val} {n['callsign']}" if n.get("callsign") else val)
     count = len(dedup)
     out["output"] = f"{count} nodes: {', '.join(dedup)}" if count else "0 nodes connected"
     return out
@@ -168,7 +278,7 @@ def cmd_nodes(_: argparse.Namespace) -> dict:
 
 def cmd_connect(args: argparse.Namespace) -> dict:
     body = {"node": str(args.node), "monitor_only": bool(args.monitor_only)}
-    out = _req("POST", "/connect", json_body=body)
+    out = _req_link(args, "/connect", body)
     mode = "monitor" if bool(args.monitor_only) else "transceive"
     out.setdefault("output", f"Connected to node {args.node} ({mode})" if out.get("success", True) else f"Failed to connect to node {args.node}")
     return out
@@ -193,25 +303,157 @@ def cmd_connect_fav(args: argparse.Namespace) -> dict:
 
 
 def cmd_disconnect(args: argparse.Namespace) -> dict:
-    out = _req("POST", "/disconnect", json_body={"node": str(args.node)})
+    out = _req_link(args, "/disconnect", {"node": str(args.node)})
     out.setdefault("output", f"Disconnected from node {args.node}" if out.get("success", True) else f"Failed to disconnect from node {args.node}")
     return out
 
 
+def cmd_batch(args: argparse.Namespace) -> dict:
+    ops = []
+    for spec in args.ops:
+        action, sep, node = spec.partition(":")
+        if not sep or action not in ("connect", "monitor", "disconnect") or not node.isdigit():
+            return {"success": False, "error": f"Bad operation: {spec} (use connect:NODE, monitor:NODE or disconnect:NODE)"}
+        ops.append({"action": action, "node": node})
+
+    out = _req_link(args, "/batch", {"operations": ops})
+    lines = []
+    for r in out.get("results") or []:
+        took = r.get("time_to_link", r.get("time_to_unlink"))
+        if r.get("success"):
+            lines.append(f"OK   {r.get('action')} {r.get('node')} ({took}s)")
+        else:
+            lines.append(f"FAIL {r.get('action')} {r.get('node')}: {r.get('error')} ({took}s)")
+    if lines:
+        out["output"] = "\n".join(lines + [out.get("message", "")])
+    return out
+
+
 def cmd_audit(args: argparse.Namespace) -> dict:
-    return _req("GET", f"/audit?lines={int(args.lines)}")
+    params: dict[str, Any] = {"lines": int(args.lines)}
+    for key in ("cursor", "command", "node", "since", "until"):
+        value = getattr(args, key)
+        if value:
+            params[key] = value
+    return _req("GET", f"/audit?{urlencode(params)}")
+
+
+def _duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    minutes = int(seconds // 60)
+    return f"{minutes // 60}h{minutes % 60:02d}m" if minutes >= 60 else f"{minutes}m"
+
+
+def cmd_history(args: argparse.Namespace) -> dict:
+    params: dict[str, Any] = {"days": int(args.days), "top": int(args.top)}
+    if args.node:
+        params["remote"] = args.node
+    out = _req("GET", f"/history?{urlencode(params)}")
+    if out.get("success") is False:
+        return out
+    period = f"last {args.days} days" if args.days else "all time"
+    entries = [
+        f"{n['node']} {_duration(n['seconds'])} ({n['sessions']}x){' *' if n.get('linked') else ''}"
+        for n in out.get("nodes") or []
+    ]
+    out["output"] = f"Link time, {period}: {', '.join(entries)}" if entries else f"No links, {period}"
+    return out
+
+
+def cmd_activity(args: argparse.Namespace) -> dict:
+    out = _req("GET", f"/activity?{urlencode({'top': int(args.top)})}")
+    if out.get("success") is False:
+        return out
+    window = _duration(out.get("window_seconds") or 0)
+    parts = []
+    for label in ("rx", "tx"):
+        a = out.get(label) or {}
+        parts.append(f"{label.upper()} {a.get('window_keyups', 0)} keyups, {_duration(a.get('window_talk_seconds', 0))} "
+                     f"({a.get('busy_ratio', 0):.0%} busy)")
+    talkers = [f"{n['node']} {_duration(n['window_talk_seconds'])}" for n in out.get("linked_nodes") or []
+               if n.get("window_talk_seconds")]
+    if talkers:
+        parts.append("Top: " + ", ".join(talkers))
+    out["output"] = f"Last {window}: " + " | ".join(parts)
+    return out
+
+
+def cmd_trend(args: argparse.Namespace) -> dict:
+    fields = [f for f in args.fields.split(",") if f]
+    if "uptime" not in fields:
+        fields.append("uptime")
+    params = {"window": int(args.window), "fields": ",".join(fields)}
+    out = _req("GET", f"/stats/series?{urlencode(params)}")
+    if out.get("success") is False:
+        return out
+    series = out.get("series") or {}
+    parts = []
+    for field in fields:
+        values = [v for v in series.get(field) or [] if v is not None]
+        if field == "uptime":
+            # Uptime going backwards means app_rpt (or Asterisk) restarted
+            restarts = sum(1 for a, b in zip(values, values[1:]) if b < a)
+            parts.append(f"restarts {restarts}")
+        elif values:
+            parts.append(f"{field} {min(values):g}..{max(values):g} (now {values[-1]:g})")
+        else:
+            parts.append(f"{field} no samples")
+    out["output"] = (f"Last {_duration(out.get('count', 0) * out.get('step', 0))} "
+                     f"({_duration(out.get('step', 0))} steps): " + ", ".join(parts))
+    return out
+
+
+def _directory_scan(path: str, query: str, limit: int) -> list[dict[str, Any]]:
+    """Search a local astdb.txt (node|callsign|description|location) in one pass."""
+    words = "".join(c if c.isalnum() else " " for c in query).lower().split()
+    results: list[dict[str, Any]] = []
+    if not words:
+        return results
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            fields = (line.rstrip("\r\n").split("|") + ["", "", ""])[:4]
+            if not fields[0].isdigit():
+                continue
+            if len(words) == 1 and words[0].isdigit():
+                match = fields[0] == words[0]
+            else:
+                location = "".join(c if c.isalnum() else " " for c in fields[3]).lower().split()
+                match = all(any(t.startswith(w) for t in location) for w in words) or (
+                    len(words) == 1 and fields[1].lower().startswith(words[0]))
+            if match:
+                results.append({"node": fields[0], "callsign": fields[1] or None,
+                                "description": fields[2] or None, "location": fields[3] or None})
+    results.sort(key=lambda e: int(e["node"]))
+    return results[:limit]
+
+
+def cmd_lookup(args: argparse.Namespace) -> dict:
+    path = args.file or _env("ASL_ASTDB")
+    if path:
+        try:
+            results = _directory_scan(path, args.query, int(args.limit))
+        except OSError as e:
+            return {"success": False, "error": str(e), "output": f"Cannot read {path}: {e}"}
+        out: dict[str, Any] = {"query": args.query, "count": len(results), "results": results}
+    else:
+        out = _req("GET", f"/directory?{urlencode({'q': args.query, 'limit': int(args.limit)})}")
+        if out.get("success") is False:
+            return out
+    entries = []
+    for e in out.get("results") or []:
+        text = " ".join(v for v in (e.get("node"), e.get("callsign"), e.get("description")) if v)
+        entries.append(f"{text} ({e['location']})" if e.get("location") else text)
+    out["output"] = "; ".join(entries) if entries else f"No directory entries for {args.query}"
+    return out
 
 
 def _format_report(status: dict[str, Any], nodes: dict[str, Any]) -> str:
     node = status.get("node", "?")
     callsign = status.get("callsign", "")
 
-    # status fields from backend are currently strings
-    uptime = None
-    raw = status.get("raw_output") or []
-    for line in raw:
-        if isinstance(line, str) and line.strip().startswith("Uptime"):
-            uptime = line.split(":", 1)[-1].strip()
+    st = _stat_text(status)
+    uptime = st.get("uptime")
 
     connected_list = nodes.get("connected_nodes") or []
     # de-dupe while preserving order
@@ -229,7 +471,7 @@ def _format_report(status: dict[str, Any], nodes: dict[str, Any]) -> str:
     if count > 25:
         node_ids += ", ..."
 
-    keyups_today = status.get("keyups_today", "?")
+    keyups_today = st.get("keyups_today") or status.get("keyups_today", "?")
 
     lines = []
     lines.append(f"ASL Node Report: {node}{(' (' + callsign + ')') if callsign else ''}")
@@ -239,17 +481,11 @@ def _format_report(status: dict[str, Any], nodes: dict[str, Any]) -> str:
     lines.append(f"Connected nodes: {count}{(' - ' + node_ids) if node_ids else ''}")
 
     # Asterisk stats we commonly care about
-    def _find(prefix: str) -> str | None:
-        for line in raw:
-            if isinstance(line, str) and line.strip().startswith(prefix):
-                return line.split(":", 1)[-1].strip()
-        return None
-
-    system = _find("System")
-    sched = _find("Scheduler")
-    sig = _find("Signal on input")
-    autopatch = _find("Autopatch")
-    autopatch_state = _find("Autopatch state")
+    system = st.get("system")
+    sched = st.get("scheduler")
+    sig = st.get("signal")
+    autopatch = st.get("autopatch")
+    autopatch_state = st.get("autopatch_state")
 
     if system:
         lines.append(f"System: {system}")
@@ -492,47 +728,136 @@ def _nodes_signature(nodes: dict[str, Any]) -> list[str]:
     return dedup
 
 
+def _change_event(prev: list[str], sig: list[str]) -> dict:
+    prev_set = set(prev)
+    sig_set = set(sig)
+    return {
+        "event": "change",
+        "joined": sorted(list(sig_set - prev_set)),
+        "left": sorted(list(prev_set - sig_set)),
+        "nodes": sig,
+        "ts": int(time.time()),
+    }
+
+
+class _NoEventStream(Exception):
+    """The agent predates GET /events."""
+
+
+def _sse(path: str, last_id: str | None, read_timeout: float):
+    """Yield (id, event, data) from a text/event-stream endpoint.
+
+    Keep-alive comments come through as (None, "keep-alive", None) so the
+    caller gets a chance to check its own deadline.
+    """
+    headers = {"X-API-Key": _api_key(), "Accept": "text/event-stream"}
+    if last_id:
+        headers["Last-Event-ID"] = last_id
+    url = urljoin(_base_url(), path.lstrip("/"))
+    with requests.get(url, headers=headers, stream=True, timeout=(10, read_timeout)) as r:
+        if r.status_code == 404:
+            raise _NoEventStream()
+        r.raise_for_status()
+        event_id, event, data = None, "message", []
+        for line in r.iter_lines(decode_unicode=True):
+            if line is None:
+                continue
+            if line == "":
+                if data:
+                    yield event_id, event, json.loads("\n".join(data))
+                event_id, event, data = None, "message", []
+            elif line.startswith(":"):
+                yield None, "keep-alive", None
+            else:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "id":
+                    event_id = value
+                elif field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+
+
 def cmd_watch(args: argparse.Namespace) -> dict:
     interval = float(args.interval)
     if interval < 1:
         return {"success": False, "error": "interval must be >= 1"}
 
-    prev: list[str] | None = None
     start = time.time()
 
+    def remaining() -> float | None:
+        if args.max_seconds is None:
+            return None
+        return float(args.max_seconds) - (time.time() - start)
+
+    def emit(evt: dict) -> None:
+        sys.stdout.write(json.dumps(evt) + "\n")
+        sys.stdout.flush()
+
+    local = _env("ASL_LOCAL_NODE") or _req("GET", "/").get("node")
+    path = f"/events?node={local}" if local else "/events"
+    prev = _nodes_signature(_req("GET", "/nodes"))
+    if args.emit_initial:
+        emit({"event": "initial", "nodes": prev})
+
     # Stream events to stdout as JSON lines (one per change). Final return is a summary.
+    # Link changes are pushed by the agent (GET /events); nothing is polled.
     changes = 0
-    while True:
-        nodes = _req("GET", "/nodes")
-        sig = _nodes_signature(nodes)
+    last_id: str | None = None
+    while remaining() is None or remaining() > 0:
+        left = remaining()
+        read_timeout = 45.0 if left is None else max(1.0, min(45.0, left))
+        try:
+            for event_id, event, data in _sse(path, last_id, read_timeout):
+                if event_id:
+                    last_id = event_id
+                sig = prev
+                if event == "reset":
+                    # Events were missed: re-read the list instead of guessing
+                    sig = _nodes_signature(_req("GET", "/nodes"))
+                elif event == "node_connected":
+                    node = str(data.get("connected_node", ""))
+                    sig = [x for x in prev if x.split(":")[0] != node] + [f"{node}:{data.get('mode', '')}"]
+                elif event == "node_disconnected":
+                    node = str(data.get("disconnected_node", ""))
+                    sig = [x for x in prev if x.split(":")[0] != node]
+
+                if sig != prev:
+                    if set(sig) != set(prev):
+                        emit(_change_event(prev, sig))
+                        changes += 1
+                    prev = sig
+                left = remaining()
+                if left is not None and left <= 0:
+                    break
+        except _NoEventStream:
+            return _watch_poll(args, prev, start, changes)
+        except requests.RequestException:
+            # Dropped stream or idle timeout: resume from last_id
+            left = remaining()
+            if left is not None and left <= 0:
+                break
+            time.sleep(min(interval, left) if left is not None else interval)
 
-        if prev is None:
-            prev = sig
-            if args.emit_initial:
-                sys.stdout.write(json.dumps({"event": "initial", "nodes": sig}) + "\n")
-                sys.stdout.flush()
-        else:
-            if sig != prev:
-                prev_set = set(prev)
-                sig_set = set(sig)
-                joined = sorted(list(sig_set - prev_set))
-                left = sorted(list(prev_set - sig_set))
-                evt = {
-                    "event": "change",
-                    "joined": joined,
-                    "left": left,
-                    "nodes": sig,
-                    "ts": int(time.time()),
-                }
-                sys.stdout.write(json.dumps(evt) + "\n")
-                sys.stdout.flush()
-                prev = sig
-                changes += 1
+    return {"success": True, "changes": changes}
 
+
+def _watch_poll(args: argparse.Namespace, prev: list[str], start: float, changes: int) -> dict:
+    """Fallback for agents without GET /events: poll /nodes and diff."""
+    interval = float(args.interval)
+    while True:
         if args.max_seconds is not None and (time.time() - start) >= float(args.max_seconds):
             break
         time.sleep(interval)
 
+        sig = _nodes_signature(_req("GET", "/nodes"))
+        if sig != prev:
+            sys.stdout.write(json.dumps(_change_event(prev, sig)) + "\n")
+            sys.stdout.flush()
+            prev = sig
+            changes += 1
+
     return {"success": True, "changes": changes}
 
 
@@ -558,6 +883,10 @@ def main(argv: list[str]) -> int:
     def add_out(sp: argparse.ArgumentParser) -> None:
         sp.add_argument("--out", choices=["json", "text"], default="json", help="Output format")
 
+    def add_async(sp: argparse.ArgumentParser) -> None:
+        sp.add_argument("--async", dest="run_async", action="store_true",
+                        help="Run as a server-side job and poll it (no long-held request)")
+
     sp = sub.add_parser("status", help="Get local node status")
     add_out(sp)
     sp.set_defaults(fn=cmd_status)
@@ -575,6 +904,7 @@ def main(argv: list[str]) -> int:
     add_out(sp)
     sp.add_argument("node", type=int, help="Target node number")
     sp.add_argument("--monitor-only", action="store_true", help="RX-only monitor mode")
+    add_async(sp)
     sp.set_defaults(fn=cmd_connect)
 
     sp = sub.add_parser("connect-fav", help="Connect using a saved favorite name")
@@ -586,13 +916,51 @@ def main(argv: list[str]) -> int:
     sp = sub.add_parser("disconnect", help="Disconnect from a node")
     add_out(sp)
     sp.add_argument("node", type=int, help="Target node number")
+    add_async(sp)
     sp.set_defaults(fn=cmd_disconnect)
 
+    sp = sub.add_parser("batch", help="Run several link operations in one request")
+    add_out(sp)
+    sp.add_argument("ops", nargs="+", help="connect:NODE, monitor:NODE or disconnect:NODE")
+    add_async(sp)
+    sp.set_defaults(fn=cmd_batch)
+
     sp = sub.add_parser("audit", help="Read audit log")
     add_out(sp)
     sp.add_argument("--lines", type=int, default=20, help="How many lines")
+    sp.add_argument("--cursor", help="next_cursor from a previous page (older entries)")
+    sp.add_argument("--command", help="Only this command (e.g. connect)")
+    sp.add_argument("--node", help="Only entries mentioning this node number")
+    sp.add_argument("--since", help="ISO time, e.g. 2026-10-01T00:00:00Z")
+    sp.add_argument("--until", help="ISO time")
     sp.set_defaults(fn=cmd_audit)
 
+    sp = sub.add_parser("history", help="Most linked nodes and total link time")
+    add_out(sp)
+    sp.add_argument("--days", type=int, default=7, help="Days back (0 = all time)")
+    sp.add_argument("--top", type=int, default=10, help="How many nodes")
+    sp.add_argument("--node", help="Only this remote node (adds its recent sessions)")
+    sp.set_defaults(fn=cmd_history)
+
+    sp = sub.add_parser("activity", help="Keyups, talk time and busy ratio (local and linked nodes)")
+    add_out(sp)
+    sp.add_argument("--top", type=int, default=5, help="How many linked nodes")
+    sp.set_defaults(fn=cmd_activity)
+
+    sp = sub.add_parser("trend", help="Sampled stats over time (keyups, connected nodes, restarts)")
+    add_out(sp)
+    sp.add_argument("--window", type=int, default=86400, help="Seconds back (default: a day)")
+    sp.add_argument("--fields", default="keyups_today,connected_nodes",
+                    help="Comma-separated rpt stats fields")
+    sp.set_defaults(fn=cmd_trend)
+
+    sp = sub.add_parser("lookup", help="Find nodes by number, callsign prefix or location (node directory)")
+    add_out(sp)
+    sp.add_argument("query", help="Node number, callsign (prefix) or location words")
+    sp.add_argument("--limit", type=int, default=10, help="How many entries")
+    sp.add_argument("--file", help="Local astdb.txt to search instead of the agent (default: $ASL_ASTDB)")
+    sp.set_defaults(fn=cmd_lookup)
+
     sp = sub.add_parser("favorites", help="Manage favorite node shortcuts")
     add_out(sp)
     fav_sub = sp.add_subparsers(dest="fav_cmd", required=True)
@@ -653,7 +1021,7 @@ def main(argv: list[str]) -> int:
 
     sp = sub.add_parser("watch", help="Watch connected nodes and emit JSON-line events")
     add_out(sp)
-    sp.add_argument("--interval", type=float, default=5.0)
+    sp.add_argument("--interval", type=float, default=5.0, help="Reconnect delay (poll interval on agents without /events)")
     sp.add_argument("--max-seconds", type=float, default=None)
     sp.add_argument("--emit-initial", action="store_true", help="Emit initial state event")
     sp.set_defaults(fn=cmd_watch)